@@ -1,125 +1,226 @@
 import numpy as np
-import pandas as pd
-from config import SCHEDULING_RULES, SENSITIVITY_THRESHOLD
-import time
+from datetime import datetime, timedelta
+from config import MOBILE_EQUIPMENT_TYPES
+from path_reservation import PathReservationTable
+from rule_engine import RuleEngine
+from command_table import CommandTable
+from stage_profiler import profiled_stage
+
+# 任务类型→指令优先级（数值越小越优先）
+TASK_PRIORITY = {"超时订单": 1, "紧急订单": 2, "普通订单": 3}
+DEFAULT_TASK_PRIORITY = 3
+UNRESOLVED_CONFLICT = "冲突未解除"  # 最大延迟内找不到无冲突时间窗，未预约路径
+HELD_STATUS = "冲突暂缓"  # 含冲突未解除行的任务整体暂缓下发，订单留待下一周期重新规划
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def _shift_time(text, seconds):
+    return (datetime.strptime(text, TIME_FORMAT) + timedelta(seconds=seconds)).strftime(TIME_FORMAT)
 
 class AdaptiveScheduler:
     def __init__(self, virtual_warehouse, progress_logger):
         self.virtual_warehouse = virtual_warehouse
-        self.rule_base = SCHEDULING_RULES
+        self.rule_engine = RuleEngine()
         self.current_rule = None
         self.state_features = {}
+        self.path_reservations = PathReservationTable()
+        self.blocked_segments = set()  # 绕行时不可使用的路径段（分片调度中为离开本分区簇的边界段）
+        self.issued_command_count = 0
         self.progress_logger = progress_logger 
     
+    @profiled_stage("implant_core")
     def implant_core(self):
         """植入自适应调度逻辑核心"""
         self.progress_logger.update_progress(7, "开始植入自适应调度逻辑核心")
-        time.sleep(3)
+        self.progress_logger.pace(3)
         
         # 初始化策略选择器
         self.progress_logger.update_progress(5, "调度规则库加载完成")
-        time.sleep(2)
+        self.progress_logger.pace(2)
         
         # 初始化状态特征提取模块
         self.extract_state_features()
         self.progress_logger.update_progress(6, "状态特征提取模块初始化完成")
-        time.sleep(3)
+        self.progress_logger.pace(3)
         
         # 初始化规则匹配引擎
-        self.current_rule = self.match_best_rule()
+        self.current_rule, _ = self.rule_engine.evaluate()
         self.progress_logger.update_progress(7, f"初始调度规则选定：{self.current_rule}")
-        time.sleep(3)
+        self.progress_logger.pace(3)
         
         self.progress_logger.update_progress(5, "自适应调度逻辑核心植入完成")
-        time.sleep(2)
+        self.progress_logger.pace(2)
     
     def extract_state_features(self):
-        """提取状态特征向量"""
-        # 订单积压程度
-        order_count = len(self.virtual_warehouse.current_state.get("订单数据", []))
-        order_backlog = order_count / 20
-        
-        # 设备运行负荷
-        equipment_status = self.virtual_warehouse.current_state.get("设备状态", {})
-        eq_loads = []
-        for eq_id, status in equipment_status.items():
-            if status == "正常运行":
-                eq_loads.append(np.random.uniform(0.3, 0.9))
-        
-        avg_eq_load = np.mean(eq_loads) if eq_loads else 0.5
-        
-        # 路径通行效率
-        avg_path_efficiency = self.virtual_warehouse.topology_data["通行效率"].mean() / 100
-        
-        self.state_features = {
-            "订单积压程度": order_backlog,
-            "设备平均负荷": avg_eq_load,
-            "路径平均通行效率": avg_path_efficiency
-        }
+        """提取状态特征向量：读取孪生体维护的增量聚合（订单积压计数、窗口内设备运行负荷、路径通行效率均值），常数时间"""
+        self.state_features = self.virtual_warehouse.feature_aggregator.features()
+        self.rule_engine.update_many(self.state_features)
     
     def match_best_rule(self):
-        """匹配最优调度规则"""
-        rule_scores = {
-            "优先级规则": self.state_features["订单积压程度"] * 0.6 + self.state_features["设备平均负荷"] * 0.4,
-            "路径优化规则": self.state_features["路径平均通行效率"] * 0.7 + (1 - self.state_features["设备平均负荷"]) * 0.3,
-            "冲突避让规则": self.state_features["设备平均负荷"] * 0.5 + (1 - self.state_features["路径平均通行效率"]) * 0.5
-        }
-        
-        return max(rule_scores.items(), key=lambda x: x[1])[0]
+        """匹配最优调度规则（不考虑切换滞回）"""
+        return self.rule_engine.best_rule()
     
     def check_rule_switch(self):
-        """检查规则切换"""
-        new_rule = self.match_best_rule()
-        if new_rule != self.current_rule:
-            # 计算特征变化量
-            feature_change = np.mean([
-                abs(self.state_features[k] - self.state_features.get(k, 0)) 
-                for k in self.state_features
-            ])
-            
-            if feature_change > SENSITIVITY_THRESHOLD:
-                self.current_rule = new_rule
-                self.progress_logger.update_progress(2, f"调度规则动态切换为：{self.current_rule}")
-                time.sleep(1)
+        """检查规则切换：由规则引擎按得分差、特征变化量与最小切换间隔判定，返回是否发生切换"""
+        self.current_rule, switched = self.rule_engine.evaluate()
+        if switched:
+            self.progress_logger.update_progress(2, f"调度规则动态切换为：{self.current_rule}")
+            self.progress_logger.pace(1)
+        return switched
+    
+    def load_rules(self, rules, **hysteresis):
+        """运行时替换规则评分配置（可同时调整 margin/sensitivity/min_interval），下一次切换检查即生效"""
+        self.rule_engine.load_rules(rules, **hysteresis)
     
+    @profiled_stage("execute_strategy")
     def execute_strategy(self, resource_plan):
-        """策略执行器：生成控制指令序列"""
+        """策略执行器：生成控制指令序列（CommandTable）"""
         self.progress_logger.update_progress(8, "策略执行器激活，开始生成控制指令序列")
-        time.sleep(4)
+        self.progress_logger.pace(4)
+        
+        # 按最新状态特征检查调度规则切换
+        self.extract_state_features()
+        self.check_rule_switch()
+        
+        # 清理已过期的路径预约
+        self.path_reservations.release_before(self.path_reservations.to_slot(datetime.now()))
         
-        control_commands = []
-        for _, plan in resource_plan.iterrows():
-            command = {
-                "指令ID": f"CMD{2025001 + len(control_commands)}",
-                "任务ID": plan["任务ID"],
-                "原子操作": plan["原子操作"],
-                "分配设备": plan["分配设备"],
-                "执行时间": plan["执行时间"],
-                "执行参数": {
-                    "目标位置": plan["目标位置"],
-                    "路径选择": self._select_optimal_path(plan["当前分区"], plan["目标位置"]),
-                    "优先级": self._get_task_priority(plan["任务类型"])
-                },
-                "时序约束": f"必须在{plan['执行时间']}前启动，执行时长不超过{np.random.randint(3, 10)}分钟"
-            }
-            control_commands.append(command)
+        # 路径规划 → 移动设备路径预约 → 构建指令表（冲突未解除的任务暂缓下发）
+        paths, execute_times, conflicts = self.plan_paths(resource_plan)
+        unresolved_rows, _ = self.reserve_paths(resource_plan, paths, execute_times, conflicts)
+        keep = self.hold_back(resource_plan, paths, execute_times, conflicts, unresolved_rows)
+        rows = np.flatnonzero(keep)
+        control_commands = self.build_commands(
+            resource_plan.iloc[rows], [paths[row] for row in rows], execute_times[rows], conflicts[rows]
+        )
+        self.issued_command_count += len(control_commands)
         
         self.progress_logger.update_progress(7, "控制指令序列生成完成")
-        time.sleep(3)
-        return pd.DataFrame(control_commands)
+        self.progress_logger.pace(3)
+        return control_commands
+    
+    def plan_paths(self, resource_plan):
+        """为每行计算最优路径，返回（路径列表, 执行时间数组, 冲突避让数组）；同一（当前分区, 目标位置）的路径只计算一次"""
+        pairs = resource_plan[["当前分区", "目标位置"]]
+        pair_codes = pairs.groupby(["当前分区", "目标位置"], sort=False).ngroup().to_numpy()
+        pair_paths = [self._select_optimal_path(source, target) for source, target in pairs.drop_duplicates().itertuples(index=False)]
+        paths = [pair_paths[code] for code in pair_codes]
+        execute_times = resource_plan["执行时间"].to_numpy(dtype=object).copy()
+        conflicts = np.full(len(resource_plan), "无", dtype=object)
+        return paths, execute_times, conflicts
+    
+    def mobile_rows(self, resource_plan):
+        """移动设备所在行的行号"""
+        if "设备类型" not in resource_plan:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(resource_plan["设备类型"].isin(MOBILE_EQUIPMENT_TYPES).to_numpy())
+    
+    def reserve_paths(self, resource_plan, paths, execute_times, conflicts, rows=None, device_delays=None):
+        """移动设备按执行时间先后逐条预约路径，原地更新路径、执行时间与冲突避让；rows 默认为全部移动设备行。
+        设备延迟出发后，其后续各行的执行时间与预计完成时间一并顺延（写回 resource_plan）；device_delays 为
+        {设备ID: 已累计顺延秒数}。返回（冲突未解除的行号, 累计顺延秒数）"""
+        devices = resource_plan["分配设备"].to_numpy(dtype=object)
+        finish_times = resource_plan["预计完成时间"].to_numpy(dtype=object).copy()
+        rows = self.mobile_rows(resource_plan) if rows is None else np.asarray(rows, dtype=np.int64)
+        rows = rows[np.argsort(execute_times[rows].astype(str), kind="stable")]
+        device_delays = dict(device_delays or {})
+        unresolved_rows = []
+        for row in rows.tolist():
+            device = devices[row]
+            delay = device_delays.get(device, 0)
+            if delay:
+                execute_times[row] = _shift_time(execute_times[row], delay)
+                finish_times[row] = _shift_time(finish_times[row], delay)
+            planned_time = execute_times[row]
+            paths[row], execute_times[row], conflicts[row] = self._reserve_path(device, paths[row], planned_time)
+            if conflicts[row] == UNRESOLVED_CONFLICT:
+                unresolved_rows.append(row)
+            elif execute_times[row] != planned_time:
+                added = (datetime.strptime(execute_times[row], TIME_FORMAT) -
+                         datetime.strptime(planned_time, TIME_FORMAT)).total_seconds()
+                device_delays[device] = delay + added
+                finish_times[row] = _shift_time(finish_times[row], added)
+        resource_plan["执行时间"] = execute_times
+        resource_plan["预计完成时间"] = finish_times
+        return np.asarray(unresolved_rows, dtype=np.int64), device_delays
+    
+    def hold_back(self, resource_plan, paths, execute_times, conflicts, unresolved_rows):
+        """含冲突未解除行的任务整体暂缓下发：撤销该任务其他移动设备行已做的路径预约，资源状态标记为冲突暂缓，
+        返回保留行的布尔掩码（订单不承诺，留在积压中待下一周期重新规划）"""
+        if not len(unresolved_rows):
+            return np.ones(len(resource_plan), dtype=bool)
+        task_ids = resource_plan["任务ID"].to_numpy(dtype=object)
+        held = resource_plan["任务ID"].isin(set(task_ids[unresolved_rows])).to_numpy()
+        devices = resource_plan["分配设备"].to_numpy(dtype=object)
+        reservations = self.path_reservations
+        mobile = np.zeros(len(resource_plan), dtype=bool)
+        mobile[self.mobile_rows(resource_plan)] = True
+        reserved = mobile & (np.asarray(conflicts, dtype=object) != UNRESOLVED_CONFLICT)
+
+        def start_slot(row):
+            return reservations.to_slot(datetime.strptime(execute_times[row], TIME_FORMAT))
+
+        for row in np.flatnonzero(reserved & held).tolist():
+            reservations.release(paths[row], start_slot(row), devices[row])
+        # 同一设备保留行的预约可能与撤销的路径段重合，重新写回
+        released_devices = set(devices[reserved & held])
+        for row in np.flatnonzero(reserved & ~held & np.isin(devices, list(released_devices))).tolist():
+            reservations.reserve(paths[row], start_slot(row), devices[row])
+        resource_plan.loc[held, "资源状态"] = HELD_STATUS
+        self.progress_logger.logger.warning(
+            f"{len(unresolved_rows)}条移动指令在最大延迟内无法避让冲突，{len(set(task_ids[unresolved_rows]))}个任务暂缓下发"
+        )
+        return ~held
+    
+    def build_commands(self, resource_plan, paths, execute_times, conflicts):
+        """由资源匹配方案与路径规划结果构建控制指令表"""
+        return CommandTable.build(
+            command_numbers=2025001 + self.issued_command_count + np.arange(len(resource_plan)),
+            task_ids=resource_plan["任务ID"],
+            operations=resource_plan["原子操作"],
+            devices=resource_plan["分配设备"],
+            execute_times=execute_times,
+            targets=resource_plan["目标位置"],
+            priorities=resource_plan["任务类型"].map(TASK_PRIORITY).fillna(DEFAULT_TASK_PRIORITY),
+            max_durations=np.random.randint(3, 10, len(resource_plan)).astype("timedelta64[m]"),
+            conflicts=conflicts,
+            paths=paths,
+            partitions=self.virtual_warehouse.state_store.partitions
+        )
     
     def _select_optimal_path(self, source, target):
-        """选择最优路径（基于拓扑关系）"""
+        """选择最优路径（基于拓扑加权最短路径）"""
         if source == target:
             return [source]
 
-        paths = self.virtual_warehouse.topology_data[
-            (self.virtual_warehouse.topology_data["源分区"] == source) |
-            (self.virtual_warehouse.topology_data["目标分区"] == target)
-        ]
-        return [source, target] if not paths.empty else [source, "缓冲区域", target]
+        routing_engine = self.virtual_warehouse.routing_engine
+        routing_engine.ensure(self.virtual_warehouse.topology_data)
+        path = routing_engine.shortest_path(source, target)
+        return path if path is not None else [source, target]
     
-    def _get_task_priority(self, task_type):
-        """获取任务优先级"""
-        priority_map = {"超时订单": 1, "紧急订单": 2, "普通订单": 3}
-        return priority_map.get(task_type, 3)
\ No newline at end of file
+    def _reserve_path(self, device, path, execute_time):
+        """按冲突避让规则预约移动设备路径：冲突时优先绕行，其次延迟出发"""
+        if len(path) < 2:
+            return path, execute_time, "无"
+        
+        reservations = self.path_reservations
+        start_time = datetime.strptime(execute_time, TIME_FORMAT)
+        start_slot = reservations.to_slot(start_time)
+        if reservations.is_free(path, start_slot, device):
+            reservations.reserve(path, start_slot, device)
+            return path, execute_time, "无"
+        
+        # 绕行：避开该时段内被其他设备占用的路径段
+        busy_segments = reservations.busy_segments(start_slot, 2 * len(path), device) | self.blocked_segments
+        detour = self.virtual_warehouse.routing_engine.shortest_path_avoiding(path[0], path[-1], busy_segments)
+        if detour is not None and reservations.is_free(detour, start_slot, device):
+            reservations.reserve(detour, start_slot, device)
+            return detour, execute_time, "绕行"
+        
+        # 延迟：顺延至最早无冲突的时间窗
+        slot = reservations.find_slot(path, start_slot, device)
+        if slot is None:
+            return path, execute_time, UNRESOLVED_CONFLICT
+        reservations.reserve(path, slot, device)
+        delay_seconds = (slot - start_slot) * reservations.slot_seconds
+        delayed_time = start_time + timedelta(seconds=delay_seconds)
+        return path, delayed_time.strftime(TIME_FORMAT), f"延迟{delay_seconds}秒"
@@ -1,16 +1,14 @@
-from flask import Flask, render_template, send_from_directory, jsonify, request, redirect, url_for
-import os
-from config import PROGRESS_TOTAL_STEPS, PARTITION_TOPOLOGY, CHART_SAVE_PATH
-from logger_utils import ProgressLogger
-from data_generator import DataGenerator
-from virtual_warehouse import VirtualWarehouse
-from adaptive_scheduler import AdaptiveScheduler
-from task_processor import TaskProcessor
-from resource_matcher import ResourceMatcher
-from command_executor import CommandExecutor
-from state_corrector import StateCorrector
-from chart_generator import chart_generator
-import pandas as pd
+from flask import (Flask, Response, render_template, send_file, jsonify, request, redirect, url_for, abort,
+                   stream_with_context)
+import io
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from config import API_DEFAULT_PAGE_SIZE, EVENT_KEEPALIVE_SECONDS, EVENT_STREAM_MAX_SECONDS
+from simulation_worker import SimulationWorker
+from stage_profiler import format_prometheus
+from data_pager import TablePager
 
 app = Flask(__name__)
 app.secret_key = 'logistics_scheduling_secret_key'
@@ -21,79 +19,87 @@ system_state = {
     "is_initialized": False
 }
 
-def run_simulation():
-    """Run the logistics scheduling simulation to populate data."""
+# Lazily rendered charts, kept in memory as {file name: (cache key, PNG bytes, rendered at)}
+chart_renders = {}
+# Chart cache keys per file name: (all_data object, key); inputs are hashed again only when all_data is replaced
+chart_keys = {}
+# pyplot is not thread-safe, so renders are serialized under the threaded server
+chart_render_lock = threading.Lock()
+
+# Paginated data APIs: table key -> (source DataFrame, {query param: filter column})
+DATA_API_TABLES = {
+    "tasks": ("resource_plan", {"任务ID": "任务ID", "设备类型": "设备类型", "原子操作": "原子操作", "status": "资源状态"}),
+    "resources": ("equipment_status", {"设备ID": "设备ID", "设备类型": "设备类型", "status": "运行状态"})
+}
+# Pagers are rebuilt only when the underlying DataFrame object is replaced
+data_pagers = {}
+
+# The simulation runs in a background thread of a single producer process;
+# other workers read its published status and result snapshot.
+simulation_worker = SimulationWorker()
+simulation_worker.start()
+
+@app.before_request
+def sync_simulation_state():
     if system_state["is_initialized"]:
         return
-
-    progress_logger = ProgressLogger(PROGRESS_TOTAL_STEPS)
-    all_data = {}
-    
-    try:
-        # 1. Load Data
-        data_gen = DataGenerator()
-        order_data = data_gen.generate_order_data(count=20) # Increased for demo
-        inventory_data = data_gen.generate_inventory_data()
-        equipment_status = data_gen.generate_equipment_status()
-        topology_data = data_gen.generate_topology_data(PARTITION_TOPOLOGY)
-        
-        all_data.update({
-            "order_data": order_data,
-            "inventory_data": inventory_data,
-            "equipment_status": equipment_status,
-            "topology_data": topology_data
-        })
-        progress_logger.update_progress(5, "Data Loading Completed")
-        
-        # 2. Build Virtual Warehouse
-        virtual_warehouse = VirtualWarehouse(progress_logger)
-        virtual_warehouse.build_model(topology_data, equipment_status)
-        virtual_warehouse.inject_real_time_data(inventory_data, order_data)
-        
-        # 3. Implant Adaptive Scheduler
-        scheduler = AdaptiveScheduler(virtual_warehouse, progress_logger)
-        scheduler.implant_core()
-        
-        # 4. Task Processing
-        task_processor = TaskProcessor(virtual_warehouse, progress_logger)
-        task_graph = task_processor.process_task_request(order_data)
-        all_data["task_graph"] = task_graph
-        
-        # 5. Resource Matching
-        resource_matcher = ResourceMatcher(virtual_warehouse, equipment_status, progress_logger)
-        resource_plan = resource_matcher.match_resources(task_graph)
-        all_data["resource_plan"] = resource_plan
-        
-        # 6. Generate Control Commands
-        control_commands = scheduler.execute_strategy(resource_plan)
-        all_data["control_commands"] = control_commands
-        
-        # 7. Issue Commands and Collect Feedback
-        executor = CommandExecutor(virtual_warehouse, progress_logger)
-        issued_commands = executor.issue_commands(control_commands)
-        feedback_data = executor.collect_feedback(issued_commands)
-        all_data["feedback_data"] = feedback_data
-        
-        # 8. State Correction
-        corrector = StateCorrector(virtual_warehouse, progress_logger)
-        deviation_analysis = corrector.calculate_deviation(feedback_data)
-        all_data["deviation_analysis"] = deviation_analysis
-        corrector.calibrate_model()
-        
-        # 9. Generate Charts
-        progress_logger.update_progress(10, "Generating Charts")
-        chart_generator.generate_charts(all_data)
-        
+    all_data = simulation_worker.result()
+    if all_data is not None:
         system_state["all_data"] = all_data
         system_state["is_initialized"] = True
-        
-    except Exception as e:
-        print(f"Simulation failed: {e}")
-    finally:
-        progress_logger.close()
 
-# Run simulation on startup
-run_simulation()
+@app.route('/status')
+def status():
+    """Readiness endpoint: answers immediately with simulation stage progress."""
+    run_status = simulation_worker.status()
+    run_status.pop("最近事件", None)
+    run_status.pop("阶段性能", None)
+    run_status["ready"] = system_state["is_initialized"]
+    run_status["producer"] = simulation_worker.is_producer
+    return jsonify(run_status)
+
+@app.route('/metrics')
+def metrics():
+    """Per-stage wall/CPU time, rows in/out and peak memory in Prometheus text format (?format=json for JSON)."""
+    snapshot = simulation_worker.metrics()
+    if request.args.get('format') == 'json':
+        return jsonify(snapshot)
+    return Response(format_prometheus(snapshot), mimetype='text/plain; version=0.0.4')
+
+@app.route('/events')
+def events():
+    """Server-Sent Events: progress, stage timings, command counts and deviation alerts as they happen."""
+    # Event IDs are namespaced per worker stream; an ID from another worker (or before a restart) replays the buffer
+    broadcaster = simulation_worker.events
+    last_sequence = broadcaster.parse_event_id(request.headers.get('Last-Event-ID') or request.args.get('since'))
+
+    def stream():
+        subscription = broadcaster.subscribe(last_sequence)
+        idle = 0.0
+        # Close after a bounded lifetime; the client reconnects after `retry` with its Last-Event-ID
+        deadline = time.monotonic() + EVENT_STREAM_MAX_SECONDS
+        try:
+            yield "retry: 3000\n\n"
+            while time.monotonic() < deadline:
+                # Non-producer workers pick up new events from the producer's status snapshot
+                simulation_worker.poll_events()
+                pending, dropped = subscription.drain(timeout=1.0)
+                if dropped:
+                    yield f"event: dropped\ndata: {json.dumps({'丢弃事件数': dropped}, ensure_ascii=False)}\n\n"
+                for event in pending:
+                    yield (f"id: {broadcaster.event_id(event)}\nevent: {event['类型']}\n"
+                           f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+                idle = 0.0 if pending else idle + 1.0
+                if idle >= EVENT_KEEPALIVE_SECONDS:
+                    idle = 0.0
+                    yield ": keepalive\n\n"
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @app.route('/')
 def index():
@@ -108,9 +114,8 @@ def login():
 
 @app.route('/dashboard')
 def dashboard():
+    # While the simulation is still running the page renders empty metrics and follows /events
     all_data = system_state["all_data"]
-    if not all_data:
-        return "System initializing...", 503
         
     # Summarize data for dashboard
     summary = {
@@ -119,32 +124,126 @@ def dashboard():
         "resources_active": len(all_data.get("equipment_status", [])),
         "alerts": len(all_data.get("deviation_analysis", []))
     }
-    return render_template('dashboard.html', summary=summary)
+    return render_template('dashboard.html', summary=summary, initializing=not all_data)
 
 @app.route('/tasks')
 def tasks():
-    all_data = system_state["all_data"]
-    tasks_df = all_data.get("resource_plan", pd.DataFrame())
-    # Convert DataFrame to list of dicts for template
-    tasks_list = tasks_df.to_dict('records') if not tasks_df.empty else []
-    return render_template('tasks.html', tasks=tasks_list)
+    # Rows are fetched page by page from /api/tasks
+    return render_template('tasks.html', page_size=API_DEFAULT_PAGE_SIZE)
 
 @app.route('/resources')
 def resources():
-    all_data = system_state["all_data"]
-    equipment_df = all_data.get("equipment_status", pd.DataFrame())
-    resources_list = equipment_df.to_dict('records') if not equipment_df.empty else []
-    return render_template('resources.html', resources=resources_list)
+    # Cards are fetched page by page from /api/resources
+    return render_template('resources.html', page_size=API_DEFAULT_PAGE_SIZE)
+
+def get_pager(table_key):
+    data_key, filter_columns = DATA_API_TABLES[table_key]
+    table = system_state["all_data"].get(data_key)
+    if table is None:
+        return None
+    cached = data_pagers.get(table_key)
+    if cached is None or cached[0] is not table:
+        cached = (table, TablePager(table, filter_columns))
+        data_pagers[table_key] = cached
+    return cached[1]
+
+@app.route('/api/<table_key>')
+def data_api(table_key):
+    if table_key not in DATA_API_TABLES:
+        abort(404)
+    pager = get_pager(table_key)
+    if pager is None:
+        return jsonify({"error": "System initializing..."}), 503
+    try:
+        page = int(request.args.get('page', 1))
+        page_size = int(request.args.get('page_size', API_DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "page and page_size must be integers"}), 400
+    filters = {param: request.args.get(param) for param in pager.filter_columns}
+    return jsonify(pager.page(filters, page, page_size))
+
+@app.route('/api/<table_key>/facets')
+def data_api_facets(table_key):
+    if table_key not in DATA_API_TABLES:
+        abort(404)
+    pager = get_pager(table_key)
+    if pager is None:
+        return jsonify({"error": "System initializing..."}), 503
+    # Only the requested fields, so high-cardinality IDs are not listed unless asked for
+    return jsonify(pager.facets(request.args.getlist('field')))
+
+@app.route('/api/runs')
+def list_runs():
+    """Saved simulation runs (newest first) with their artifact manifests."""
+    return jsonify(simulation_worker.run_store.list_runs())
+
+@app.route('/api/runs/<run_id>/<artifact>')
+def run_artifact(run_id, artifact):
+    """Query a stored run artifact without re-simulating: equality filters on any column, paginated."""
+    try:
+        page = int(request.args.get('page', 1))
+        page_size = int(request.args.get('page_size', API_DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "page and page_size must be integers"}), 400
+    filters = {key: value for key, value in request.args.items() if key not in ('page', 'page_size')}
+    try:
+        return jsonify(simulation_worker.run_store.query(run_id, artifact, filters, page, page_size))
+    except KeyError:
+        abort(404)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
 @app.route('/analysis')
 def analysis():
-    # List available charts
-    charts = [f for f in os.listdir(CHART_SAVE_PATH) if f.endswith('.png')]
+    # List available charts (rendered on demand when the page requests them)
+    charts = list(chart_methods()) if system_state["all_data"] else []
     return render_template('analysis.html', charts=charts)
 
+def chart_methods():
+    """Chart file name -> plot method. matplotlib is imported on first use to keep startup fast."""
+    from chart_generator import CHART_FILE_NAMES
+    return {file_name: method for method, file_name in CHART_FILE_NAMES.items()}
+
+def render_chart(filename, all_data):
+    """Render a chart into memory on first access; re-render only when its input data changes."""
+    from chart_generator import chart_generator
+    from chart_cache import ChartCache
+    method = chart_methods()[filename]
+    args = None
+    memo = chart_keys.get(filename)
+    if memo is None or memo[0] is not all_data:
+        args = chart_generator.chart_inputs(method, all_data)
+        memo = (all_data, ChartCache.make_key(method, args, chart_generator.render_params()))
+        chart_keys[filename] = memo
+    key = memo[1]
+    cached = chart_renders.get(filename)
+    if cached is not None and cached[0] == key:
+        return cached
+    with chart_render_lock:
+        cached = chart_renders.get(filename)
+        if cached is None or cached[0] != key:
+            if args is None:
+                args = chart_generator.chart_inputs(method, all_data)
+            body = chart_generator.render_chart_bytes(method, args)
+            cached = (key, body, datetime.now(timezone.utc).replace(microsecond=0))
+            chart_renders[filename] = cached
+    return cached
+
 @app.route('/charts/<path:filename>')
 def serve_charts(filename):
-    return send_from_directory(CHART_SAVE_PATH, filename)
+    if filename not in chart_methods():
+        abort(404)
+    all_data = system_state["all_data"]
+    if not all_data:
+        return "System initializing...", 503
+    key, body, rendered_at = render_chart(filename, all_data)
+    # The content cache key doubles as the ETag; conditional requests get a 304
+    response = send_file(
+        io.BytesIO(body), mimetype="image/png", download_name=filename,
+        etag=key, last_modified=rendered_at, max_age=0, conditional=True
+    )
+    response.cache_control.no_cache = True
+    return response
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
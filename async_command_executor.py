@@ -0,0 +1,249 @@
+import asyncio
+import json
+import random
+import time
+from collections import deque
+import pandas as pd
+from datetime import datetime
+from config import (DEVICE_MAX_IN_FLIGHT, COMMAND_TIMEOUT_SECONDS, COMMAND_MAX_RETRIES,
+                    COMMAND_RETRY_BACKOFF_SECONDS, LOGICAL_PARTITIONS)
+from command_executor import CommandExecutor
+from stage_profiler import profiled_stage
+
+class SimulatedDeviceServer:
+    """本地模拟设备终端服务：按行收发 JSON 指令，支持配置响应延迟、失败率与丢包率，用于离线压测"""
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=5.0, jitter_ms=2.0,
+                 failure_rate=0.0, drop_rate=0.0, seed=None):
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.drop_rate = drop_rate
+        self.rng = random.Random(seed)
+        self.server = None
+        self.received_count = 0
+        self._outboxes = {}
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _handle_connection(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while line := await reader.readline():
+                self.received_count += 1
+                latency = max(self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms), 0) / 1000
+                loop.call_later(latency, self._respond, json.loads(line), writer)
+        finally:
+            self._outboxes.pop(writer, None)
+            writer.close()
+
+    def _respond(self, command, writer):
+        # 连接已关闭时丢弃迟到的响应
+        if writer.is_closing():
+            return
+        roll = self.rng.random()
+        if roll < self.drop_rate:
+            return
+        if roll < self.drop_rate + self.failure_rate:
+            response = {"指令ID": command["指令ID"], "状态码": 503, "异常信息": "设备繁忙"}
+        else:
+            response = {
+                "指令ID": command["指令ID"],
+                "状态码": self.rng.choice([200, 200, 200, 201, 202]),
+                "当前位置": self.rng.choice(LOGICAL_PARTITIONS),
+                "任务完成进度": self.rng.randint(70, 99),
+                "运行负荷": self.rng.randint(30, 94),
+                "异常信息": "" if self.rng.random() > 0.1 else "轻微路径偏差"
+            }
+        outbox = self._outboxes.setdefault(writer, [])
+        if not outbox:
+            asyncio.get_running_loop().call_soon(self._flush, writer)
+        outbox.append(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def _flush(self, writer):
+        # 同一轮事件循环内到期的响应合并为一次写入
+        outbox = self._outboxes.pop(writer, [])
+        if outbox and not writer.is_closing():
+            writer.write(b"".join(outbox))
+
+class DeviceConnection:
+    """单台设备的长连接：流水线发送指令，按指令ID匹配响应"""
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.pending = {}
+        self.reader = None
+        self.writer = None
+        self._reader_task = None
+        self._outbox = []
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self._reader_task = asyncio.create_task(self._read_responses())
+
+    async def _read_responses(self):
+        while line := await self.reader.readline():
+            response = json.loads(line)
+            future = self.pending.pop(response["指令ID"], None)
+            if future is not None and not future.done():
+                future.set_result(response)
+
+    async def send(self, payload, timeout):
+        """发送一条指令并等待响应，超时抛出 asyncio.TimeoutError"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        command_id = payload["指令ID"]
+        self.pending[command_id] = future
+        timer = loop.call_later(timeout, self._expire, command_id, future)
+        if not self._outbox:
+            loop.call_soon(self._flush)
+        self._outbox.append(json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+        try:
+            return await future
+        finally:
+            timer.cancel()
+
+    def _flush(self):
+        # 同一轮事件循环内的指令合并为一次写入，减少系统调用
+        if not self.writer.is_closing():
+            self.writer.write(b"".join(self._outbox))
+        self._outbox = []
+
+    def _expire(self, command_id, future):
+        self.pending.pop(command_id, None)
+        if not future.done():
+            future.set_exception(asyncio.TimeoutError())
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+
+class AsyncCommandExecutor(CommandExecutor):
+    """异步指令执行器：并发向各设备终端下发指令，按设备限流、超时重试，反馈到达即回调"""
+    def __init__(self, virtual_warehouse, progress_logger, endpoints, max_in_flight=DEVICE_MAX_IN_FLIGHT,
+                 timeout=COMMAND_TIMEOUT_SECONDS, max_retries=COMMAND_MAX_RETRIES):
+        super().__init__(virtual_warehouse, progress_logger)
+        self.endpoints = endpoints  # (host, port) 或 {设备ID: (host, port)}
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    def _endpoint(self, device):
+        if isinstance(self.endpoints, dict):
+            return self.endpoints[device]
+        return self.endpoints
+
+    @profiled_stage("collect_feedback")
+    def collect_feedback(self, issued_commands, on_feedback=None):
+        """下发指令并采集反馈数据流；on_feedback(record) 在每条反馈到达时调用"""
+        self.progress_logger.update_progress(10, "开始异步下发指令并采集物理执行终端反馈")
+        feedback_data = asyncio.run(self.dispatch(issued_commands, on_feedback))
+        self.feedback_data = pd.DataFrame(feedback_data)
+        self.progress_logger.update_progress(9, f"反馈数据采集完成，共{len(self.feedback_data)}条")
+        return self.feedback_data
+
+    async def dispatch(self, issued_commands, on_feedback=None):
+        """并发下发全部指令：每台设备最多 max_in_flight 个发送协程，返回反馈记录列表"""
+        commands = issued_commands.records()
+        device_queues = {}
+        for command in commands:
+            device_queues.setdefault(command["分配设备"], deque()).append(command)
+
+        connections = {}
+        for device in device_queues:
+            connection = DeviceConnection(*self._endpoint(device))
+            await connection.connect()
+            connections[device] = connection
+
+        feedback_data = []
+
+        async def device_worker(connection, device_commands):
+            while device_commands:
+                record = await self._send_with_retry(connection, device_commands.popleft())
+                feedback_data.append(record)
+                if on_feedback is not None:
+                    on_feedback(record)
+
+        try:
+            await asyncio.gather(*(
+                device_worker(connections[device], device_commands)
+                for device, device_commands in device_queues.items()
+                for _ in range(min(self.max_in_flight, len(device_commands)))
+            ))
+        finally:
+            for connection in connections.values():
+                await connection.close()
+        return feedback_data
+
+    async def _send_with_retry(self, connection, command):
+        """发送单条指令：超时或设备返回 5xx 时按指数退避重试"""
+        payload = {
+            "指令ID": command["指令ID"],
+            "设备ID": command["分配设备"],
+            "原子操作": command["原子操作"],
+            "执行参数": command["执行参数"]
+        }
+        start = time.perf_counter()
+        response = {"状态码": 504, "异常信息": "指令超时"}
+        attempt = 0
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                response = await connection.send(payload, self.timeout)
+            except asyncio.TimeoutError:
+                response = {"状态码": 504, "异常信息": "指令超时"}
+            if response["状态码"] < 500:
+                break
+            if attempt <= self.max_retries:
+                await asyncio.sleep(COMMAND_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+        return {
+            "指令ID": command["指令ID"],
+            "任务ID": command["任务ID"],
+            "设备ID": command["分配设备"],
+            "状态码": response["状态码"],
+            "当前位置": response.get("当前位置", "未知"),
+            "任务完成进度": response.get("任务完成进度", 0),
+            "运行负荷": response.get("运行负荷"),
+            "反馈时间": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "异常信息": response.get("异常信息", ""),
+            "尝试次数": attempt,
+            "往返耗时ms": round((time.perf_counter() - start) * 1000, 3)
+        }
+
+
+def serve_simulated_devices(host="127.0.0.1", port=9100, ready_queue=None, **server_options):
+    """阻塞运行模拟设备终端服务；ready_queue 用于回传实际监听端口"""
+    async def main():
+        server = await SimulatedDeviceServer(host, port, **server_options).start()
+        if ready_queue is not None:
+            ready_queue.put(server.port)
+        async with server.server:
+            await server.server.serve_forever()
+
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="本地模拟设备终端服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--jitter-ms", type=float, default=2.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    print(f"模拟设备终端服务已启动：{args.host}:{args.port}")
+    serve_simulated_devices(args.host, args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                            failure_rate=args.failure_rate, drop_rate=args.drop_rate)
@@ -0,0 +1,75 @@
+"""异步指令下发基准测试：本地模拟设备终端 + AsyncCommandExecutor 吞吐量
+
+运行方式（项目根目录）：
+    python -m benchmarks.command_dispatch
+    python -m benchmarks.command_dispatch --commands 50000 --devices 200 --latency-ms 5 --failure-rate 0.01
+"""
+import argparse
+import multiprocessing
+import time
+from datetime import datetime
+import numpy as np
+from logger_utils import NullProgressLogger
+from async_command_executor import AsyncCommandExecutor, serve_simulated_devices
+from command_table import CommandTable
+from state_store import CodeTable
+
+
+def make_commands(count, device_count):
+    """构建已下发的指令表（全部为 AGV 搬运指令，按设备轮转分配）"""
+    rows = np.arange(count)
+    return CommandTable.build(
+        command_numbers=2025001 + rows,
+        task_ids=np.char.add("ORD", (2025001 + rows // 6).astype(str)).astype(object),
+        operations=np.full(count, "物料搬运", dtype=object),
+        devices=np.char.add("AGV", (rows % device_count + 1).astype(str)).astype(object),
+        execute_times=np.full(count, "2025-01-01 00:00:00", dtype=object),
+        targets=np.full(count, "A1", dtype=object),
+        priorities=np.full(count, 3),
+        max_durations=np.full(count, 5).astype("timedelta64[m]"),
+        conflicts=np.full(count, "无", dtype=object),
+        paths=[["A2", "A1"]] * count,
+        partitions=CodeTable(["A1", "A2"])
+    ).issue(datetime.now().replace(microsecond=0))
+
+
+def run(args):
+    ready_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=serve_simulated_devices,
+        kwargs={"port": 0, "ready_queue": ready_queue, "latency_ms": args.latency_ms,
+                "jitter_ms": args.jitter_ms, "failure_rate": args.failure_rate, "drop_rate": args.drop_rate},
+        daemon=True
+    )
+    server.start()
+    port = ready_queue.get(timeout=10)
+
+    try:
+        commands = make_commands(args.commands, args.devices)
+        executor = AsyncCommandExecutor(
+            None, NullProgressLogger(), ("127.0.0.1", port),
+            max_in_flight=args.max_in_flight, timeout=args.timeout
+        )
+        start = time.perf_counter()
+        feedback = executor.collect_feedback(commands)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+
+    print(f"指令数：{len(commands)}，设备数：{args.devices}，单设备在途上限：{args.max_in_flight}")
+    print(f"总耗时：{elapsed:.3f}s，吞吐量：{len(commands) / elapsed:,.0f} 条/秒")
+    print(f"往返耗时 p50/p99：{feedback['往返耗时ms'].quantile(0.5):.2f} / {feedback['往返耗时ms'].quantile(0.99):.2f} ms")
+    print(f"状态码分布：{feedback['状态码'].value_counts().to_dict()}，平均尝试次数：{feedback['尝试次数'].mean():.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="异步指令下发基准测试")
+    parser.add_argument("--commands", type=int, default=20000)
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--max-in-flight", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=2.0)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--jitter-ms", type=float, default=2.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    run(parser.parse_args())
@@ -0,0 +1,91 @@
+"""设备负荷上报校验：执行终端反馈中的运行负荷经状态校正写入孪生体，并推动调度状态特征「设备平均负荷」
+
+覆盖三条反馈路径：同步 CommandExecutor + StateCorrector、流式 consume_batch、
+本地模拟设备终端 + AsyncCommandExecutor（on_feedback 逐条消费）。任一路径负荷上报未生效时以非零状态退出。
+
+运行方式（项目根目录）：
+    python -m benchmarks.load_feedback
+"""
+import argparse
+import multiprocessing
+import sys
+import pandas as pd
+from config import PARTITION_TOPOLOGY
+from logger_utils import NullProgressLogger
+from data_generator import DataGenerator
+from virtual_warehouse import VirtualWarehouse
+from command_executor import CommandExecutor
+from async_command_executor import AsyncCommandExecutor, serve_simulated_devices
+from state_corrector import StateCorrector, StreamingStateCorrector
+from benchmarks.command_dispatch import make_commands
+
+INITIAL_LOAD = 10  # 初始运行负荷低于模拟终端的上报范围（30~94），负荷上报生效后平均负荷必然上升
+
+
+def build_warehouse():
+    """全部设备正常运行、运行负荷为 INITIAL_LOAD 的孪生体"""
+    data_gen = DataGenerator()
+    equipment_status = data_gen.generate_equipment_status()
+    equipment_status["运行状态"] = "正常运行"
+    equipment_status["运行负荷"] = INITIAL_LOAD
+    warehouse = VirtualWarehouse(NullProgressLogger())
+    warehouse.build_model(data_gen.generate_topology_data(PARTITION_TOPOLOGY), equipment_status)
+    warehouse.inject_real_time_data(data_gen.generate_inventory_data(), pd.DataFrame(columns=["订单ID"]))
+    return warehouse
+
+
+def check(name, warehouse, feedback, before):
+    """平均负荷应上升，且各设备的孪生体负荷等于其最后一次上报值"""
+    after = warehouse.feature_aggregator.features()["设备平均负荷"]
+    last_loads = feedback.dropna(subset=["运行负荷"]).groupby("设备ID")["运行负荷"].last()
+    stale = [device for device, load in last_loads.items()
+             if warehouse.state_store.device_load[warehouse.state_store.devices.get(device)] != load]
+    passed = bool(len(last_loads)) and after > before and not stale
+    print(f"{name}：上报 {len(last_loads)} 台设备，设备平均负荷 {before:.3f} → {after:.3f}，"
+          f"{'通过' if passed else f'失败（未更新设备：{stale}）'}")
+    return passed
+
+
+def run_sync(commands):
+    warehouse = build_warehouse()
+    before = warehouse.feature_aggregator.features()["设备平均负荷"]
+    feedback = CommandExecutor(warehouse, NullProgressLogger()).collect_feedback(commands)
+    StateCorrector(warehouse, NullProgressLogger()).calculate_deviation(feedback)
+    return check("同步反馈", warehouse, feedback, before)
+
+
+def run_streaming(commands):
+    warehouse = build_warehouse()
+    before = warehouse.feature_aggregator.features()["设备平均负荷"]
+    feedback = CommandExecutor(warehouse, NullProgressLogger()).collect_feedback(commands)
+    StreamingStateCorrector(warehouse, NullProgressLogger()).consume_batch(feedback)
+    return check("流式微批", warehouse, feedback, before)
+
+
+def run_async(commands):
+    ready_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=serve_simulated_devices, kwargs={"port": 0, "ready_queue": ready_queue, "latency_ms": 1.0},
+        daemon=True
+    )
+    server.start()
+    port = ready_queue.get(timeout=10)
+    try:
+        warehouse = build_warehouse()
+        before = warehouse.feature_aggregator.features()["设备平均负荷"]
+        corrector = StreamingStateCorrector(warehouse, NullProgressLogger())
+        executor = AsyncCommandExecutor(warehouse, NullProgressLogger(), ("127.0.0.1", port))
+        feedback = executor.collect_feedback(commands, on_feedback=corrector.consume)
+    finally:
+        server.terminate()
+    return check("异步终端", warehouse, feedback, before)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="设备负荷上报校验")
+    parser.add_argument("--commands", type=int, default=60)
+    args = parser.parse_args()
+    # 指令轮转分配给 AGV1~AGV3（孪生体中的 AGV 小车）
+    commands = make_commands(args.commands, 3)
+    results = [run_sync(commands), run_streaming(commands), run_async(commands)]
+    sys.exit(0 if all(results) else 1)
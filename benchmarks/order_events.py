@@ -0,0 +1,62 @@
+"""订单事件校验：重复上报的新增订单原地更新而非追加重复行，订单完成后不再残留于订单数据、积压计数与按类型计数
+
+新增订单事件以订单ID去重：同一订单重复上报（含订单类型变化）后，订单数、按类型积压与订单数据须与只保留最后一次上报一致；
+随后逐一上报订单完成，订单数据应清空。任一检查不符时以非零状态退出。
+
+运行方式（项目根目录）：
+    python -m benchmarks.order_events
+"""
+import argparse
+import sys
+from collections import Counter
+import pandas as pd
+from config import PARTITION_TOPOLOGY
+from logger_utils import NullProgressLogger
+from data_generator import DataGenerator
+from virtual_warehouse import VirtualWarehouse
+
+
+def build_warehouse(data_gen):
+    """订单数据为空的孪生体"""
+    warehouse = VirtualWarehouse(NullProgressLogger())
+    warehouse.build_model(data_gen.generate_topology_data(PARTITION_TOPOLOGY), data_gen.generate_equipment_status())
+    warehouse.inject_real_time_data(data_gen.generate_inventory_data(), pd.DataFrame(columns=["订单ID"]))
+    return warehouse
+
+
+def check(name, warehouse, expected):
+    """订单数、按类型积压与订单数据中的订单ID须与预期订单集合 {订单ID: 订单类型} 一致"""
+    store = warehouse.state_store
+    order_ids = sorted(store.order_frame()["订单ID"].tolist()) if store.order_count else []
+    by_type = warehouse.feature_aggregator.backlog_by_type()
+    passed = (store.order_count == len(expected) and order_ids == sorted(expected)
+              and by_type == dict(Counter(expected.values())))
+    print(f"{name}：订单数 {store.order_count}（预期 {len(expected)}），按类型积压 {by_type}，"
+          f"{'通过' if passed else f'失败（订单数据：{order_ids}）'}")
+    return passed
+
+
+def run(count):
+    data_gen = DataGenerator()
+    warehouse = build_warehouse(data_gen)
+    orders = data_gen.generate_order_data(count).to_dict("records")
+    warehouse.apply_events([{"事件类型": "新增订单", "订单": order} for order in orders])
+    expected = {order["订单ID"]: order["订单类型"] for order in orders}
+    results = [check("首次上报", warehouse, expected)]
+
+    # 前一半订单重复上报，其中订单类型改为紧急订单
+    repeated = [dict(order, 订单类型="紧急订单") for order in orders[:count // 2]]
+    warehouse.apply_events([{"事件类型": "新增订单", "订单": order} for order in repeated])
+    expected.update({order["订单ID"]: order["订单类型"] for order in repeated})
+    results.append(check("重复上报", warehouse, expected))
+
+    warehouse.apply_events([{"事件类型": "订单完成", "订单ID": order["订单ID"]} for order in orders])
+    results.append(check("全部完成", warehouse, {}))
+    return all(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="订单事件校验")
+    parser.add_argument("--orders", type=int, default=20)
+    args = parser.parse_args()
+    sys.exit(0 if run(args.orders) else 1)
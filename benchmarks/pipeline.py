@@ -0,0 +1,313 @@
+"""全流水线基准测试：固定随机种子的数据在各订单规模下逐阶段计时，记录吞吐量与峰值内存，并与已保存的基线比较
+
+每个规模在独立子进程中运行（进程峰值内存即该规模的峰值内存，各阶段另记内存增量），各阶段完成即回报结果；超过 --timeout 的规模记为超时，
+已完成阶段的结果仍然保留。默认规模为 1k/10k/100k：逐行实现的阶段在百万级订单下无法在默认时限内完成，
+需要时用 --sizes 1000000 并加大 --timeout 单独运行。
+每个规模重复运行 --repeat 次，各阶段报告中位数。回归判定使用各次重复中最小的 CPU 耗时（墙钟耗时受同机其他负载影响，
+仅作报告）：超出基线最小值的 --tolerance 比例再加上基线自身的重复波动时判定为回归；规模峰值内存超出基线 --tolerance
+比例（且超过噪声下限）时同样判定为回归，存在回归时以非零状态退出。
+
+运行方式（项目根目录）：
+    python -m benchmarks.pipeline
+    python -m benchmarks.pipeline --sizes 1000 10000 --devices-per-type 50 --grid 20
+    python -m benchmarks.pipeline --sizes 1000 10000 100000 --update-baseline
+    python -m benchmarks.pipeline --sizes 100000 --devices-per-type 50 --grid 20 --shards 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import time
+import numpy as np
+from config import LOGICAL_PARTITIONS, PARTITION_TOPOLOGY
+from workload_generator import WorkloadGenerator, WORKLOAD_VERSION
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+MATERIALS = ["电子元件", "机械零件", "包装材料", "化工原料", "食品原料"]
+# 噪声下限：CPU 耗时超出部分不超过基线自身的重复波动（至少为计时分辨率）、峰值内存差值低于下限时不判定为回归
+TIMER_RESOLUTION_MS = 0.5
+MIN_REGRESSION_MB = 20.0
+# 与基线比较前必须一致的参数；make_workload 的组装方式变化时同样递增 WORKLOAD_VERSION
+COMPARED_OPTIONS = ["workload_version", "seed", "devices_per_type", "grid", "charts", "shards"]
+
+
+def make_workload(order_count, devices_per_type=None, grid_size=None, seed=2025):
+    """生成基准数据：订单、库存、设备状态与拓扑关系（全部由 seed 决定）"""
+    generator = WorkloadGenerator(seed)
+    if grid_size:
+        partitions, topology_data = generator.grid_topology(grid_size, grid_size)
+        storage_partitions = partitions
+    else:
+        partitions, topology_data = generator.topology_from_adjacency(PARTITION_TOPOLOGY)
+        storage_partitions = LOGICAL_PARTITIONS[:-2]
+    return {
+        "order_data": generator.orders(order_count, storage_partitions, MATERIALS),
+        "inventory_data": generator.inventory(storage_partitions, MATERIALS),
+        "equipment_status": generator.equipment_status(partitions, devices_per_type),
+        "topology_data": topology_data
+    }
+
+
+def _peak_rss_mb():
+    from stage_profiler import process_peak_memory
+    return process_peak_memory() / 1024 ** 2
+
+
+def machine_info():
+    """生成基线的机器信息：Python 版本、平台、CPU 型号与核数、物理内存"""
+    cpu_model = platform.processor()
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            cpu_model = next((line.split(":", 1)[1].strip() for line in f if line.startswith("model name")), cpu_model)
+    except OSError:
+        pass
+    try:
+        memory_gb = round(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024 ** 3, 1)
+    except (AttributeError, ValueError, OSError):
+        memory_gb = None
+    return {"python": platform.python_version(), "平台": platform.platform(), "CPU型号": cpu_model,
+            "CPU数": os.cpu_count(), "内存GB": memory_gb}
+
+
+def _stage_worker(order_count, options, results):
+    """子进程：按流水线顺序运行各阶段，每完成一个阶段通过 results 队列回报"""
+    from logger_utils import NullProgressLogger
+    from stage_profiler import stage_profiler
+    from virtual_warehouse import VirtualWarehouse
+    from adaptive_scheduler import AdaptiveScheduler
+    from task_processor import TaskProcessor
+    from resource_matcher import ResourceMatcher
+    from command_executor import CommandExecutor
+    from state_corrector import StateCorrector
+    from sharded_scheduler import ShardedScheduler
+
+    # 流水线内部仍使用全局 np.random（反馈模拟等），一并固定种子
+    np.random.seed(options["seed"])
+    workload = make_workload(order_count, options["devices_per_type"], options["grid"], options["seed"])
+    stage_profiler.set_mode("basic")
+    stage_profiler.reset()
+
+    progress_logger = NullProgressLogger()
+    virtual_warehouse = VirtualWarehouse(progress_logger)
+    scheduler = AdaptiveScheduler(virtual_warehouse, progress_logger)
+    executor = CommandExecutor(virtual_warehouse, progress_logger)
+    corrector = StateCorrector(virtual_warehouse, progress_logger)
+    data = dict(workload)
+    steps = [
+        ("build_model", lambda: virtual_warehouse.build_model(data["topology_data"], data["equipment_status"])),
+        ("inject_real_time_data", lambda: virtual_warehouse.inject_real_time_data(data["inventory_data"], data["order_data"])),
+        ("implant_core", scheduler.implant_core),
+        ("process_task_request", lambda: TaskProcessor(virtual_warehouse, progress_logger).process_task_request(data["order_data"])),
+        ("match_resources", lambda: ResourceMatcher(virtual_warehouse, data["equipment_status"], progress_logger).match_resources(data["process_task_request"])),
+        ("execute_strategy", lambda: scheduler.execute_strategy(data["match_resources"])),
+        ("issue_commands", lambda: executor.issue_commands(data["execute_strategy"])),
+        ("collect_feedback", lambda: executor.collect_feedback(data["issue_commands"])),
+        ("calculate_deviation", lambda: corrector.calculate_deviation(data["collect_feedback"])),
+        ("calibrate_model", corrector.calibrate_model)
+    ]
+    if options["shards"]:
+        # 分片模式：任务分解、资源匹配与指令生成合并为一个分片调度阶段
+        sharded_scheduler = ShardedScheduler(
+            virtual_warehouse, scheduler, data["equipment_status"], progress_logger,
+            shard_count=options["shards"], max_workers=options["shards"], seed=options["seed"]
+        )
+
+        def sharded_schedule():
+            data["execute_strategy"] = sharded_scheduler.schedule(data["order_data"])
+            data["match_resources"] = sharded_scheduler.resource_plan
+            return data["execute_strategy"]
+
+        steps[3:6] = [("sharded_schedule", sharded_schedule)]
+    if options["charts"]:
+        from chart_generator import chart_generator
+        steps.append(("generate_charts", lambda: chart_generator.generate_charts({
+            "order_data": data["order_data"], "inventory_data": data["inventory_data"],
+            "equipment_status": data["equipment_status"], "topology_data": data["topology_data"],
+            "resource_plan": data["match_resources"], "feedback_data": data["collect_feedback"],
+            "deviation_analysis": data["calculate_deviation"]
+        }, use_cache=False)))
+
+    for stage, step in steps:
+        data[stage] = step()
+        stats = stage_profiler.stages[stage]
+        wall_ms = stats.wall_ms.total
+        rows = max(stats.rows_in, stats.rows_out)
+        results.put((stage, {
+            "墙钟ms": round(wall_ms, 3),
+            "CPUms": round(stats.cpu_ms.total, 3),
+            "输入行数": stats.rows_in,
+            "输出行数": stats.rows_out,
+            "吞吐行每秒": round(rows / (wall_ms / 1000), 1) if wall_ms > 0 and rows else None,
+            "内存增量MB": round((stats.memory_delta or 0) / 1024 ** 2, 1)
+        }))
+    # 规模级峰值内存：每个规模独占一个子进程，进程峰值即本规模的峰值
+    results.put((None, round(_peak_rss_mb(), 1)))
+
+
+def run_size(order_count, options):
+    """在独立子进程中运行一个规模，返回 {"阶段": {...}, "状态": 完成/超时/异常退出, "总耗时s": float}"""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    worker = context.Process(target=_stage_worker, args=(order_count, options, results), daemon=True)
+    start = time.perf_counter()
+    worker.start()
+    stages, status, peak_memory = {}, "完成", None
+    while True:
+        if time.perf_counter() - start > options["timeout"]:
+            status = "超时"
+            break
+        try:
+            stage, metrics = results.get(timeout=1.0)
+        except queue.Empty:
+            if not worker.is_alive():
+                status = "异常退出"
+                break
+            continue
+        if stage is None:
+            peak_memory = metrics
+            break
+        stages[stage] = metrics
+    if worker.is_alive():
+        worker.terminate()
+    worker.join()
+    return {"阶段": stages, "状态": status, "峰值内存MB": peak_memory, "总耗时s": round(time.perf_counter() - start, 2)}
+
+
+def measure_size(order_count, options, repeats):
+    """重复运行一个规模：各阶段的耗时与内存增量取中位数，另记 CPU 耗时的最小值与波动（最大值 - 最小值），
+    峰值内存取中位数；未完成时不再重复"""
+    runs = []
+    for _ in range(repeats):
+        runs.append(run_size(order_count, options))
+        if runs[-1]["状态"] != "完成":
+            break
+    stages = {}
+    for stage, first in runs[0]["阶段"].items():
+        samples = [run["阶段"][stage] for run in runs if stage in run["阶段"]]
+        if len(samples) < len(runs):
+            continue
+        merged = dict(first)
+        for key in ["墙钟ms", "CPUms", "内存增量MB"]:
+            merged[key] = round(float(np.median([sample[key] for sample in samples])), 3)
+        cpu_ms = [sample["CPUms"] for sample in samples]
+        merged["CPUms最小"] = round(min(cpu_ms), 3)
+        merged["CPUms波动"] = round(max(cpu_ms) - min(cpu_ms), 3)
+        rows = max(merged["输入行数"], merged["输出行数"])
+        merged["吞吐行每秒"] = round(rows / (merged["墙钟ms"] / 1000), 1) if merged["墙钟ms"] > 0 and rows else None
+        stages[stage] = merged
+    peaks = [run["峰值内存MB"] for run in runs if run["峰值内存MB"] is not None]
+    return {
+        "阶段": stages,
+        "状态": runs[-1]["状态"],
+        "重复次数": len(runs),
+        "峰值内存MB": round(float(np.median(peaks)), 1) if peaks else None,
+        "总耗时s": round(sum(run["总耗时s"] for run in runs), 2)
+    }
+
+
+def print_size(order_count, result):
+    suffix = "" if result["状态"] == "完成" else f"（{result['状态']}，未完成的阶段未计入）"
+    peak = f"，峰值内存：{result['峰值内存MB']}MB" if result.get("峰值内存MB") is not None else ""
+    print(f"\n订单数：{order_count:,}，重复{result['重复次数']}次，总耗时：{result['总耗时s']}s{peak}{suffix}（各阶段为中位数）")
+    print(f"{'阶段':<24}{'墙钟ms':>12}{'CPUms':>12}{'输入行':>12}{'输出行':>12}{'吞吐(行/s)':>14}{'内存增量MB':>12}")
+    for stage, metrics in result["阶段"].items():
+        throughput = f"{metrics['吞吐行每秒']:,.0f}" if metrics["吞吐行每秒"] else "-"
+        print(f"{stage:<24}{metrics['墙钟ms']:>12.1f}{metrics['CPUms']:>12.1f}{metrics['输入行数']:>12}"
+              f"{metrics['输出行数']:>12}{throughput:>14}{metrics['内存增量MB']:>12.1f}")
+
+
+def compare(results, baseline, tolerance):
+    """与基线比较（各阶段耗时、规模峰值内存），返回回归描述列表"""
+    regressions = []
+    for size, result in results.items():
+        base_result = baseline.get("结果", {}).get(size)
+        if base_result is None:
+            continue
+        for stage, base in base_result["阶段"].items():
+            current = result["阶段"].get(stage)
+            if current is None:
+                regressions.append(f"{size} 订单 {stage}：基线已完成，本次{result['状态']}未完成")
+                continue
+            base_cpu = base.get("CPUms最小", base["CPUms"])
+            noise = max(base.get("CPUms波动", 0.0), TIMER_RESOLUTION_MS)
+            current_cpu = current.get("CPUms最小", current["CPUms"])
+            if current_cpu > base_cpu * (1 + tolerance) + noise:
+                regressions.append(
+                    f"{size} 订单 {stage} 最小CPUms：{current_cpu:.1f} > 基线 {base_cpu:.1f} × {1 + tolerance:.2f}"
+                    f" + 基线波动 {noise:.1f}"
+                )
+        base_peak, peak = base_result.get("峰值内存MB"), result.get("峰值内存MB")
+        if base_peak is not None and peak is not None and peak > base_peak * (1 + tolerance) and \
+                peak - base_peak > MIN_REGRESSION_MB:
+            regressions.append(f"{size} 订单 峰值内存MB：{peak:.1f} > 基线 {base_peak:.1f} × {1 + tolerance:.2f}")
+    return regressions
+
+
+def run(args):
+    options = {
+        "workload_version": WORKLOAD_VERSION,
+        "seed": args.seed,
+        "devices_per_type": args.devices_per_type,
+        "grid": args.grid,
+        "charts": args.charts,
+        "shards": args.shards,
+        "timeout": args.timeout,
+        "repeat": args.repeat
+    }
+    results = {}
+    for size in args.sizes:
+        result = measure_size(size, options, args.repeat)
+        results[str(size)] = result
+        print_size(size, result)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"参数": options, "结果": results}, f, ensure_ascii=False, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "参数": options,
+                "环境": machine_info(),
+                "结果": results
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已更新：{args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\n未找到基线文件 {args.baseline}，跳过回归比较（使用 --update-baseline 生成）")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    mismatched = [key for key in COMPARED_OPTIONS if baseline.get("参数", {}).get(key) != options[key]]
+    if mismatched:
+        print(f"\n基线与本次运行的 {'、'.join(mismatched)} 不一致（基线已过期或参数不同），跳过回归比较")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n发现 {len(regressions)} 项性能回归（容差 {args.tolerance:.0%}）：")
+        for regression in regressions:
+            print(f"  - {regression}")
+        return 1
+    print(f"\n与基线相比无性能回归（容差 {args.tolerance:.0%}）")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="全流水线基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--devices-per-type", type=int, default=None, help="每种设备类型的设备数（默认使用 config.EQUIPMENTS）")
+    parser.add_argument("--grid", type=int, default=None, help="使用 N×N 网格拓扑（默认使用 config.PARTITION_TOPOLOGY）")
+    parser.add_argument("--charts", action="store_true", help="同时测量图表生成阶段（会覆盖 charts/ 下的图表）")
+    parser.add_argument("--shards", type=int, default=None, help="使用分片调度（分区簇数与进程数上限）")
+    parser.add_argument("--seed", type=int, default=2025)
+    parser.add_argument("--timeout", type=float, default=600.0, help="单个规模的最长运行时间（秒）")
+    parser.add_argument("--repeat", type=int, default=3, help="每个规模的重复运行次数（各阶段取中位数）")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="相对基线允许的 CPU 耗时/峰值内存增幅")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", default=None, help="将本次结果另存为 JSON")
+    raise SystemExit(run(parser.parse_args()))
@@ -0,0 +1,107 @@
+"""任务分解基准测试：对比逐行 iterrows 实现与列式分解引擎
+
+运行方式（项目根目录）：
+    python -m benchmarks.task_decomposition
+    python -m benchmarks.task_decomposition --sizes 1000 10000 --legacy-limit 10000
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from config import LOGICAL_PARTITIONS, PARTITION_TOPOLOGY
+from data_generator import DataGenerator
+from logger_utils import NullProgressLogger
+from virtual_warehouse import VirtualWarehouse
+from task_processor import TaskProcessor, ATOMIC_OPERATIONS
+
+MATERIALS = ["电子元件", "机械零件", "包装材料", "化工原料", "食品原料"]
+
+
+def make_orders(count, seed=2025):
+    """生成指定规模的订单数据（向量化，固定随机种子）"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "订单ID": [f"ORD{2025001 + i}" for i in range(count)],
+        "物料名称": rng.choice(MATERIALS, count),
+        "目标位置": rng.choice(LOGICAL_PARTITIONS[:-2], count),
+        "订单类型": rng.choice(["紧急订单", "普通订单", "超时订单"], count, p=[0.2, 0.6, 0.2])
+    })
+
+
+def legacy_decompose(virtual_warehouse, order_data):
+    """原逐行分解实现，作为正确性与性能基线"""
+    decomposition_results = []
+    inventory_state = virtual_warehouse.current_state["库存状态"]
+    for _, order in order_data.iterrows():
+        related_partitions = [
+            inventory_state[p].get("逻辑分区")
+            for p in inventory_state
+            if inventory_state[p].get(order["物料名称"], 0) > 0
+        ] + [order["目标位置"]]
+        related_partitions = list(set(related_partitions))
+        for i, op in enumerate(ATOMIC_OPERATIONS):
+            decomposition_results.append({
+                "任务ID": order["订单ID"],
+                "物料名称": order["物料名称"],
+                "目标位置": order["目标位置"],
+                "订单类型": order["订单类型"],
+                "原子操作": op,
+                "操作序号": i + 1,
+                "涉及分区": ",".join(related_partitions),
+                "操作依赖": ATOMIC_OPERATIONS[i-1] if i > 0 else "无"
+            })
+    return pd.DataFrame(decomposition_results)
+
+
+def _normalize_partitions(task_graph):
+    """涉及分区在原实现中由 set 去重，顺序不固定，比较前统一排序"""
+    normalized = task_graph.copy()
+    normalized["涉及分区"] = normalized["涉及分区"].map(lambda s: ",".join(sorted(s.split(","))))
+    return normalized
+
+
+def build_warehouse():
+    data_gen = DataGenerator()
+    virtual_warehouse = VirtualWarehouse(NullProgressLogger())
+    virtual_warehouse.build_model(
+        data_gen.generate_topology_data(PARTITION_TOPOLOGY),
+        data_gen.generate_equipment_status()
+    )
+    virtual_warehouse.inject_real_time_data(data_gen.generate_inventory_data(), make_orders(1))
+    return virtual_warehouse
+
+
+def run(sizes, legacy_limit):
+    np.random.seed(2025)
+    virtual_warehouse = build_warehouse()
+    processor = TaskProcessor(virtual_warehouse, NullProgressLogger())
+
+    print(f"{'订单数':>10} {'原子操作数':>12} {'列式(s)':>10} {'逐行(s)':>10} {'加速比':>8}")
+    for size in sizes:
+        order_data = make_orders(size)
+
+        start = time.perf_counter()
+        task_graph = processor.process_task_request(order_data)
+        columnar_time = time.perf_counter() - start
+
+        legacy_time = None
+        if size <= legacy_limit:
+            start = time.perf_counter()
+            expected = legacy_decompose(virtual_warehouse, order_data)
+            legacy_time = time.perf_counter() - start
+            pd.testing.assert_frame_equal(
+                _normalize_partitions(task_graph), _normalize_partitions(expected)
+            )
+
+        legacy_text = f"{legacy_time:10.3f}" if legacy_time is not None else f"{'-':>10}"
+        speedup_text = f"{legacy_time / columnar_time:8.1f}" if legacy_time is not None else f"{'-':>8}"
+        print(f"{size:>10} {len(task_graph):>12} {columnar_time:10.3f} {legacy_text} {speedup_text}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="任务分解基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-limit", type=int, default=100_000,
+                        help="逐行基线实现的最大订单规模（更大规模只测列式引擎）")
+    args = parser.parse_args()
+    run(args.sizes, args.legacy_limit)
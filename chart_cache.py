@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import pandas as pd
+from config import CHART_CACHE_PATH, CHART_CACHE_MAX_BYTES
+
+class ChartCache:
+    """内容寻址图表缓存：以图表输入列与渲染参数的哈希为键，磁盘清单记录条目，按总字节数做 LRU 淘汰"""
+    def __init__(self, cache_dir=CHART_CACHE_PATH, max_bytes=CHART_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.manifest_path = os.path.join(cache_dir, "manifest.json")
+        os.makedirs(cache_dir, exist_ok=True)
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+        return {"entries": {}, "outputs": {}}
+
+    def _save_manifest(self):
+        # 先写临时文件再替换，避免并发读取到半截清单
+        temp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, ensure_ascii=False)
+        os.replace(temp_path, self.manifest_path)
+
+    @staticmethod
+    def make_key(chart_name, frames, render_params):
+        """计算图表缓存键：图表名 + 各输入切片的列名/类型/行哈希 + 渲染参数"""
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(chart_name.encode("utf-8"))
+        for frame in frames:
+            digest.update(repr([(str(col), str(dtype)) for col, dtype in frame.dtypes.items()]).encode("utf-8"))
+            digest.update(str(len(frame)).encode("utf-8"))
+            if len(frame.columns):
+                digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+        digest.update(repr(sorted(render_params.items())).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.png")
+
+    def is_current(self, output_path, key):
+        """输出文件已由同一缓存键生成且仍存在时无需任何处理"""
+        return self.manifest["outputs"].get(output_path) == key and os.path.exists(output_path)
+
+    def fetch(self, key, output_path):
+        """缓存命中时将缓存文件复制到输出路径并返回 True"""
+        entry = self.manifest["entries"].get(key)
+        if entry is None or not os.path.exists(self._entry_path(key)):
+            return False
+        shutil.copyfile(self._entry_path(key), output_path)
+        entry["last_access"] = time.time()
+        self.manifest["outputs"][output_path] = key
+        return True
+
+    def store(self, key, output_path):
+        """将新渲染的输出文件写入缓存，并按总字节数淘汰最久未使用的条目"""
+        shutil.copyfile(output_path, self._entry_path(key))
+        self.manifest["entries"][key] = {
+            "bytes": os.path.getsize(output_path),
+            "last_access": time.time()
+        }
+        self.manifest["outputs"][output_path] = key
+        self._evict()
+
+    def _evict(self):
+        entries = self.manifest["entries"]
+        total_bytes = sum(entry["bytes"] for entry in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k]["last_access"]):
+            if total_bytes <= self.max_bytes:
+                break
+            total_bytes -= entries.pop(key)["bytes"]
+            if os.path.exists(self._entry_path(key)):
+                os.remove(self._entry_path(key))
+
+    def commit(self):
+        self._save_manifest()
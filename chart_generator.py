@@ -1,53 +1,133 @@
+import matplotlib
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
-from config import CHART_SAVE_PATH, FONT_NAME, CHART_DPI, STATE_DEVIATION_THRESHOLD  # 新增STATE_DEVIATION_THRESHOLD
+from config import (CHART_SAVE_PATH, FONT_NAME, CHART_DPI, STATE_DEVIATION_THRESHOLD,  # 新增STATE_DEVIATION_THRESHOLD
+                    CHART_PARALLEL_RENDER, CHART_MAX_WORKERS)
+from concurrent.futures import ProcessPoolExecutor
+from chart_cache import ChartCache
+import io
 import os
+import time
+from stage_profiler import profiled_stage
 
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = [FONT_NAME]
 plt.rcParams['axes.unicode_minus'] = False
 
+# 绘图代码变更时递增，使旧的图表缓存失效
+CHART_RENDER_VERSION = 1
+
+# 图表绘制方法→输出文件名
+CHART_FILE_NAMES = {
+    "plot_equipment_load_trend": "1_设备运行负荷趋势图.png",
+    "plot_partition_order_backlog": "2_分区订单积压量对比.png",
+    "plot_equipment_resource_ratio": "3_设备资源占用比例.png",
+    "plot_state_deviation_distribution": "4_状态偏差值分布.png",
+    "plot_task_operation_completion": "5_任务操作完成情况.png",
+    "plot_partition_radar_chart": "6_分区多维度指标雷达图.png",
+    "plot_resource_plan_table": "7_资源匹配方案详情表.png"
+}
+
+def chart_path(method_name):
+    return os.path.join(CHART_SAVE_PATH, CHART_FILE_NAMES[method_name])
+
 class ChartGenerator:
     def __init__(self):
         # 创建图表保存目录
         if not os.path.exists(CHART_SAVE_PATH):
             os.makedirs(CHART_SAVE_PATH)
     
-    def generate_charts(self, all_data):
-        """生成所有图表"""
-        equipment_status = all_data["equipment_status"]
-        order_data = all_data["order_data"]
-        resource_plan = all_data["resource_plan"]
-        feedback_data = all_data["feedback_data"]
-        deviation_analysis = all_data["deviation_analysis"]
-        topology_data = all_data["topology_data"]
-        inventory_data = all_data["inventory_data"]
-        
-        # 1. 设备运行负荷趋势图
-        self.plot_equipment_load_trend(equipment_status)
-        
-        # 2. 各分区订单积压量对比
-        self.plot_partition_order_backlog(order_data, resource_plan)
-        
-        # 3. 设备资源占用比例
-        self.plot_equipment_resource_ratio(resource_plan)
-        
-        # 4. 状态偏差值分布
-        self.plot_state_deviation_distribution(deviation_analysis)
-        
-        # 5. 各任务原子操作完成情况
-        self.plot_task_operation_completion(resource_plan, feedback_data)
-        
-        # 6. 分区多维度指标雷达图
-        self.plot_partition_radar_chart(topology_data, inventory_data, resource_plan)
-        
-        # 7. 资源匹配方案详情表
-        self.plot_resource_plan_table(resource_plan.head(10))
-        
+    @profiled_stage("generate_charts")
+    def generate_charts(self, all_data, parallel=CHART_PARALLEL_RENDER, use_cache=True):
+        """生成所有图表，返回各图表渲染耗时（秒，命中缓存为 0）"""
+        chart_jobs = self.build_chart_jobs(all_data)
+        render_times = {}
+        
+        # 输入数据与渲染参数未变化的图表直接使用缓存，仅重新渲染有变化的图表
+        cache = ChartCache() if use_cache else None
+        cache_keys = {}
+        if cache is not None:
+            dirty_jobs = []
+            for name, args in chart_jobs:
+                key = ChartCache.make_key(name, args, self.render_params())
+                output_path = chart_path(name)
+                if cache.is_current(output_path, key) or cache.fetch(key, output_path):
+                    render_times[name] = 0.0
+                else:
+                    cache_keys[name] = key
+                    dirty_jobs.append((name, args))
+            chart_jobs = dirty_jobs
+        
+        max_workers = min(CHART_MAX_WORKERS, len(chart_jobs), os.cpu_count() or 1)
+        if parallel and max_workers > 1:
+            # 并行渲染：每张图表交给独立进程（Agg 后端），仅传递所需的列切片；单核环境退回串行
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_render_worker) as pool:
+                futures = {name: pool.submit(_render_chart, name, args) for name, args in chart_jobs}
+                render_times.update({name: future.result() for name, future in futures.items()})
+        else:
+            render_times.update({name: _render_chart(name, args, self) for name, args in chart_jobs})
+        
+        if cache is not None:
+            for name, key in cache_keys.items():
+                cache.store(key, chart_path(name))
+            cache.commit()
+        
+        self.render_times = render_times
+        for name, seconds in render_times.items():
+            status = "已渲染" if name in cache_keys or cache is None else "命中缓存"
+            print(f"{name} {status}，耗时：{seconds:.2f}s")
         print(f"\n所有图表已保存至：{CHART_SAVE_PATH}")
+        return render_times
+    
+    def render_params(self):
+        """影响图表输出的渲染参数，参与缓存键计算"""
+        return {
+            "version": CHART_RENDER_VERSION,
+            "dpi": CHART_DPI,
+            "font": FONT_NAME,
+            "threshold": STATE_DEVIATION_THRESHOLD
+        }
+    
+    def build_chart_jobs(self, all_data):
+        """按图表列出绘图方法及其所需的最小数据切片"""
+        return [(name, self.chart_inputs(name, all_data)) for name in CHART_FILE_NAMES]
     
-    def plot_equipment_load_trend(self, equipment_status):
+    def chart_inputs(self, name, all_data):
+        """单张图表绘图方法所需的最小数据切片"""
+        if name == "plot_equipment_load_trend":
+            # 1. 设备运行负荷趋势图
+            return (all_data["equipment_status"][["设备类型", "设备ID", "运行负荷"]],)
+        if name == "plot_partition_order_backlog":
+            # 2. 各分区订单积压量对比
+            return (all_data["order_data"][[]], all_data["resource_plan"][["目标位置", "任务ID"]])
+        if name == "plot_equipment_resource_ratio":
+            # 3. 设备资源占用比例
+            return (all_data["resource_plan"][["设备类型"]],)
+        if name == "plot_state_deviation_distribution":
+            # 4. 状态偏差值分布
+            return (all_data["deviation_analysis"][["设备ID", "综合偏差值"]],)
+        if name == "plot_task_operation_completion":
+            # 5. 各任务原子操作完成情况
+            return (all_data["resource_plan"][["任务ID", "原子操作", "设备类型"]],
+                    all_data["feedback_data"][["任务ID", "任务完成进度"]])
+        if name == "plot_partition_radar_chart":
+            # 6. 分区多维度指标雷达图
+            return (all_data["topology_data"][[]], all_data["inventory_data"][["逻辑分区"]],
+                    all_data["resource_plan"][[]])
+        if name == "plot_resource_plan_table":
+            # 7. 资源匹配方案详情表
+            display_cols = ["任务ID", "物料名称", "原子操作", "分配设备", "执行时间", "资源状态"]
+            return (all_data["resource_plan"].head(10)[display_cols],)
+        raise KeyError(f"未知的图表：{name}")
+    
+    def render_chart_bytes(self, name, args):
+        """在内存中渲染单张图表，返回 PNG 字节"""
+        buffer = io.BytesIO()
+        getattr(self, name)(*args, output=buffer)
+        return buffer.getvalue()
+    
+    def plot_equipment_load_trend(self, equipment_status, output=None):
         """1. 设备运行负荷趋势图（折线图）"""
         fig, ax = plt.subplots(figsize=(12, 6))
         
@@ -71,10 +151,10 @@ class ChartGenerator:
         ax.set_ylim(0, 100)
         
         plt.tight_layout()
-        plt.savefig(f"{CHART_SAVE_PATH}/1_设备运行负荷趋势图.png", dpi=CHART_DPI, bbox_inches='tight')
+        plt.savefig(output or chart_path("plot_equipment_load_trend"), dpi=CHART_DPI, bbox_inches='tight')
         plt.close()
     
-    def plot_partition_order_backlog(self, order_data, resource_plan):
+    def plot_partition_order_backlog(self, order_data, resource_plan, output=None):
         """2. 各分区订单积压量对比（柱状图）"""
         fig, ax = plt.subplots(figsize=(12, 6))
         
@@ -96,10 +176,10 @@ class ChartGenerator:
         ax.grid(True, alpha=0.3, axis='y')
         
         plt.tight_layout()
-        plt.savefig(f"{CHART_SAVE_PATH}/2_分区订单积压量对比.png", dpi=CHART_DPI, bbox_inches='tight')
+        plt.savefig(output or chart_path("plot_partition_order_backlog"), dpi=CHART_DPI, bbox_inches='tight')
         plt.close()
     
-    def plot_equipment_resource_ratio(self, resource_plan):
+    def plot_equipment_resource_ratio(self, resource_plan, output=None):
         """3. 设备资源占用比例（饼图）"""
         fig, ax = plt.subplots(figsize=(10, 8))
         
@@ -124,10 +204,10 @@ class ChartGenerator:
         ax.set_title("各类型设备资源占用比例", fontsize=16, fontweight='bold', pad=20)
         
         plt.tight_layout()
-        plt.savefig(f"{CHART_SAVE_PATH}/3_设备资源占用比例.png", dpi=CHART_DPI, bbox_inches='tight')
+        plt.savefig(output or chart_path("plot_equipment_resource_ratio"), dpi=CHART_DPI, bbox_inches='tight')
         plt.close()
     
-    def plot_state_deviation_distribution(self, deviation_analysis):
+    def plot_state_deviation_distribution(self, deviation_analysis, output=None):
         """4. 状态偏差值分布（散点图）"""
         fig, ax = plt.subplots(figsize=(12, 6))
         
@@ -154,10 +234,10 @@ class ChartGenerator:
         ax.grid(True, alpha=0.3)
         
         plt.tight_layout()
-        plt.savefig(f"{CHART_SAVE_PATH}/4_状态偏差值分布.png", dpi=CHART_DPI, bbox_inches='tight')
+        plt.savefig(output or chart_path("plot_state_deviation_distribution"), dpi=CHART_DPI, bbox_inches='tight')
         plt.close()
     
-    def plot_task_operation_completion(self, resource_plan, feedback_data):
+    def plot_task_operation_completion(self, resource_plan, feedback_data, output=None):
         """5. 各任务原子操作完成情况（堆叠柱状图）"""
         fig, ax = plt.subplots(figsize=(14, 7))
         
@@ -185,10 +265,10 @@ class ChartGenerator:
         
         plt.xticks(rotation=45)
         plt.tight_layout()
-        plt.savefig(f"{CHART_SAVE_PATH}/5_任务操作完成情况.png", dpi=CHART_DPI, bbox_inches='tight')
+        plt.savefig(output or chart_path("plot_task_operation_completion"), dpi=CHART_DPI, bbox_inches='tight')
         plt.close()
     
-    def plot_partition_radar_chart(self, topology_data, inventory_data, resource_plan):
+    def plot_partition_radar_chart(self, topology_data, inventory_data, resource_plan, output=None):
         """6. 分区多维度指标雷达图"""
         # 计算各分区指标
         partitions = inventory_data["逻辑分区"]
@@ -222,10 +302,10 @@ class ChartGenerator:
         ax.legend(loc='upper right', bbox_to_anchor=(1.2, 1.1), fontsize=10)
         
         plt.tight_layout()
-        plt.savefig(f"{CHART_SAVE_PATH}/6_分区多维度指标雷达图.png", dpi=CHART_DPI, bbox_inches='tight')
+        plt.savefig(output or chart_path("plot_partition_radar_chart"), dpi=CHART_DPI, bbox_inches='tight')
         plt.close()
     
-    def plot_resource_plan_table(self, resource_plan):
+    def plot_resource_plan_table(self, resource_plan, output=None):
         """7. 资源匹配方案详情表（表格图）"""
         fig, ax = plt.subplots(figsize=(16, 8))
         ax.axis('tight')
@@ -263,7 +343,17 @@ class ChartGenerator:
         ax.set_title("资源匹配方案详情表（前10条）", fontsize=16, fontweight='bold', pad=20)
         
         plt.tight_layout()
-        plt.savefig(f"{CHART_SAVE_PATH}/7_资源匹配方案详情表.png", dpi=CHART_DPI, bbox_inches='tight')
+        plt.savefig(output or chart_path("plot_resource_plan_table"), dpi=CHART_DPI, bbox_inches='tight')
         plt.close()
 
+def _init_render_worker():
+    # 渲染子进程使用无界面后端
+    matplotlib.use("Agg")
+
+def _render_chart(method_name, args, generator=None):
+    """渲染单张图表，返回耗时（秒）；可在子进程中独立执行"""
+    start = time.perf_counter()
+    getattr(generator or ChartGenerator(), method_name)(*args)
+    return time.perf_counter() - start
+
 chart_generator = ChartGenerator()
\ No newline at end of file
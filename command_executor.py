@@ -1,7 +1,7 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime
-import time
+from stage_profiler import profiled_stage
 
 class CommandExecutor:
     def __init__(self, virtual_warehouse, progress_logger):
@@ -9,43 +9,40 @@ class CommandExecutor:
         self.feedback_data = pd.DataFrame()
         self.progress_logger = progress_logger  
     
+    @profiled_stage("issue_commands")
     def issue_commands(self, control_commands):
         """下发控制指令序列"""
         self.progress_logger.update_progress(9, "开始向物理执行终端下发控制指令")
-        time.sleep(4)
+        self.progress_logger.pace(4)
         
-        # 指令下发
-        issued_commands = control_commands.copy()
-        issued_commands["下发状态"] = "已下发"
-        issued_commands["下发时间"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # 指令下发：标记下发时间，与 control_commands 共享指令数据
+        issued_commands = control_commands.issue(datetime.now().replace(microsecond=0))
         
         self.progress_logger.update_progress(8, f"共下发{len(issued_commands)}条控制指令")
-        time.sleep(3)
+        self.progress_logger.pace(3)
         
         return issued_commands
     
+    @profiled_stage("collect_feedback")
     def collect_feedback(self, issued_commands):
         """采集物理执行终端反馈数据流"""
         self.progress_logger.update_progress(10, "开始采集物理执行终端反馈数据")
-        time.sleep(5)
+        self.progress_logger.pace(5)
         
-        feedback_data = []
+        count = len(issued_commands)
         status_codes = [200, 200, 200, 201, 202]  
-        for _, cmd in issued_commands.iterrows():
-            feedback = {
-                "指令ID": cmd["指令ID"],
-                "任务ID": cmd["任务ID"],
-                "设备ID": cmd["分配设备"],
-                "状态码": np.random.choice(status_codes, p=[0.6, 0.2, 0.1, 0.05, 0.05]),
-                "当前位置": np.random.choice(self.virtual_warehouse.logical_partitions),
-                "任务完成进度": np.random.randint(70, 100),
-                "反馈时间": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "异常信息": "" if np.random.random() > 0.1 else "轻微路径偏差"
-            }
-            feedback_data.append(feedback)
-        
-        self.feedback_data = pd.DataFrame(feedback_data)
+        self.feedback_data = pd.DataFrame({
+            "指令ID": issued_commands.command_ids(),
+            "任务ID": issued_commands.decode("任务ID"),
+            "设备ID": issued_commands.decode("分配设备"),
+            "状态码": np.random.choice(status_codes, count, p=[0.6, 0.2, 0.1, 0.05, 0.05]),
+            "当前位置": np.random.choice(self.virtual_warehouse.logical_partitions, count),
+            "任务完成进度": np.random.randint(70, 100, count),
+            "运行负荷": np.random.randint(30, 95, count),
+            "反馈时间": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "异常信息": np.where(np.random.random(count) > 0.1, "", "轻微路径偏差").astype(object)
+        })
         self.progress_logger.update_progress(9, "反馈数据采集完成")
-        time.sleep(4)
+        self.progress_logger.pace(4)
         
         return self.feedback_data
\ No newline at end of file
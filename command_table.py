@@ -0,0 +1,268 @@
+import copy
+import struct
+import numpy as np
+import pandas as pd
+
+COMMAND_ID_PREFIX = "CMD"
+# 定长列（按二进制线格式中的顺序）：编码列的值为对应标签表的下标，时间为 int64 纳秒
+COLUMN_DTYPES = {
+    "指令序号": np.int64,
+    "任务ID": np.int32,
+    "原子操作": np.int16,
+    "分配设备": np.int32,
+    "执行时间": np.int64,
+    "目标位置": np.int32,
+    "优先级": np.int8,
+    "执行时长上限": np.int64,
+    "冲突避让": np.int16
+}
+# 编码列→标签表；目标位置与路径共用分区标签表
+CODED_COLUMNS = {"任务ID": "任务ID", "原子操作": "原子操作", "分配设备": "分配设备", "目标位置": "分区", "冲突避让": "冲突避让"}
+LABEL_TABLES = ["任务ID", "原子操作", "分配设备", "分区", "冲突避让"]
+WIRE_MAGIC = b"CMDT"
+WIRE_VERSION = 1
+WIRE_HEADER = struct.Struct("<4sB3xQQq")
+NOT_ISSUED = pd.NaT.value
+
+def _padding(size):
+    return b"\0" * (-size % 8)
+
+def _remap(codes, mapping):
+    """按编码映射表重编码，-1（缺失）保持不变"""
+    return np.where(codes >= 0, mapping[np.maximum(codes, 0)], -1).astype(codes.dtype) if len(mapping) else codes.copy()
+
+def _encode_labels(labels, values):
+    """在标签表中查找（必要时追加）标签，返回（编码数组, 新标签表）"""
+    index = pd.Index(labels)
+    missing = pd.Index(pd.unique(np.asarray(values, dtype=object))).difference(index, sort=False)
+    if len(missing):
+        labels = np.concatenate([labels, np.asarray(missing, dtype=object)])
+        index = pd.Index(labels)
+    return index.get_indexer(np.asarray(values, dtype=object)), labels
+
+class CommandTable:
+    """类型化控制指令表：标签列为整数编码（附标签表），路径按 偏移量+分区编码 展平存储，时间与时长为 int64 纳秒；
+    行选择与下发只生成共享底层数组的视图"""
+    def __init__(self, columns, labels, path_offsets, path_values, issued_at=NOT_ISSUED):
+        self.columns = columns
+        self.labels = labels
+        self.path_offsets = path_offsets
+        self.path_values = path_values
+        self.issued_at = issued_at
+
+    @classmethod
+    def build(cls, command_numbers, task_ids, operations, devices, execute_times, targets, priorities,
+              max_durations, conflicts, paths, partitions):
+        """由逐行数据构建：paths 为每行的分区名列表，partitions 为共享的分区 CodeTable"""
+        columns, labels = {"指令序号": np.asarray(command_numbers, dtype=np.int64)}, {}
+        for name, values in [("任务ID", task_ids), ("原子操作", operations), ("分配设备", devices), ("冲突避让", conflicts)]:
+            codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+            columns[name] = codes.astype(COLUMN_DTYPES[name])
+            labels[name] = np.asarray(uniques, dtype=object)
+        columns["执行时间"] = pd.to_datetime(np.asarray(execute_times, dtype=object)).to_numpy("datetime64[ns]").view(np.int64)
+        columns["目标位置"] = partitions.encode_many(targets)
+        columns["优先级"] = np.asarray(priorities, dtype=np.int8)
+        columns["执行时长上限"] = np.asarray(max_durations, dtype="timedelta64[ns]").view(np.int64)
+
+        lengths = np.fromiter(map(len, paths), dtype=np.int64, count=len(paths))
+        path_offsets = np.zeros(len(paths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=path_offsets[1:])
+        flat_path = [partition for path in paths for partition in path]
+        path_values = partitions.encode_many(flat_path) if flat_path else np.zeros(0, dtype=np.int32)
+        labels["分区"] = np.array(partitions.labels, dtype=object)
+        return cls(columns, labels, path_offsets, path_values)
+
+    @classmethod
+    def concat(cls, tables):
+        """合并多张未下发的指令表：各标签表取并集，编码列与路径按合并后的标签表重新编码"""
+        labels, mappings = {}, {}
+        for table in LABEL_TABLES:
+            merged = pd.Index(np.concatenate([command_table.labels[table] for command_table in tables])).unique()
+            labels[table] = np.asarray(merged, dtype=object)
+            mappings[table] = [merged.get_indexer(command_table.labels[table]).astype(np.int32) for command_table in tables]
+
+        columns = {}
+        for name, dtype in COLUMN_DTYPES.items():
+            parts = []
+            for position, command_table in enumerate(tables):
+                column = command_table.columns[name]
+                if name in CODED_COLUMNS:
+                    column = _remap(column, mappings[CODED_COLUMNS[name]][position])
+                parts.append(column.astype(dtype, copy=False))
+            columns[name] = np.concatenate(parts)
+
+        lengths = np.concatenate([np.diff(command_table.path_offsets) for command_table in tables])
+        path_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=path_offsets[1:])
+        path_values = np.concatenate([
+            _remap(command_table.path_values, mappings["分区"][position]) for position, command_table in enumerate(tables)
+        ]).astype(np.int32)
+        return cls(columns, labels, path_offsets, path_values)
+
+    def replace_rows(self, rows, paths, execute_times, conflicts):
+        """替换指定行的路径、执行时间与冲突避让，返回新表（其余行的数据与标签保持不变）"""
+        rows = np.asarray(rows, dtype=np.int64)
+        columns, labels = dict(self.columns), dict(self.labels)
+        columns["执行时间"] = self.columns["执行时间"].copy()
+        columns["执行时间"][rows] = pd.to_datetime(np.asarray(execute_times, dtype=object)).to_numpy("datetime64[ns]").view(np.int64)
+        conflict_codes, labels["冲突避让"] = _encode_labels(self.labels["冲突避让"], conflicts)
+        columns["冲突避让"] = self.columns["冲突避让"].copy()
+        columns["冲突避让"][rows] = conflict_codes
+
+        # 重建路径：保留行按原偏移量搬运，替换行写入新路径
+        lengths = np.diff(self.path_offsets)
+        new_lengths = lengths.copy()
+        new_lengths[rows] = np.fromiter(map(len, paths), dtype=np.int64, count=len(rows))
+        path_offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(new_lengths, out=path_offsets[1:])
+        path_values = np.empty(path_offsets[-1], dtype=np.int32)
+        kept = np.ones(len(self), dtype=bool)
+        kept[rows] = False
+        kept = np.flatnonzero(kept)
+        kept_lengths = lengths[kept]
+        source = np.repeat(self.path_offsets[kept] - np.cumsum(kept_lengths) + kept_lengths, kept_lengths)
+        target = np.repeat(path_offsets[kept] - np.cumsum(kept_lengths) + kept_lengths, kept_lengths)
+        step = np.arange(kept_lengths.sum())
+        path_values[target + step] = self.path_values[source + step]
+        flat_path = [partition for path in paths for partition in path]
+        path_codes, labels["分区"] = _encode_labels(self.labels["分区"], flat_path)
+        replaced = np.repeat(path_offsets[rows], new_lengths[rows])
+        replaced += np.arange(len(replaced)) - np.repeat(np.cumsum(new_lengths[rows]) - new_lengths[rows], new_lengths[rows])
+        path_values[replaced] = path_codes
+        return CommandTable(columns, labels, path_offsets, path_values, self.issued_at)
+
+    def __len__(self):
+        return len(self.columns["指令序号"])
+
+    @property
+    def shape(self):
+        return len(self), len(self.columns) + 1
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    @property
+    def is_issued(self):
+        return self.issued_at != NOT_ISSUED
+
+    def decode(self, column):
+        """编码列→标签数组"""
+        return self.labels[CODED_COLUMNS[column]][self.columns[column]]
+
+    def command_ids(self):
+        return np.char.add(COMMAND_ID_PREFIX, self.columns["指令序号"].astype(str)).astype(object)
+
+    def path(self, row):
+        """单条指令的路径（分区名列表）"""
+        codes = self.path_values[self.path_offsets[row]:self.path_offsets[row + 1]]
+        return self.labels["分区"][codes].tolist()
+
+    def select(self, rows):
+        """按行号（或布尔掩码）选择指令，返回新表；标签表共享"""
+        rows = np.flatnonzero(rows) if np.asarray(rows).dtype == bool else np.asarray(rows, dtype=np.int64)
+        starts = self.path_offsets[rows]
+        lengths = self.path_offsets[rows + 1] - starts
+        path_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=path_offsets[1:])
+        gather = np.repeat(starts - path_offsets[:-1], lengths) + np.arange(path_offsets[-1])
+        return CommandTable(
+            {name: column[rows] for name, column in self.columns.items()},
+            self.labels, path_offsets, self.path_values[gather], self.issued_at
+        )
+
+    def issue(self, issued_at):
+        """标记为已下发，返回共享全部底层数组的视图（不复制指令数据）"""
+        issued = copy.copy(self)
+        issued.issued_at = pd.Timestamp(issued_at).value
+        return issued
+
+    def records(self):
+        """逐条指令的嵌套字典（指令ID、任务ID、分配设备、原子操作、执行参数），供 JSON 协议下发"""
+        command_ids = self.command_ids().tolist()
+        task_ids = self.decode("任务ID").tolist()
+        devices = self.decode("分配设备").tolist()
+        operations = self.decode("原子操作").tolist()
+        targets = self.decode("目标位置").tolist()
+        priorities = self.columns["优先级"].tolist()
+        durations = (self.columns["执行时长上限"] // 1_000_000_000).tolist()
+        return [
+            {
+                "指令ID": command_ids[row],
+                "任务ID": task_ids[row],
+                "分配设备": devices[row],
+                "原子操作": operations[row],
+                "执行参数": {
+                    "目标位置": targets[row],
+                    "路径选择": self.path(row),
+                    "优先级": priorities[row],
+                    "执行时长上限秒": durations[row]
+                }
+            }
+            for row in range(len(self))
+        ]
+
+    def to_frame(self):
+        """展示与持久化用的 DataFrame（编码列还原为标签）"""
+        partition_labels = self.labels["分区"]
+        paths = np.split(partition_labels[self.path_values], self.path_offsets[1:-1]) if len(self) else []
+        execute_time = self.columns["执行时间"].view("datetime64[ns]")
+        max_duration = self.columns["执行时长上限"].view("timedelta64[ns]")
+        frame = pd.DataFrame({
+            "指令ID": self.command_ids(),
+            "任务ID": self.decode("任务ID"),
+            "原子操作": self.decode("原子操作"),
+            "分配设备": self.decode("分配设备"),
+            "执行时间": execute_time,
+            "目标位置": self.decode("目标位置"),
+            "路径选择": [path.tolist() for path in paths],
+            "优先级": self.columns["优先级"],
+            "执行时长上限": max_duration,
+            "完成截止时间": execute_time + max_duration,
+            "冲突避让": self.decode("冲突避让")
+        })
+        if self.is_issued:
+            frame["下发状态"] = "已下发"
+            frame["下发时间"] = pd.Timestamp(self.issued_at)
+        return frame
+
+    def to_bytes(self):
+        """二进制线格式：定长头 + 各定长列 + 路径偏移量/取值 + 标签表（UTF-8，\\0 分隔），数组按 8 字节对齐"""
+        parts = [WIRE_HEADER.pack(WIRE_MAGIC, WIRE_VERSION, len(self), len(self.path_values), self.issued_at)]
+        for name, dtype in COLUMN_DTYPES.items():
+            payload = self.columns[name].astype(np.dtype(dtype).newbyteorder("<"), copy=False).tobytes()
+            parts += [payload, _padding(len(payload))]
+        for array, dtype in [(self.path_offsets, "<i8"), (self.path_values, "<i4")]:
+            payload = array.astype(dtype, copy=False).tobytes()
+            parts += [payload, _padding(len(payload))]
+        for table in LABEL_TABLES:
+            payload = "\0".join(map(str, self.labels[table])).encode("utf-8")
+            parts += [struct.pack("<II", len(self.labels[table]), len(payload)), payload, _padding(len(payload))]
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, buffer):
+        """解析二进制线格式；定长列直接引用 buffer 内存（只读，不复制）"""
+        buffer = memoryview(buffer)
+        magic, version, count, path_count, issued_at = WIRE_HEADER.unpack_from(buffer)
+        if magic != WIRE_MAGIC or version != WIRE_VERSION:
+            raise ValueError(f"无法识别的指令表格式：{bytes(magic)!r} v{version}")
+        position = WIRE_HEADER.size
+
+        def read_array(dtype, size):
+            nonlocal position
+            array = np.frombuffer(buffer, dtype=np.dtype(dtype).newbyteorder("<"), count=size, offset=position)
+            position += array.nbytes + (-array.nbytes % 8)
+            return array
+
+        columns = {name: read_array(dtype, count) for name, dtype in COLUMN_DTYPES.items()}
+        path_offsets = read_array(np.int64, count + 1)
+        path_values = read_array(np.int32, path_count)
+        labels = {}
+        for table in LABEL_TABLES:
+            size, nbytes = struct.unpack_from("<II", buffer, position)
+            position += 8
+            text = bytes(buffer[position:position + nbytes]).decode("utf-8")
+            position += nbytes + (-nbytes % 8)
+            labels[table] = np.array(text.split("\0") if size else [], dtype=object)
+        return cls(columns, labels, path_offsets, path_values, issued_at)
@@ -10,6 +10,15 @@ PARTITION_TOPOLOGY = {
     "作业站台": ["A2", "A5", "缓冲区域"]
 }
 
+# 路由配置：分区节点数不超过该值时，构建拓扑即预计算全源下一跳表；否则按目标分区惰性计算
+ROUTING_PRECOMPUTE_MAX_NODES = 500
+
+# 路径预约配置：冲突避让规则按时间窗执行，每个路径段占用一个时间窗；延迟出发顺延该设备的后续作业，
+# 最大延迟内仍无法避让的任务暂缓下发（资源状态为冲突暂缓，订单留待重新规划）
+PATH_RESERVATION_SLOT_SECONDS = 60
+PATH_RESERVATION_MAX_DELAY_SLOTS = 30
+MOBILE_EQUIPMENT_TYPES = ["AGV小车"]
+
 # 设备配置
 EQUIPMENTS = {
     "AGV小车": ["AGV1", "AGV2", "AGV3"],
@@ -17,20 +26,102 @@ EQUIPMENTS = {
     "分拣装置": ["分拣装置1", "分拣装置2"]
 }
 
-# 调度规则库
-SCHEDULING_RULES = {
-    "优先级规则": "紧急订单优先级高于普通订单，超时订单优先级最高",
-    "路径优化规则": "选择拓扑距离最短且通行效率最高的路径",
-    "冲突避让规则": "同一路径同一时间窗内仅允许一台移动设备通行"
+# 原子操作标准作业时长（分钟），用于设备排队与执行时间推算
+ATOMIC_OPERATION_DURATION = {
+    "物料定位": 2,
+    "路径规划": 2,
+    "设备调度": 2,
+    "物料搬运": 2,
+    "库存更新": 2,
+    "任务确认": 2
+}
+DEFAULT_OPERATION_DURATION = 2  # 未配置标准时长的原子操作按该时长（分钟）推算
+
+# 调度规则库：规则得分 = 偏置 + Σ 权重 × 状态特征，得分最高的规则为最优规则；说明仅作展示，不参与评分
+STATE_FEATURES = ["订单积压程度", "设备平均负荷", "路径平均通行效率"]
+RULE_SCORING = {
+    "优先级规则": {"说明": "紧急订单优先级高于普通订单，超时订单优先级最高",
+              "权重": {"订单积压程度": 0.6, "设备平均负荷": 0.4}, "偏置": 0.0},
+    "路径优化规则": {"说明": "选择拓扑距离最短且通行效率最高的路径",
+                "权重": {"路径平均通行效率": 0.7, "设备平均负荷": -0.3}, "偏置": 0.3},
+    "冲突避让规则": {"说明": "同一路径同一时间窗内仅允许一台移动设备通行",
+                "权重": {"设备平均负荷": 0.5, "路径平均通行效率": -0.5}, "偏置": 0.5}
 }
+# 规则切换滞回：最优规则得分须高出当前规则 RULE_SWITCH_MARGIN，特征相对上次选定规则时的平均变化量须超过
+# SENSITIVITY_THRESHOLD，且距上次切换至少 RULE_SWITCH_MIN_INTERVAL_SECONDS 秒
+RULE_SWITCH_MARGIN = 0.05
+RULE_SWITCH_MIN_INTERVAL_SECONDS = 10.0
+# 状态特征聚合：设备负荷上报的滑动时间窗口（秒）、订单积压程度的归一化订单数、无负荷数据时的默认设备负荷
+STATE_FEATURE_WINDOW_SECONDS = 60.0
+ORDER_BACKLOG_SCALE = 20
+DEFAULT_EQUIPMENT_LOAD = 0.5
 
 # 阈值配置
 STATE_DEVIATION_THRESHOLD = 5.0  
+STATE_DEVIATION_EWMA_ALPHA = 0.3  # 流式校正中设备偏差指数滑动平均系数
+STATE_DEVIATION_CLEAR_RATIO = 0.8  # 偏差EWMA回落至阈值的该比例以下才解除校准标记，避免反复触发
 SENSITIVITY_THRESHOLD = 0.3     
 PROGRESS_TOTAL_STEPS = 100      
 RUN_DURATION = 60                
 
+# 滚动调度配置：每个调度周期的时长（即承诺时域，秒）与单周期延迟预算（毫秒）
+# 周期超预算时下一周期重新规划的积压订单数减半（最少 CYCLE_MIN_PLANNED_ORDERS 个，按到达顺序优先），耗时低于预算一半时逐步放宽
+SCHEDULING_HORIZON_SECONDS = 2.0
+CYCLE_LATENCY_BUDGET_MS = 500
+CYCLE_MIN_PLANNED_ORDERS = 10
+
+# 分片调度配置：按拓扑分区簇把订单与设备划分为互不相交的分片，在进程池中并行执行任务分解、资源匹配与指令生成
+SHARDED_SCHEDULING = False  # main.py 是否使用分片调度
+SHARD_COUNT = 4  # 分区簇数上限（缺少某类设备的簇会并入相邻簇）
+SHARD_MAX_WORKERS = 4  # 进程池最大进程数（不超过 CPU 核数，单核环境在本进程内逐个分片执行）
+
+# 异步指令下发配置：单设备最大在途指令数、单次指令超时（秒）、失败重试次数与退避基数（秒）
+DEVICE_MAX_IN_FLIGHT = 8
+COMMAND_TIMEOUT_SECONDS = 2.0
+COMMAND_MAX_RETRIES = 2
+COMMAND_RETRY_BACKOFF_SECONDS = 0.05
+
+# 运行节奏配置："production" 生产模式不做任何延时；"demo" 演示模式保留各阶段的展示停顿
+PACING_MODE = "production"
+PACING_MODES = ["production", "demo"]
+
 # 图表配置
 CHART_SAVE_PATH = "charts/"
 FONT_NAME = "SimHei"
-CHART_DPI = 150
\ No newline at end of file
+CHART_DPI = 150
+CHART_PARALLEL_RENDER = True  # 使用进程池并行渲染各图表（仅多核环境生效）
+CHART_MAX_WORKERS = 7
+CHART_CACHE_PATH = "charts/.cache/"  # 图表内容缓存目录
+CHART_CACHE_MAX_BYTES = 50 * 1024 * 1024
+# 数据接口分页配置
+API_DEFAULT_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+
+# Web 后台仿真配置：状态目录（生产者锁、运行状态与结果快照，多个 Web 工作进程共享）与仿真订单数
+SIMULATION_STATE_PATH = "runtime/"
+SIMULATION_ORDER_COUNT = 20
+SIMULATION_REUSE_LAST_RUN = True  # 启动时若运行存储中已有仿真参数（订单数、配置与源码指纹）一致的完成运行，直接加载而不重新仿真
+
+# 运行结果存储：每次仿真的各阶段数据以 Arrow IPC 列式文件保存（每个运行一个目录，附清单），保留最近若干次运行
+RUN_STORE_PATH = "runtime/runs/"
+RUN_STORE_MAX_RUNS = 20
+
+# 实时事件推送配置：最近事件缓冲条数、单个订阅者队列上限、SSE 心跳间隔（秒）、单次仿真推送的偏差告警明细上限
+EVENT_HISTORY_SIZE = 200
+EVENT_SUBSCRIBER_QUEUE_SIZE = 100
+EVENT_KEEPALIVE_SECONDS = 15
+EVENT_STREAM_MAX_SECONDS = 300  # 单个 SSE 连接的最长存活时间（秒），到期关闭后由客户端按 retry 自动重连
+EVENT_MAX_ALERTS = 20
+
+# 阶段性能采集配置："off" 关闭；"basic" 记录耗时/行数/阶段内存增量；"capture" 额外对每个阶段做 cProfile 与 tracemalloc 采集（开销较大）
+PROFILING_MODE = "basic"
+PROFILING_MODES = ["off", "basic", "capture"]
+PROFILING_HISTOGRAM_PRECISION = 0.01  # 耗时直方图的相对精度
+PROFILING_CAPTURE_TOP = 20  # capture 模式下每个阶段保留的 cProfile 热点函数条数
+
+# 合成负载生成配置：分块生成的订单块大小、默认订单到达率（单/秒）与波次参数（波次间隔、波次持续时间，秒；波次内到达率倍数）
+WORKLOAD_CHUNK_SIZE = 500_000
+WORKLOAD_ARRIVAL_RATE = 50.0
+WORKLOAD_WAVE_INTERVAL_SECONDS = 600.0
+WORKLOAD_WAVE_DURATION_SECONDS = 60.0
+WORKLOAD_WAVE_BURST_FACTOR = 10.0
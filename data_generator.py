@@ -4,14 +4,14 @@ from datetime import datetime, timedelta
 from config import LOGICAL_PARTITIONS, EQUIPMENTS
 
 class DataGenerator:
-    def generate_order_data(self, count=10):
-        """生成订单数据"""
+    def generate_order_data(self, count=10, start_index=0):
+        """生成订单数据（start_index 为订单编号起始偏移，用于连续批次生成）"""
         order_types = ["紧急订单", "普通订单", "超时订单"]
         materials = ["电子元件", "机械零件", "包装材料", "化工原料", "食品原料"]
         target_locations = LOGICAL_PARTITIONS[:-2]  
         
         data = {
-            "订单ID": [f"ORD{2025001 + i}" for i in range(count)],
+            "订单ID": [f"ORD{2025001 + start_index + i}" for i in range(count)],
             "物料名称": np.random.choice(materials, count),
             "目标位置": np.random.choice(target_locations, count),
             "订单类型": np.random.choice(order_types, count, p=[0.2, 0.6, 0.2]),
@@ -0,0 +1,61 @@
+import json
+import numpy as np
+from config import API_DEFAULT_PAGE_SIZE, API_MAX_PAGE_SIZE
+
+class TablePager:
+    """数据表分页查询器：为筛选列建立 取值→行号 倒排索引，查询只切取当前页的行，不生成全表记录"""
+    def __init__(self, table, filter_columns):
+        self.table = table
+        self.filter_columns = dict(filter_columns)
+        # 筛选参数名→取值→升序行号数组
+        self.positions = {
+            param: {
+                value: np.asarray(rows, dtype=np.int64)
+                for value, rows in table.groupby(column, sort=False).indices.items()
+            }
+            for param, column in self.filter_columns.items()
+            if column in table.columns
+        }
+
+    def matching_rows(self, filters):
+        """按筛选条件求交集得到命中行号；无筛选条件时返回 None 表示全表"""
+        candidates = []
+        for param, value in filters.items():
+            index = self.positions.get(param)
+            if index is None or value in (None, ""):
+                continue
+            rows = index.get(value)
+            if rows is None:
+                return np.empty(0, dtype=np.int64)
+            candidates.append(rows)
+        if not candidates:
+            return None
+        # 从最小的候选集开始求交，开销只与候选集大小相关，与全表行数无关
+        candidates.sort(key=len)
+        matched = candidates[0]
+        for rows in candidates[1:]:
+            matched = np.intersect1d(matched, rows, assume_unique=True)
+        return matched
+
+    def page(self, filters, page=1, page_size=API_DEFAULT_PAGE_SIZE):
+        """返回分页结果：{"items", "page", "page_size", "total", "pages"}"""
+        page_size = min(max(int(page_size), 1), API_MAX_PAGE_SIZE)
+        page = max(int(page), 1)
+        matched = self.matching_rows(filters)
+        total = len(self.table) if matched is None else len(matched)
+        start = (page - 1) * page_size
+        if matched is None:
+            page_rows = self.table.iloc[start:start + page_size]
+        else:
+            page_rows = self.table.iloc[matched[start:start + page_size]]
+        return {
+            "items": json.loads(page_rows.to_json(orient="records", force_ascii=False, date_format="iso")),
+            "page": page,
+            "page_size": page_size,
+            "total": int(total),
+            "pages": (int(total) + page_size - 1) // page_size
+        }
+
+    def facets(self, params):
+        """指定筛选参数的可选取值，供页面生成筛选项"""
+        return {param: sorted(map(str, self.positions[param])) for param in params if param in self.positions}
@@ -0,0 +1,86 @@
+import os
+import threading
+import uuid
+from collections import deque
+from config import EVENT_HISTORY_SIZE, EVENT_SUBSCRIBER_QUEUE_SIZE
+
+class EventSubscription:
+    """单个订阅者的有界事件队列：队列满时丢弃最旧事件并计数，发布方永不阻塞"""
+    def __init__(self, maxsize=EVENT_SUBSCRIBER_QUEUE_SIZE):
+        self.queue = deque(maxlen=maxsize)
+        self.dropped = 0
+        self.condition = threading.Condition()
+
+    def push(self, event):
+        with self.condition:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(event)
+            self.condition.notify()
+
+    def drain(self, timeout):
+        """取出全部待发送事件，无事件时最多等待 timeout 秒；返回（事件列表, 期间丢弃数）"""
+        with self.condition:
+            if not self.queue:
+                self.condition.wait(timeout)
+            events = list(self.queue)
+            self.queue.clear()
+            dropped, self.dropped = self.dropped, 0
+        return events, dropped
+
+
+class EventBroadcaster:
+    """有界扇出广播器：发布的事件编号后写入最近事件缓冲，并推送到每个订阅者各自的有界队列，慢速客户端只会丢失自己的旧事件"""
+    def __init__(self, history_size=EVENT_HISTORY_SIZE, subscriber_queue_size=EVENT_SUBSCRIBER_QUEUE_SIZE):
+        self.history = deque(maxlen=history_size)
+        self.subscriber_queue_size = subscriber_queue_size
+        self.subscribers = set()
+        self.sequence = 0
+        # 事件流标识（进程号 + 随机串）：序号只在本广播器内有效，对外的事件ID以它为命名空间
+        self.stream_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+
+    def publish(self, event):
+        """发布事件并返回事件序号"""
+        with self._lock:
+            self.sequence += 1
+            event = {**event, "序号": self.sequence}
+            self.history.append(event)
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            subscription.push(event)
+        return event["序号"]
+
+    def event_id(self, event):
+        """对外的事件ID：流标识:序号"""
+        return f"{self.stream_id}:{event['序号']}"
+
+    def parse_event_id(self, event_id):
+        """客户端回传的事件ID→本广播器的序号；来自其他事件流（其他工作进程或重启前）或无法解析时返回 0，补发全部缓冲事件"""
+        stream_id, _, sequence = (event_id or "").rpartition(":")
+        if stream_id != self.stream_id:
+            return 0
+        try:
+            return int(sequence)
+        except ValueError:
+            return 0
+
+    def subscribe(self, last_sequence=None):
+        """订阅事件流：last_sequence 为客户端已收到的最后序号，缓冲中更新的事件会先补发"""
+        subscription = EventSubscription(self.subscriber_queue_size)
+        with self._lock:
+            if last_sequence is not None:
+                for event in self.history:
+                    if event["序号"] > last_sequence:
+                        subscription.push(event)
+            self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self.subscribers.discard(subscription)
+
+    def recent(self):
+        """最近事件快照"""
+        with self._lock:
+            return list(self.history)
@@ -1,10 +1,16 @@
 import logging
 import os
+import time
 from tqdm import tqdm
 from datetime import datetime
+from config import PACING_MODE, PACING_MODES
 
 class ProgressLogger:
-    def __init__(self, total_steps):
+    def __init__(self, total_steps, pacing_mode=PACING_MODE):
+        if pacing_mode not in PACING_MODES:
+            raise ValueError(f"未知的运行节奏模式：{pacing_mode}，可选值：{PACING_MODES}")
+        self.pacing_mode = pacing_mode
+        
         # 初始化日志
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
@@ -16,6 +22,7 @@ class ProgressLogger:
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(formatter)
         self.logger.addHandler(console_handler)
+        self.handlers = [console_handler]
         
         log_dir = "logs"
         if not os.path.exists(log_dir):
@@ -26,12 +33,15 @@ class ProgressLogger:
         )
         file_handler.setFormatter(formatter)
         self.logger.addHandler(file_handler)
+        self.handlers.append(file_handler)
         
         # 初始化进度条和累计步数
         self.total_steps = total_steps  
         self.progress_bar = tqdm(total=total_steps, desc="系统运行进度", unit="%", ncols=100)
         self.current_progress = 0
         self.accumulated_steps = 0 
+        self.stage_history = []
+        self.listeners = []
     
     def update_progress(self, step, message):
         """更新进度条并打印日志"""
@@ -45,7 +55,72 @@ class ProgressLogger:
             self.progress_bar.update(actual_step)
         
         self.logger.info(f"{message}，当前进度：{min(self.current_progress, 100.0):.1f}%")
+        self._record_stage(message)
+    
+    def add_listener(self, callback):
+        """订阅进度事件，回调参数为 {"进度", "阶段", "时间"}"""
+        self.listeners.append(callback)
+    
+    def _record_stage(self, message):
+        event = {
+            "进度": round(min(self.current_progress, 100.0), 1),
+            "阶段": message,
+            "时间": datetime.now().isoformat(timespec="seconds")
+        }
+        self.stage_history.append(event)
+        for callback in self.listeners:
+            callback(event)
+    
+    def snapshot(self):
+        """当前进度与已完成阶段列表"""
+        return {
+            "进度": round(min(self.current_progress, 100.0), 1),
+            "当前阶段": self.stage_history[-1]["阶段"] if self.stage_history else None,
+            "阶段记录": list(self.stage_history)
+        }
+    
+    def pace(self, seconds):
+        """按运行节奏策略停顿：演示模式保留展示停顿，生产模式立即返回"""
+        if self.pacing_mode == "demo" and seconds > 0:
+            time.sleep(seconds)
     
     def close(self):
         self.progress_bar.close()
-        self.logger.info("系统运行完成，日志已保存")
\ No newline at end of file
+        self.logger.info("系统运行完成，日志已保存")
+        # 移除本实例添加的日志处理器，长驻进程多次运行时避免重复输出与文件句柄泄漏
+        for handler in self.handlers:
+            self.logger.removeHandler(handler)
+            handler.close()
+        self.handlers = []
+
+
+class NullProgressLogger:
+    """静默进度记录器：接口与 ProgressLogger 一致，不输出进度条和日志文件，用于基准测试等批量运行场景"""
+    def __init__(self, total_steps=100):
+        self.logger = logging.getLogger(__name__)
+        self.pacing_mode = "production"
+        self.total_steps = total_steps
+        self.current_progress = 0
+        self.accumulated_steps = 0
+        self.stage_history = []
+        self.listeners = []
+    
+    def update_progress(self, step, message):
+        actual_step = min(step, self.total_steps - self.accumulated_steps)
+        self.accumulated_steps += max(actual_step, 0)
+        self.current_progress = (self.accumulated_steps / self.total_steps) * 100
+        # 只在有订阅者时记录阶段，批量运行保持零开销
+        if self.listeners:
+            ProgressLogger._record_stage(self, message)
+    
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+    
+    def snapshot(self):
+        return ProgressLogger.snapshot(self)
+    
+    def pace(self, seconds):
+        pass
+    
+    def close(self):
+        pass
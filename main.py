@@ -1,4 +1,4 @@
-from config import PROGRESS_TOTAL_STEPS, RUN_DURATION, PARTITION_TOPOLOGY, CHART_SAVE_PATH
+from config import PROGRESS_TOTAL_STEPS, RUN_DURATION, PARTITION_TOPOLOGY, CHART_SAVE_PATH, SHARDED_SCHEDULING
 from logger_utils import ProgressLogger  
 from data_generator import DataGenerator
 from virtual_warehouse import VirtualWarehouse
@@ -7,8 +7,9 @@ from task_processor import TaskProcessor
 from resource_matcher import ResourceMatcher
 from command_executor import CommandExecutor
 from state_corrector import StateCorrector
+from sharded_scheduler import ShardedScheduler
 from chart_generator import chart_generator
-import time
+from stage_profiler import stage_profiler
 
 def main():
     # 初始化进度日志
@@ -30,7 +31,7 @@ def main():
             "topology_data": topology_data
         })
         progress_logger.update_progress(5, "数据加载完成")
-        time.sleep(2)
+        progress_logger.pace(2)
         
         # 2. 构建虚拟仓储模型
         virtual_warehouse = VirtualWarehouse(progress_logger)
@@ -41,19 +42,26 @@ def main():
         scheduler = AdaptiveScheduler(virtual_warehouse, progress_logger)
         scheduler.implant_core()
         
-        # 4. 任务解析
-        task_processor = TaskProcessor(virtual_warehouse, progress_logger)
-        task_graph = task_processor.process_task_request(order_data)
-        all_data["task_graph"] = task_graph
-        
-        # 5. 资源匹配
-        resource_matcher = ResourceMatcher(virtual_warehouse, equipment_status, progress_logger)
-        resource_plan = resource_matcher.match_resources(task_graph)
-        all_data["resource_plan"] = resource_plan
-        
-        # 6. 生成控制指令
-        control_commands = scheduler.execute_strategy(resource_plan)
-        all_data["control_commands"] = control_commands
+        if SHARDED_SCHEDULING:
+            # 4-6. 分片调度：按分区簇并行执行任务解析、资源匹配与控制指令生成
+            sharded_scheduler = ShardedScheduler(virtual_warehouse, scheduler, equipment_status, progress_logger)
+            control_commands = sharded_scheduler.schedule(order_data)
+            resource_plan = sharded_scheduler.resource_plan
+            all_data["resource_plan"] = resource_plan
+        else:
+            # 4. 任务解析
+            task_processor = TaskProcessor(virtual_warehouse, progress_logger)
+            task_graph = task_processor.process_task_request(order_data)
+            all_data["task_graph"] = task_graph
+            
+            # 5. 资源匹配
+            resource_matcher = ResourceMatcher(virtual_warehouse, equipment_status, progress_logger)
+            resource_plan = resource_matcher.match_resources(task_graph)
+            all_data["resource_plan"] = resource_plan
+            
+            # 6. 生成控制指令
+            control_commands = scheduler.execute_strategy(resource_plan)
+        all_data["control_commands"] = control_commands.to_frame()
         
         # 7. 下发指令与采集反馈
         executor = CommandExecutor(virtual_warehouse, progress_logger)
@@ -69,7 +77,7 @@ def main():
         
         # 9. 生成数据图表
         progress_logger.update_progress(10, "开始生成数据图表")
-        time.sleep(5)
+        progress_logger.pace(5)
         chart_generator.generate_charts(all_data)
         
         remaining_progress = 100 - progress_logger.current_progress
@@ -82,12 +90,16 @@ def main():
         print("="*60)
         print(f"总运行时长：{RUN_DURATION}秒")
         print(f"处理订单数量：{len(order_data)}个")
-        print(f"生成原子操作：{len(task_graph)}个")
+        print(f"生成原子操作：{len(resource_plan)}个")
         print(f"下发控制指令：{len(control_commands)}条")
         print(f"状态超限数量：{over_threshold_count}个")
         print(f"生成图表数量：7张")
         print(f"图表保存路径：{CHART_SAVE_PATH}")
         print("="*60)
+        if stage_profiler.mode != "off":
+            print("各阶段性能统计")
+            print(stage_profiler.report())
+            print("="*60)
         
     except Exception as e:
         progress_logger.logger.error(f"系统运行异常：{str(e)}", exc_info=True)
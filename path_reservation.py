@@ -0,0 +1,54 @@
+from config import PATH_RESERVATION_SLOT_SECONDS, PATH_RESERVATION_MAX_DELAY_SLOTS
+from routing_engine import path_segment
+
+class PathReservationTable:
+    """路径时间窗预约表：按时间窗分桶记录各路径段的占用设备，保证同一路径同一时间窗内仅一台移动设备通行"""
+    def __init__(self, slot_seconds=PATH_RESERVATION_SLOT_SECONDS):
+        self.slot_seconds = slot_seconds
+        self.buckets = {}  # 时间窗序号 -> {路径段: 设备ID}
+
+    def to_slot(self, timestamp):
+        """将时间点换算为时间窗序号"""
+        return int(timestamp.timestamp() // self.slot_seconds)
+
+    def is_free(self, path, start_slot, device):
+        """检查路径从 start_slot 起逐段通行时是否与其他设备冲突"""
+        for offset, (source, target) in enumerate(zip(path, path[1:])):
+            owner = self.buckets.get(start_slot + offset, {}).get(path_segment(source, target))
+            if owner is not None and owner != device:
+                return False
+        return True
+
+    def reserve(self, path, start_slot, device):
+        """预约路径：第 i 段占用第 start_slot + i 个时间窗"""
+        for offset, (source, target) in enumerate(zip(path, path[1:])):
+            self.buckets.setdefault(start_slot + offset, {})[path_segment(source, target)] = device
+
+    def release(self, path, start_slot, device):
+        """撤销设备从 start_slot 起的路径预约（仅移除仍由该设备占用的路径段）"""
+        for offset, (source, target) in enumerate(zip(path, path[1:])):
+            bucket = self.buckets.get(start_slot + offset)
+            segment = path_segment(source, target)
+            if bucket is not None and bucket.get(segment) == device:
+                del bucket[segment]
+
+    def find_slot(self, path, start_slot, device, max_delay=PATH_RESERVATION_MAX_DELAY_SLOTS):
+        """查找不晚于 max_delay 个时间窗的最早可通行起始时间窗，找不到时返回 None"""
+        for slot in range(start_slot, start_slot + max_delay + 1):
+            if self.is_free(path, slot, device):
+                return slot
+        return None
+
+    def busy_segments(self, start_slot, slot_count, device):
+        """时间窗区间内被其他设备占用的路径段"""
+        busy = set()
+        for slot in range(start_slot, start_slot + slot_count):
+            for segment, owner in self.buckets.get(slot, {}).items():
+                if owner != device:
+                    busy.add(segment)
+        return busy
+
+    def release_before(self, slot):
+        """释放早于指定时间窗的全部预约"""
+        for expired in [s for s in self.buckets if s < slot]:
+            del self.buckets[expired]
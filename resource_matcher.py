@@ -1,64 +1,147 @@
-import pandas as pd
-from datetime import datetime, timedelta
+import heapq
 import numpy as np
-import time
+import pandas as pd
+from datetime import datetime
+from config import ATOMIC_OPERATION_DURATION, DEFAULT_OPERATION_DURATION
+from stage_profiler import profiled_stage
+
+# 原子操作→所需设备类型
+OPERATION_EQUIPMENT_TYPE = {
+    "物料定位": "堆垛机",
+    "库存更新": "堆垛机",
+    "路径规划": "AGV小车",
+    "物料搬运": "AGV小车"
+}
+DEFAULT_EQUIPMENT_TYPE = "分拣装置"
+
+class ResourceIndex:
+    """设备资源索引：每个调度周期构建一次，提供 类型→可用设备、设备→位置/负荷 的常数时间查询"""
+    def __init__(self, equipment_status, device_states):
+        self.equipment_ids = equipment_status.groupby("设备类型", sort=False)["设备ID"].apply(list).to_dict()
+        self.available_ids = {
+            eq_type: [eq for eq in eq_ids if device_states.get(eq) == "正常运行"]
+            for eq_type, eq_ids in self.equipment_ids.items()
+        }
+        indexed = equipment_status.set_index("设备ID")
+        self.location = indexed["当前位置"].to_dict()
+        self.load = indexed["运行负荷"].to_dict()
+
+    def candidate_equipment(self, equipment_type):
+        """设备类型的候选设备池：优先正常运行的设备，无可用设备时退回该类型全部设备"""
+        return self.available_ids.get(equipment_type) or self.equipment_ids[equipment_type]
+
+class EquipmentDispatcher:
+    """负载均衡派工器：每种设备类型维护一个按（预计空闲时间, 运行负荷）排序的小顶堆"""
+    def __init__(self, resource_index, busy_offsets=None):
+        self.resource_index = resource_index
+        self.busy_offsets = busy_offsets or {}
+        self.device_heaps = {}
+
+    def _heap(self, equipment_type):
+        heap = self.device_heaps.get(equipment_type)
+        if heap is None:
+            heap = [
+                (self.busy_offsets.get(eq, 0.0), self.resource_index.load[eq], eq)
+                for eq in self.resource_index.candidate_equipment(equipment_type)
+            ]
+            heapq.heapify(heap)
+            self.device_heaps[equipment_type] = heap
+        return heap
+
+    def dispatch(self, equipment_type, ready_at, duration):
+        """将一个原子操作派给最早空闲的设备，返回（设备ID, 开始偏移, 结束偏移），单位为分钟"""
+        heap = self._heap(equipment_type)
+        busy_until, load, eq = heap[0]
+        start = max(busy_until, ready_at)
+        end = start + duration
+        heapq.heapreplace(heap, (end, load, eq))
+        return eq, start, end
 
 class ResourceMatcher:
     def __init__(self, virtual_warehouse, equipment_status, progress_logger):
         self.virtual_warehouse = virtual_warehouse
         self.equipment_status = equipment_status
         self.resource_plan = pd.DataFrame()
-        self.progress_logger = progress_logger  
-    
-    def match_resources(self, task_graph):
-        """资源匹配运算，生成资源匹配方案"""
+        self.resource_index = None
+        self._resource_index_version = None
+        self.progress_logger = progress_logger
+
+    def build_index(self):
+        """构建本周期的设备资源索引，设备状态版本未变化时直接复用"""
+        version = self.virtual_warehouse.state_versions["设备状态"]
+        if self.resource_index is None or self._resource_index_version != version:
+            self.resource_index = ResourceIndex(
+                self.equipment_status, self.virtual_warehouse.current_state["设备状态"]
+            )
+            self._resource_index_version = version
+        return self.resource_index
+
+    @profiled_stage("match_resources")
+    def match_resources(self, task_graph, busy_until=None):
+        """资源匹配运算，生成资源匹配方案；busy_until 为已承诺设备的预计空闲时间 {设备ID: 时间}"""
         self.progress_logger.update_progress(8, "开始资源匹配运算")
-        time.sleep(4)
-        
-        resource_plan = []
-        equipment_map = self.equipment_status.groupby("设备类型")["设备ID"].apply(list).to_dict()
-        
-        for _, task in task_graph.iterrows():
-            # 确定所需设备类型
-            op = task["原子操作"]
-            if op in ["物料定位", "库存更新"]:
-                req_equipment_type = "堆垛机"
-            elif op in ["路径规划", "物料搬运"]:
-                req_equipment_type = "AGV小车"
-            else:
-                req_equipment_type = "分拣装置"
-            
-            # 选择可用设备
-            available_equipment = [
-                eq for eq in equipment_map[req_equipment_type]
-                if self.virtual_warehouse.current_state["设备状态"][eq] == "正常运行"
-            ]
-            assigned_equipment = available_equipment[0] if available_equipment else equipment_map[req_equipment_type][0]
-            
-            # 确定执行时间
-            execute_time = datetime.now() + timedelta(minutes=task["操作序号"] * 2)
-            
-            # 确定当前分区
-            current_partition = self.equipment_status[
-                self.equipment_status["设备ID"] == assigned_equipment
-            ]["当前位置"].iloc[0]
-            
-            resource_plan.append({
-                "任务ID": task["任务ID"],
-                "物料名称": task["物料名称"],
-                "目标位置": task["目标位置"],
-                "任务类型": task["订单类型"],
-                "原子操作": task["原子操作"],
-                "操作序号": task["操作序号"],
-                "当前分区": current_partition,
-                "分配设备": assigned_equipment,
-                "设备类型": req_equipment_type,
-                "执行时间": execute_time.strftime("%Y-%m-%d %H:%M:%S"),
-                "资源状态": "已分配"
-            })
-        
-        self.resource_plan = pd.DataFrame(resource_plan)
+        self.progress_logger.pace(4)
+
+        resource_index = self.build_index()
+
+        # 确定所需设备类型
+        req_equipment_type = task_graph["原子操作"].map(OPERATION_EQUIPMENT_TYPE).fillna(DEFAULT_EQUIPMENT_TYPE)
+
+        # 派工：按操作序号分波次派工，每个原子操作分配给最早空闲的设备，同一任务的原子操作按序执行
+        now = pd.Timestamp(datetime.now()).floor("s")
+        busy_offsets = {
+            eq: max((pd.Timestamp(free_at) - now).total_seconds() / 60, 0.0)
+            for eq, free_at in (busy_until or {}).items()
+        }
+        dispatcher = EquipmentDispatcher(resource_index, busy_offsets)
+        dispatch_order = np.argsort(task_graph["操作序号"].to_numpy(), kind="stable")
+        task_ids = task_graph["任务ID"].to_numpy()[dispatch_order].tolist()
+        eq_types = req_equipment_type.to_numpy()[dispatch_order].tolist()
+        durations = task_graph["原子操作"].map(ATOMIC_OPERATION_DURATION).fillna(DEFAULT_OPERATION_DURATION).to_numpy(dtype=float)[dispatch_order].tolist()
+
+        task_ready = {}
+        assigned, start_offsets, end_offsets = [], [], []
+        for task_id, eq_type, duration in zip(task_ids, eq_types, durations):
+            eq, start, end = dispatcher.dispatch(eq_type, task_ready.get(task_id, 0.0), duration)
+            task_ready[task_id] = end
+            assigned.append(eq)
+            start_offsets.append(start)
+            end_offsets.append(end)
+
+        assigned_equipment = pd.Series(np.empty(len(task_graph), dtype=object), index=task_graph.index)
+        assigned_equipment.iloc[dispatch_order] = assigned
+
+        # 确定执行时间（由设备排队结果推算，相同偏移只格式化一次）
+        execute_time = self._format_offsets(now, dispatch_order, start_offsets)
+        finish_time = self._format_offsets(now, dispatch_order, end_offsets)
+
+        # 确定当前分区
+        current_partition = assigned_equipment.map(resource_index.location)
+
+        self.resource_plan = pd.DataFrame({
+            "任务ID": task_graph["任务ID"],
+            "物料名称": task_graph["物料名称"],
+            "目标位置": task_graph["目标位置"],
+            "任务类型": task_graph["订单类型"],
+            "原子操作": task_graph["原子操作"],
+            "操作序号": task_graph["操作序号"],
+            "当前分区": current_partition,
+            "分配设备": assigned_equipment,
+            "设备类型": req_equipment_type,
+            "执行时间": execute_time,
+            "预计完成时间": finish_time,
+            "资源状态": "已分配"
+        }).reset_index(drop=True)
         self.progress_logger.update_progress(7, "资源匹配运算完成，生成资源匹配方案")
-        time.sleep(3)
-        
-        return self.resource_plan
\ No newline at end of file
+        self.progress_logger.pace(3)
+
+        return self.resource_plan
+
+    @staticmethod
+    def _format_offsets(now, dispatch_order, offsets):
+        """将派工顺序下的分钟偏移量还原为原始行序的时间字符串"""
+        unique_offsets, inverse = np.unique(np.asarray(offsets, dtype=float), return_inverse=True)
+        labels = (now + pd.to_timedelta(unique_offsets, unit="min")).strftime("%Y-%m-%d %H:%M:%S").to_numpy(dtype=object)
+        formatted = np.empty(len(dispatch_order), dtype=object)
+        formatted[dispatch_order] = labels[inverse]
+        return formatted
@@ -0,0 +1,147 @@
+import heapq
+import numpy as np
+from config import ROUTING_PRECOMPUTE_MAX_NODES
+
+def path_segment(source, target):
+    """路径段的无向标识：同一物理通道的两个通行方向视为同一路径"""
+    return (source, target) if source <= target else (target, source)
+
+class RoutingEngine:
+    """分区路径路由引擎：按 路径长度/通行效率 计算加权最短路径，维护按目标分区的下一跳表与路径缓存，拓扑变化时整体失效"""
+    def __init__(self):
+        self.nodes = []
+        self.node_codes = {}
+        self.reverse_adjacency = []
+        self.topology_version = 0
+        self._topology_source = None
+        self._next_hop = {}
+        self._distance = {}
+        self._path_cache = {}
+
+    def rebuild(self, topology_data):
+        """根据拓扑数据重建邻接结构，并使下一跳表与路径缓存失效"""
+        nodes = list(dict.fromkeys(
+            topology_data["源分区"].tolist() + topology_data["目标分区"].tolist()
+        ))
+        self.nodes = nodes
+        self.node_codes = {node: code for code, node in enumerate(nodes)}
+
+        # 边权 = 路径长度 / 通行效率，同一有向边保留最小权重
+        source_codes = topology_data["源分区"].map(self.node_codes).to_numpy()
+        target_codes = topology_data["目标分区"].map(self.node_codes).to_numpy()
+        weights = (topology_data["路径长度"] / (topology_data["通行效率"] / 100)).to_numpy(dtype=float)
+        edge_weights = {}
+        for source, target, weight in zip(source_codes.tolist(), target_codes.tolist(), weights.tolist()):
+            if weight < edge_weights.get((source, target), np.inf):
+                edge_weights[(source, target)] = weight
+
+        self.reverse_adjacency = [[] for _ in nodes]
+        for (source, target), weight in edge_weights.items():
+            self.reverse_adjacency[target].append((source, weight))
+
+        self.topology_version += 1
+        self._topology_source = topology_data
+        self._next_hop = {}
+        self._distance = {}
+        self._path_cache = {}
+
+        if len(nodes) <= ROUTING_PRECOMPUTE_MAX_NODES:
+            for target in range(len(nodes)):
+                self._compute_target_column(target)
+
+    def ensure(self, topology_data):
+        """拓扑数据对象发生变化时才重建"""
+        if topology_data is not self._topology_source:
+            self.rebuild(topology_data)
+
+    def _compute_target_column(self, target):
+        """在反向图上从目标分区做 Dijkstra，得到所有分区到该目标的下一跳与距离"""
+        distance, next_hop = self._dijkstra_to(target)
+        next_hop = np.asarray(next_hop, dtype=np.int32)
+        self._next_hop[target] = next_hop
+        self._distance[target] = np.asarray(distance)
+        return next_hop
+
+    def _dijkstra_to(self, target, blocked_edges=None, stop_at=None):
+        """反向 Dijkstra：blocked_edges 为禁止通行的无向路径段集合，到达 stop_at 后提前结束"""
+        node_count = len(self.nodes)
+        distance = [np.inf] * node_count
+        next_hop = [-1] * node_count
+        distance[target] = 0.0
+        next_hop[target] = target
+        heap = [(0.0, target)]
+        while heap:
+            dist, node = heapq.heappop(heap)
+            if node == stop_at:
+                break
+            if dist > distance[node]:
+                continue
+            for neighbor, weight in self.reverse_adjacency[node]:
+                if blocked_edges and path_segment(self.nodes[neighbor], self.nodes[node]) in blocked_edges:
+                    continue
+                candidate = dist + weight
+                if candidate < distance[neighbor]:
+                    distance[neighbor] = candidate
+                    next_hop[neighbor] = node
+                    heapq.heappush(heap, (candidate, neighbor))
+        return distance, next_hop
+
+    def next_hop(self, source, target):
+        """查询下一跳分区，不可达时返回 None"""
+        source_code = self.node_codes.get(source)
+        target_code = self.node_codes.get(target)
+        if source_code is None or target_code is None:
+            return None
+        column = self._next_hop.get(target_code)
+        if column is None:
+            column = self._compute_target_column(target_code)
+        hop = column[source_code]
+        return self.nodes[hop] if hop >= 0 else None
+
+    def distance(self, source, target):
+        """查询加权最短距离，不可达时返回 inf"""
+        source_code = self.node_codes.get(source)
+        target_code = self.node_codes.get(target)
+        if source_code is None or target_code is None:
+            return np.inf
+        if target_code not in self._distance:
+            self._compute_target_column(target_code)
+        return float(self._distance[target_code][source_code])
+
+    def shortest_path(self, source, target):
+        """查询最短路径（分区列表），不可达时返回 None；结果按分区对缓存"""
+        key = (source, target)
+        path = self._path_cache.get(key)
+        if path is None and key not in self._path_cache:
+            path = self._walk(source, target)
+            self._path_cache[key] = path
+        return list(path) if path is not None else None
+
+    def shortest_path_avoiding(self, source, target, blocked_edges):
+        """绕行路径：避开指定的无向路径段重新计算最短路径（不缓存），不可达时返回 None"""
+        source_code = self.node_codes.get(source)
+        target_code = self.node_codes.get(target)
+        if source_code is None or target_code is None:
+            return None
+        _, next_hop = self._dijkstra_to(target_code, blocked_edges, stop_at=source_code)
+        path = [source_code]
+        while path[-1] != target_code:
+            hop = next_hop[path[-1]]
+            if hop < 0 or len(path) > len(self.nodes):
+                return None
+            path.append(hop)
+        return [self.nodes[code] for code in path]
+
+    def _walk(self, source, target):
+        if source == target:
+            return (source,)
+        path = [source]
+        node = source
+        for _ in range(len(self.nodes)):
+            node = self.next_hop(node, target)
+            if node is None:
+                return None
+            path.append(node)
+            if node == target:
+                return tuple(path)
+        return None
@@ -0,0 +1,94 @@
+import time
+import numpy as np
+from config import (STATE_FEATURES, RULE_SCORING, RULE_SWITCH_MARGIN, RULE_SWITCH_MIN_INTERVAL_SECONDS,
+                    SENSITIVITY_THRESHOLD)
+
+class CompiledRules:
+    """编译后的规则集：规则名列表、权重矩阵（规则 × 特征）与偏置向量"""
+    def __init__(self, rules, feature_index):
+        self.names = list(rules)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.weights = np.zeros((len(self.names), len(feature_index)))
+        self.bias = np.zeros(len(self.names))
+        for i, name in enumerate(self.names):
+            for feature, weight in rules[name].get("权重", {}).items():
+                if feature not in feature_index:
+                    raise ValueError(f"规则 {name} 引用了未知的状态特征：{feature}")
+                self.weights[i, feature_index[feature]] = weight
+            self.bias[i] = rules[name].get("偏置", 0.0)
+
+
+class RuleEngine:
+    """数据驱动的调度规则引擎：规则得分为特征向量的线性函数，一次矩阵运算对全部规则求分；
+    按得分差、特征变化量与最小间隔做切换滞回，规则集与滞回参数可在运行时替换"""
+    def __init__(self, rules=RULE_SCORING, features=STATE_FEATURES, margin=RULE_SWITCH_MARGIN,
+                 sensitivity=SENSITIVITY_THRESHOLD, min_interval=RULE_SWITCH_MIN_INTERVAL_SECONDS):
+        if not rules:
+            raise ValueError("规则集不能为空")
+        self.features = list(features)
+        self.feature_index = {name: i for i, name in enumerate(self.features)}
+        self.vector = np.zeros(len(self.features))
+        self.compiled = CompiledRules(rules, self.feature_index)
+        self.margin = margin
+        self.sensitivity = sensitivity
+        self.min_interval = min_interval
+        self.current_rule = None
+        # 上次选定规则时的特征快照，切换判定以它为基准
+        self.reference = None
+        self.last_switch_at = None
+        self.switch_count = 0
+
+    def load_rules(self, rules, margin=None, sensitivity=None, min_interval=None):
+        """替换规则集（及滞回参数）：先完整编译再一次性替换，评估方不会看到半更新的规则集"""
+        if not rules:
+            raise ValueError("规则集不能为空")
+        self.compiled = CompiledRules(rules, self.feature_index)
+        if margin is not None:
+            self.margin = margin
+        if sensitivity is not None:
+            self.sensitivity = sensitivity
+        if min_interval is not None:
+            self.min_interval = min_interval
+
+    def update(self, feature, value):
+        """增量更新单个特征"""
+        self.vector[self.feature_index[feature]] = value
+
+    def update_many(self, features):
+        for feature, value in features.items():
+            self.vector[self.feature_index[feature]] = value
+
+    def snapshot(self):
+        return dict(zip(self.features, self.vector.tolist()))
+
+    def scores(self):
+        """全部规则的得分 {规则名: 得分}"""
+        compiled = self.compiled
+        return dict(zip(compiled.names, (compiled.weights @ self.vector + compiled.bias).tolist()))
+
+    def best_rule(self):
+        compiled = self.compiled
+        return compiled.names[int(np.argmax(compiled.weights @ self.vector + compiled.bias))]
+
+    def evaluate(self, now=None):
+        """按当前特征评估规则切换，返回（当前规则, 是否发生切换）；尚未选定规则或当前规则已被移除时直接选定最优规则，
+        其中首次选定不计为切换"""
+        compiled = self.compiled
+        scores = compiled.weights @ self.vector + compiled.bias
+        best = int(np.argmax(scores))
+        now = time.monotonic() if now is None else now
+        current = compiled.index.get(self.current_rule)
+        if current is not None:
+            if best == current or scores[best] - scores[current] < self.margin:
+                return self.current_rule, False
+            if np.abs(self.vector - self.reference).mean() <= self.sensitivity:
+                return self.current_rule, False
+            if self.last_switch_at is not None and now - self.last_switch_at < self.min_interval:
+                return self.current_rule, False
+        switched = self.current_rule is not None
+        if switched:
+            self.switch_count += 1
+        self.current_rule = compiled.names[best]
+        self.reference = self.vector.copy()
+        self.last_switch_at = now
+        return self.current_rule, switched
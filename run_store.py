@@ -0,0 +1,155 @@
+import json
+import os
+import shutil
+import threading
+from collections.abc import Mapping
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from config import RUN_STORE_PATH, RUN_STORE_MAX_RUNS, API_DEFAULT_PAGE_SIZE, API_MAX_PAGE_SIZE
+
+MANIFEST_NAME = "manifest.json"
+ARTIFACT_SUFFIX = ".arrow"
+
+class RunArtifacts(Mapping):
+    """单次运行的产物：{产物名: DataFrame}，首次访问时才内存映射读取对应文件"""
+    def __init__(self, store, manifest):
+        self.store = store
+        self.manifest = manifest
+        self.run_id = manifest["运行ID"]
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        frame = self._frames.get(name)
+        if frame is None:
+            if name not in self.manifest["产物"]:
+                raise KeyError(name)
+            with self._lock:
+                frame = self._frames.get(name)
+                if frame is None:
+                    # 无空值的数值列直接引用映射内存（只读），字符串列转换为 Python 对象
+                    frame = self.store.load_table(self.run_id, name).to_pandas(split_blocks=True)
+                    self._frames[name] = frame
+        return frame
+
+    def __iter__(self):
+        return iter(self.manifest["产物"])
+
+    def __len__(self):
+        return len(self.manifest["产物"])
+
+
+class RunStore:
+    """运行结果存储：每个运行ID一个目录，各阶段数据写为未压缩的 Arrow IPC 文件并附清单；读取时内存映射，无需重新仿真"""
+    def __init__(self, root=RUN_STORE_PATH, max_runs=RUN_STORE_MAX_RUNS):
+        self.root = root
+        self.max_runs = max_runs
+        os.makedirs(root, exist_ok=True)
+
+    def run_dir(self, run_id):
+        if not run_id or os.sep in run_id or run_id.startswith("."):
+            raise KeyError(run_id)
+        return os.path.join(self.root, run_id)
+
+    def save(self, run_id, all_data, metadata=None):
+        """写入一次运行的全部表格产物；先写临时目录、写完清单后整体改名，读取方不会看到写了一半的运行"""
+        temp_dir = os.path.join(self.root, f".{run_id}.{os.getpid()}.tmp")
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        os.makedirs(temp_dir)
+        artifacts = {}
+        for name, frame in all_data.items():
+            if not isinstance(frame, pd.DataFrame):
+                continue
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            file_name = name + ARTIFACT_SUFFIX
+            path = os.path.join(temp_dir, file_name)
+            with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            artifacts[name] = {
+                "文件": file_name,
+                "行数": table.num_rows,
+                "列": table.column_names,
+                "字节数": os.path.getsize(path)
+            }
+
+        manifest = {
+            "运行ID": run_id,
+            "保存时间": datetime.now().isoformat(timespec="microseconds"),
+            "产物": artifacts,
+            "元数据": metadata or {}
+        }
+        with open(os.path.join(temp_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        run_dir = self.run_dir(run_id)
+        shutil.rmtree(run_dir, ignore_errors=True)
+        os.replace(temp_dir, run_dir)
+        self._prune()
+        return manifest
+
+    def manifest(self, run_id):
+        try:
+            with open(os.path.join(self.run_dir(run_id), MANIFEST_NAME), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            raise KeyError(run_id) from None
+
+    def list_runs(self):
+        """全部已保存运行的清单，按保存时间从新到旧排列"""
+        manifests = []
+        for entry in os.listdir(self.root):
+            if entry.startswith("."):
+                continue
+            try:
+                manifests.append(self.manifest(entry))
+            except KeyError:
+                continue
+        return sorted(manifests, key=lambda manifest: manifest["保存时间"], reverse=True)
+
+    def latest(self):
+        """最近一次运行的清单；没有已保存运行时返回 None"""
+        runs = self.list_runs()
+        return runs[0] if runs else None
+
+    def _prune(self):
+        # 只保留最近 max_runs 次运行
+        for manifest in self.list_runs()[self.max_runs:]:
+            shutil.rmtree(self.run_dir(manifest["运行ID"]), ignore_errors=True)
+
+    def load_table(self, run_id, name):
+        """内存映射读取单个产物为 pyarrow.Table（零拷贝）"""
+        artifact = self.manifest(run_id)["产物"].get(name)
+        if artifact is None:
+            raise KeyError(name)
+        source = pa.memory_map(os.path.join(self.run_dir(run_id), artifact["文件"]), "r")
+        return pa.ipc.open_file(source).read_all()
+
+    def load(self, run_id):
+        """加载一次运行的全部产物（按需读取的 {产物名: DataFrame} 映射）"""
+        return RunArtifacts(self, self.manifest(run_id))
+
+    def query(self, run_id, name, filters=None, page=1, page_size=API_DEFAULT_PAGE_SIZE):
+        """在映射表上按列等值筛选并分页，返回格式与 TablePager.page 相同；筛选值无法转换为列类型时抛出 ValueError"""
+        table = self.load_table(run_id, name)
+        for column, value in (filters or {}).items():
+            if value in (None, "") or column not in table.column_names:
+                continue
+            try:
+                scalar = pa.scalar(value).cast(table.schema.field(column).type)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                raise ValueError(f"筛选值 {value!r} 无法转换为列 {column} 的类型") from None
+            table = table.filter(pc.equal(table[column], scalar))
+
+        page_size = min(max(int(page_size), 1), API_MAX_PAGE_SIZE)
+        page = max(int(page), 1)
+        total = table.num_rows
+        page_rows = table.slice((page - 1) * page_size, page_size).to_pandas()
+        return {
+            "items": json.loads(page_rows.to_json(orient="records", force_ascii=False, date_format="iso")),
+            "page": page,
+            "page_size": page_size,
+            "total": total,
+            "pages": (total + page_size - 1) // page_size
+        }
@@ -0,0 +1,183 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+import pandas as pd
+from config import PARTITION_TOPOLOGY, SCHEDULING_HORIZON_SECONDS, CYCLE_LATENCY_BUDGET_MS, CYCLE_MIN_PLANNED_ORDERS
+from logger_utils import NullProgressLogger
+from data_generator import DataGenerator
+from virtual_warehouse import VirtualWarehouse
+from adaptive_scheduler import AdaptiveScheduler, HELD_STATUS
+from task_processor import TaskProcessor
+from resource_matcher import ResourceMatcher
+from command_executor import CommandExecutor
+from state_corrector import StreamingStateCorrector
+
+class RollingHorizonScheduler:
+    """滚动时域调度服务：持续接收订单与反馈，按固定周期重新规划，仅下发本周期新承诺的指令"""
+    def __init__(self, topology_data, equipment_status, inventory_data, progress_logger=None,
+                 horizon_seconds=SCHEDULING_HORIZON_SECONDS, latency_budget_ms=CYCLE_LATENCY_BUDGET_MS):
+        self.progress_logger = progress_logger or NullProgressLogger()
+        self.horizon_seconds = horizon_seconds
+        self.latency_budget_ms = latency_budget_ms
+        
+        self.virtual_warehouse = VirtualWarehouse(self.progress_logger)
+        self.virtual_warehouse.build_model(topology_data, equipment_status)
+        self.virtual_warehouse.inject_real_time_data(inventory_data, pd.DataFrame(columns=["订单ID"]))
+        self.scheduler = AdaptiveScheduler(self.virtual_warehouse, self.progress_logger)
+        self.scheduler.implant_core()
+        self.task_processor = TaskProcessor(self.virtual_warehouse, self.progress_logger)
+        self.resource_matcher = ResourceMatcher(self.virtual_warehouse, equipment_status, self.progress_logger)
+        self.executor = CommandExecutor(self.virtual_warehouse, self.progress_logger)
+        self.corrector = StreamingStateCorrector(self.virtual_warehouse, self.progress_logger)
+        
+        self.order_queue = queue.Queue()
+        self.feedback_queue = queue.Queue()
+        self.backlog = pd.DataFrame()
+        self.device_busy_until = {}
+        # 单周期重新规划的积压订单上限（None 为不限），按延迟预算自适应调整
+        self.plan_limit = None
+        self.cycle_count = 0
+        self.cycle_reports = deque(maxlen=1000)
+        self._stop_event = threading.Event()
+    
+    def submit_orders(self, order_data):
+        """提交新订单（线程安全），在下一个调度周期纳入规划"""
+        self.order_queue.put(order_data)
+    
+    def submit_feedback(self, feedback_data):
+        """提交外部执行终端反馈（线程安全），在下一个调度周期参与状态校正"""
+        self.feedback_queue.put(feedback_data)
+    
+    def _drain(self, source_queue):
+        frames = []
+        while True:
+            try:
+                frames.append(source_queue.get_nowait())
+            except queue.Empty:
+                return frames
+    
+    def run_cycle(self):
+        """执行一个调度周期：接收→分解→匹配→承诺→下发→反馈校正，返回周期报告"""
+        cycle_start = time.perf_counter()
+        now = datetime.now()
+        self.cycle_count += 1
+        
+        # 1. 接收新订单，写入孪生体
+        new_orders = self._drain(self.order_queue)
+        new_order_count = sum(len(frame) for frame in new_orders)
+        if new_order_count:
+            self.virtual_warehouse.apply_events([
+                {"事件类型": "新增订单", "订单": order}
+                for frame in new_orders for order in frame.to_dict("records")
+            ])
+            self.backlog = pd.concat([self.backlog, *new_orders], ignore_index=True)
+        
+        # 2. 对积压订单重新规划（超预算后仅规划最早到达的 plan_limit 个），仅承诺首个原子操作落在本时域内的任务
+        committed_commands = pd.DataFrame()
+        planning = self.backlog if self.plan_limit is None else self.backlog.head(self.plan_limit)
+        if not planning.empty:
+            task_graph = self.task_processor.process_task_request(planning)
+            resource_plan = self.resource_matcher.match_resources(task_graph, busy_until=self.device_busy_until)
+            commit_deadline = (now + timedelta(seconds=self.horizon_seconds)).strftime("%Y-%m-%d %H:%M:%S")
+            task_start = resource_plan.groupby("任务ID", sort=False)["执行时间"].transform("min")
+            committed_plan = resource_plan[task_start <= commit_deadline].reset_index(drop=True)
+            
+            if not committed_plan.empty:
+                # 路径冲突无法在最大延迟内避让的任务暂缓下发，订单留在积压中；其余行的执行与完成时间已按路径延迟顺延
+                committed_commands = self.scheduler.execute_strategy(committed_plan)
+                self._commit(committed_plan[committed_plan["资源状态"] != HELD_STATUS])
+        
+        # 3. 下发新承诺的指令并采集反馈
+        feedback_frames = self._drain(self.feedback_queue)
+        if not committed_commands.empty:
+            issued_commands = self.executor.issue_commands(committed_commands)
+            feedback_frames.append(self.executor.collect_feedback(issued_commands))
+        
+        # 4. 状态校正（流式更新设备偏差统计，越限设备触发校准）
+        over_threshold_count = sum(self.corrector.consume_batch(frame) for frame in feedback_frames)
+        
+        latency_ms = (time.perf_counter() - cycle_start) * 1000
+        report = {
+            "周期序号": self.cycle_count,
+            "周期开始时间": now.strftime("%Y-%m-%d %H:%M:%S"),
+            "新增订单": new_order_count,
+            "积压订单": len(self.backlog),
+            "规划订单": len(planning),
+            "下发指令": len(committed_commands),
+            "超限数量": over_threshold_count,
+            "周期耗时ms": round(latency_ms, 2),
+            "延迟预算ms": self.latency_budget_ms,
+            "是否超预算": latency_ms > self.latency_budget_ms
+        }
+        self.cycle_reports.append(report)
+        log = self.progress_logger.logger.warning if report["是否超预算"] else self.progress_logger.logger.info
+        log(f"调度周期{self.cycle_count}：新增订单{new_order_count}个，规划订单{len(planning)}个，"
+            f"下发指令{len(committed_commands)}条，积压订单{len(self.backlog)}个，"
+            f"耗时{latency_ms:.1f}ms（预算{self.latency_budget_ms}ms）")
+        self._adjust_plan_limit(latency_ms, len(planning))
+        return report
+    
+    def _adjust_plan_limit(self, latency_ms, planned):
+        """执行延迟预算：超预算时下一周期规划的积压订单数减半，耗时低于预算一半时加倍，直至不再限制"""
+        if latency_ms > self.latency_budget_ms and planned > CYCLE_MIN_PLANNED_ORDERS:
+            self.plan_limit = max(planned // 2, CYCLE_MIN_PLANNED_ORDERS)
+            self.progress_logger.logger.warning(f"调度周期超出延迟预算，下一周期最多规划{self.plan_limit}个积压订单")
+        elif self.plan_limit is not None and latency_ms < self.latency_budget_ms / 2:
+            self.plan_limit *= 2
+            if self.plan_limit >= len(self.backlog):
+                self.plan_limit = None
+    
+    def _commit(self, committed_plan):
+        """登记已承诺任务：更新设备预计空闲时间，将订单移出积压队列并以订单已承诺事件写入孪生体（订单完成由执行反馈上报）"""
+        finish_by_device = committed_plan.groupby("分配设备")["预计完成时间"].max()
+        for eq, finish_time in finish_by_device.items():
+            if finish_time > self.device_busy_until.get(eq, ""):
+                self.device_busy_until[eq] = finish_time
+        
+        committed_ids = committed_plan["任务ID"].unique()
+        self.backlog = self.backlog[~self.backlog["订单ID"].isin(committed_ids)].reset_index(drop=True)
+        self.virtual_warehouse.apply_events([
+            {"事件类型": "订单已承诺", "订单ID": order_id} for order_id in committed_ids
+        ])
+    
+    def run(self, max_cycles=None):
+        """按固定时域循环调度，直到 stop() 或达到 max_cycles"""
+        next_cycle = time.monotonic()
+        while not self._stop_event.is_set():
+            self.run_cycle()
+            if max_cycles is not None and self.cycle_count >= max_cycles:
+                break
+            next_cycle += self.horizon_seconds
+            self._stop_event.wait(max(next_cycle - time.monotonic(), 0))
+    
+    def stop(self):
+        self._stop_event.set()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(module)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    data_gen = DataGenerator()
+    service = RollingHorizonScheduler(
+        data_gen.generate_topology_data(PARTITION_TOPOLOGY),
+        data_gen.generate_equipment_status(),
+        data_gen.generate_inventory_data()
+    )
+    
+    def feed_orders(batch_size=5, batches=10):
+        # 模拟订单持续到达
+        for batch in range(batches):
+            service.submit_orders(data_gen.generate_order_data(count=batch_size, start_index=batch * batch_size))
+            time.sleep(service.horizon_seconds)
+    
+    threading.Thread(target=feed_orders, daemon=True).start()
+    try:
+        service.run()
+    except KeyboardInterrupt:
+        service.stop()
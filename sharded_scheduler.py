@@ -0,0 +1,337 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from config import PARTITION_TOPOLOGY, SHARD_COUNT, SHARD_MAX_WORKERS
+from command_table import CommandTable
+from adaptive_scheduler import UNRESOLVED_CONFLICT
+from routing_engine import path_segment
+from stage_profiler import profiled_stage
+
+SHARD_COLUMN = "__分片"
+
+class _RowPaths(dict):
+    """按行号读取指令表路径的字典：未改写的行从指令表按需解码"""
+    def __init__(self, control_commands):
+        super().__init__()
+        self.control_commands = control_commands
+
+    def __missing__(self, row):
+        return self.control_commands.path(row)
+
+def partition_clusters(adjacency, shard_count):
+    """按拓扑广度优先顺序把逻辑分区切成至多 shard_count 个分区簇，相邻分区尽量落在同一簇"""
+    order, seen = [], set()
+    for start in adjacency:
+        if start in seen:
+            continue
+        seen.add(start)
+        queue = deque([start])
+        while queue:
+            partition = queue.popleft()
+            order.append(partition)
+            for neighbor in adjacency.get(partition, []):
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    queue.append(neighbor)
+    shard_count = max(1, min(shard_count, len(order)))
+    return [chunk.tolist() for chunk in np.array_split(np.asarray(order, dtype=object), shard_count)]
+
+
+def topology_adjacency(topology_data):
+    """拓扑数据→{分区: [相邻分区]}（无向）"""
+    adjacency = {}
+    for source, target in zip(topology_data["源分区"].tolist(), topology_data["目标分区"].tolist()):
+        adjacency.setdefault(source, []).append(target)
+        adjacency.setdefault(target, []).append(source)
+    return adjacency
+
+
+def boundary_segments(cluster, adjacency):
+    """分区簇的边界路径段（一端在簇内、一端在簇外）：簇内绕行不得经过"""
+    members = set(cluster)
+    return {path_segment(partition, neighbor) for partition in cluster
+            for neighbor in adjacency.get(partition, []) if neighbor not in members}
+
+
+def cluster_reservations(buckets, cluster):
+    """全局预约表中两端都在分区簇内的路径段预约 {时间窗: {路径段: 设备ID}}"""
+    members = set(cluster)
+    result = {}
+    for slot, segments in buckets.items():
+        inside = {segment: device for segment, device in segments.items() if members.issuperset(segment)}
+        if inside:
+            result[slot] = inside
+    return result
+
+
+def assign_devices(clusters, equipment_status):
+    """按设备当前位置把设备划入分区簇，返回（分区簇列表, 各设备的分片号）；
+    缺少任一设备类型的簇并入广度优先顺序上相邻的簇，保证每个分片独占全部类型的设备、设备不跨分片"""
+    clusters = [list(cluster) for cluster in clusters]
+    required = set(equipment_status["设备类型"])
+    while True:
+        cluster_of = {partition: shard for shard, cluster in enumerate(clusters) for partition in cluster}
+        device_shards = equipment_status["当前位置"].map(cluster_of).fillna(0).astype(np.int64).to_numpy()
+        if len(clusters) == 1:
+            return clusters, device_shards
+        shard_types = equipment_status.groupby(device_shards)["设备类型"].agg(set).to_dict()
+        lacking = [shard for shard in range(len(clusters)) if not required <= shard_types.get(shard, set())]
+        if not lacking:
+            return clusters, device_shards
+        shard = lacking[0]
+        neighbor = shard - 1 if shard > 0 else 1
+        merged = clusters[min(shard, neighbor)] + clusters[max(shard, neighbor)]
+        clusters[min(shard, neighbor)] = merged
+        del clusters[max(shard, neighbor)]
+
+
+def schedule_shard(context, order_data):
+    """单个分片的调度流水线：在分片自己的孪生体上执行任务分解、资源匹配、路径规划与分区簇内的路径预约，
+    返回（资源匹配方案, 指令表, 延后到全局冲突避让的行号, 已在簇内预约的行号, 冲突未解除的行号, 各设备累计顺延秒数）"""
+    from logger_utils import NullProgressLogger
+    from virtual_warehouse import VirtualWarehouse
+    from adaptive_scheduler import AdaptiveScheduler
+    from task_processor import TaskProcessor
+    from resource_matcher import ResourceMatcher
+
+    if context.get("seed") is not None:
+        np.random.seed(context["seed"])
+    progress_logger = NullProgressLogger()
+    virtual_warehouse = VirtualWarehouse(progress_logger)
+    virtual_warehouse.build_model(context["topology_data"], context["equipment_status"])
+    virtual_warehouse.inject_real_time_data(context["inventory_data"], order_data)
+    scheduler = AdaptiveScheduler(virtual_warehouse, progress_logger)
+    # 以全局预约表中本分区簇的现有预约为起点，绕行不得离开本分区簇
+    scheduler.path_reservations.buckets = {slot: dict(segments) for slot, segments in context["reservations"].items()}
+    scheduler.blocked_segments = context["boundary_segments"]
+
+    task_graph = TaskProcessor(virtual_warehouse, progress_logger).process_task_request(order_data)
+    resource_plan = ResourceMatcher(virtual_warehouse, context["equipment_status"], progress_logger).match_resources(
+        task_graph, busy_until=context["busy_until"]
+    )
+    paths, execute_times, conflicts = scheduler.plan_paths(resource_plan)
+
+    # 路径全部位于本分区簇内的移动设备行就地预约（绕行限制在簇内，不同分区簇的路径段互不相交）；经过其他分区簇的行留待合并后统一预约。
+    # 设备自其首个跨簇行起（按执行时间）的后续各行一并延后，合并时按时间顺序预约，延迟顺延才能覆盖该设备的全部后续行
+    local_partitions = set(context["partitions"])
+    mobile_rows = scheduler.mobile_rows(resource_plan)
+    crossing = np.fromiter((not local_partitions.issuperset(paths[row]) for row in mobile_rows), dtype=bool, count=len(mobile_rows))
+    devices = resource_plan["分配设备"].to_numpy(dtype=object)[mobile_rows]
+    times = execute_times[mobile_rows].astype(str)
+    first_crossing = pd.Series(times[crossing]).groupby(devices[crossing]).min().to_dict() if crossing.any() else {}
+    deferred = crossing | np.fromiter(
+        (device in first_crossing and time >= first_crossing[device] for device, time in zip(devices, times)),
+        dtype=bool, count=len(mobile_rows)
+    )
+    unresolved_rows, device_delays = scheduler.reserve_paths(
+        resource_plan, paths, execute_times, conflicts, mobile_rows[~deferred]
+    )
+    control_commands = scheduler.build_commands(resource_plan, paths, execute_times, conflicts)
+    return resource_plan, control_commands, mobile_rows[deferred], mobile_rows[~deferred], unresolved_rows, device_delays
+
+
+def _shard_worker(shared_name, shard, context):
+    """子进程：从共享内存中的 Arrow 订单表读取本分片订单并调度；指令表以二进制线格式回传"""
+    block = shared_memory.SharedMemory(name=shared_name, track=False)
+    try:
+        table = pa.ipc.open_stream(pa.py_buffer(block.buf)).read_all()
+        order_data = table.filter(pc.equal(table[SHARD_COLUMN], shard)).drop_columns([SHARD_COLUMN]).to_pandas()
+        del table
+    finally:
+        block.close()
+    resource_plan, control_commands, *rows = schedule_shard(context, order_data)
+    return resource_plan, control_commands.to_bytes(), *rows
+
+
+class ShardedScheduler:
+    """分片调度：按拓扑分区簇把订单（按目标位置）与设备（按当前位置）划分为互不相交的分片，在进程池中并行执行
+    任务分解、资源匹配与指令生成；订单以 Arrow 格式放入共享内存供各子进程读取，合并后对经过其他分区簇的
+    移动设备路径做全局冲突避让"""
+    def __init__(self, virtual_warehouse, scheduler, equipment_status, progress_logger, shard_count=SHARD_COUNT,
+                 max_workers=SHARD_MAX_WORKERS, adjacency=None, seed=None):
+        self.virtual_warehouse = virtual_warehouse
+        self.scheduler = scheduler
+        self.equipment_status = equipment_status
+        self.progress_logger = progress_logger
+        self.shard_count = shard_count
+        self.max_workers = max_workers
+        self.adjacency = adjacency
+        self.seed = seed
+        self.clusters = []
+        self.shard_sizes = []
+        self.resource_plan = pd.DataFrame()
+
+    def _adjacency(self):
+        if self.adjacency is not None:
+            return self.adjacency
+        topology_data = self.virtual_warehouse.topology_data
+        return topology_adjacency(topology_data) if not topology_data.empty else PARTITION_TOPOLOGY
+
+    def plan_shards(self):
+        """划分分区簇与设备分片，返回（分区簇列表, 各设备的分片号）"""
+        return assign_devices(partition_clusters(self._adjacency(), self.shard_count), self.equipment_status)
+
+    def _shard_contexts(self, clusters, device_shards, busy_until):
+        """各分片的小体量输入：拓扑、库存、本分片设备（运行状态取孪生体当前值）、已承诺设备的空闲时间、
+        本分区簇的现有路径预约与边界路径段"""
+        store = self.virtual_warehouse.state_store
+        equipment_status = self.equipment_status.copy()
+        equipment_status["运行状态"] = [
+            store.device_state(device, status)
+            for device, status in zip(equipment_status["设备ID"].tolist(), equipment_status["运行状态"].tolist())
+        ]
+        inventory_data = store.inventory_frame()
+        adjacency = self._adjacency()
+        buckets = self.scheduler.path_reservations.buckets
+        contexts = []
+        for shard, cluster in enumerate(clusters):
+            shard_devices = equipment_status[device_shards == shard].reset_index(drop=True)
+            device_ids = set(shard_devices["设备ID"])
+            contexts.append({
+                "partitions": cluster,
+                "topology_data": self.virtual_warehouse.topology_data,
+                "inventory_data": inventory_data,
+                "equipment_status": shard_devices,
+                "busy_until": {
+                    device: free_at for device, free_at in (busy_until or {}).items()
+                    if device in device_ids
+                },
+                "reservations": cluster_reservations(buckets, cluster),
+                "boundary_segments": boundary_segments(cluster, adjacency),
+                "seed": None if self.seed is None else self.seed + shard
+            })
+        return contexts
+
+    @profiled_stage("sharded_schedule")
+    def schedule(self, order_data, busy_until=None):
+        """分片执行 任务分解→资源匹配→指令生成，返回合并后的控制指令表；合并后的资源匹配方案保存在 resource_plan"""
+        self.progress_logger.update_progress(8, "开始分片调度：按分区簇划分订单与设备")
+        self.progress_logger.pace(4)
+        scheduler = self.scheduler
+        scheduler.extract_state_features()
+        scheduler.check_rule_switch()
+        scheduler.path_reservations.release_before(scheduler.path_reservations.to_slot(datetime.now()))
+
+        clusters, device_shards = self.plan_shards()
+        cluster_of = {partition: shard for shard, cluster in enumerate(clusters) for partition in cluster}
+        order_shards = order_data["目标位置"].map(cluster_of).fillna(0).astype(np.int64).to_numpy()
+        shard_ids = [shard for shard in range(len(clusters)) if (order_shards == shard).any()]
+        contexts = self._shard_contexts(clusters, device_shards, busy_until)
+        self.clusters = clusters
+        self.shard_sizes = np.bincount(order_shards, minlength=len(clusters)).tolist()
+
+        max_workers = min(self.max_workers, len(shard_ids), os.cpu_count() or 1)
+        if max_workers > 1:
+            results = self._run_parallel(order_data, order_shards, shard_ids, contexts, max_workers)
+        else:
+            results = [schedule_shard(contexts[shard], order_data[order_shards == shard].reset_index(drop=True))
+                       for shard in shard_ids]
+        self.progress_logger.update_progress(4, f"{len(shard_ids)}个分片调度完成，开始合并与跨区冲突避让")
+        self.progress_logger.pace(2)
+        self.resource_plan, control_commands = self._merge(results)
+        self.progress_logger.update_progress(4, "分片调度完成，控制指令序列生成完成")
+        self.progress_logger.pace(2)
+        return control_commands
+
+    def _run_parallel(self, order_data, order_shards, shard_ids, contexts, max_workers):
+        # 订单表（附分片列）序列化为 Arrow IPC 流写入共享内存，各子进程只读取并筛选本分片的行
+        table = pa.Table.from_pandas(order_data, preserve_index=False)
+        table = table.append_column(SHARD_COLUMN, pa.array(order_shards))
+        # 先以计数流求出序列化大小，再直接写入共享内存块，不经中间缓冲
+        counter = pa.MockOutputStream()
+        with pa.ipc.new_stream(counter, table.schema) as writer:
+            writer.write_table(table)
+        block = shared_memory.SharedMemory(create=True, size=max(counter.size(), 1))
+        try:
+            target = pa.py_buffer(block.buf)
+            with pa.ipc.new_stream(pa.FixedSizeBufferWriter(target), table.schema) as writer:
+                writer.write_table(table)
+            del target, writer, table
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                futures = [pool.submit(_shard_worker, block.name, shard, contexts[shard]) for shard in shard_ids]
+                results = []
+                for future in futures:
+                    resource_plan, command_bytes, *rows = future.result()
+                    results.append((resource_plan, CommandTable.from_bytes(command_bytes), *rows))
+            return results
+        finally:
+            block.close()
+            block.unlink()
+
+    def _merge(self, results):
+        """合并各分片结果：簇内预约按最终路径与执行时间并入调度器的全局预约表（与已有预约冲突的行改为全局重新预约），
+        再按执行时间预约延后的移动设备路径；含冲突未解除行的任务暂缓下发，其余指令重新编号"""
+        scheduler = self.scheduler
+        if not results:
+            resource_plan = pd.DataFrame()
+            control_commands = scheduler.build_commands(
+                pd.DataFrame(columns=["任务ID", "原子操作", "分配设备", "目标位置", "任务类型"]), [], [], []
+            )
+            return resource_plan, control_commands
+
+        resource_plan = pd.concat([result[0] for result in results], ignore_index=True)
+        control_commands = CommandTable.concat([result[1] for result in results])
+
+        offsets = np.cumsum([0] + [len(result[0]) for result in results])
+
+        def shifted(index):
+            return np.concatenate([result[index] + offset for result, offset in zip(results, offsets)]).astype(np.int64)
+
+        deferred_rows, local_rows, unresolved_rows = shifted(2), shifted(3), shifted(4)
+        # 各分片的设备互不相交，顺延秒数直接合并
+        device_delays = {device: delay for result in results for device, delay in result[5].items()}
+        conflicted_rows = self._merge_reservations(control_commands, local_rows)
+        deferred_rows = np.concatenate([deferred_rows, conflicted_rows])
+
+        paths = _RowPaths(control_commands)
+        execute_times = resource_plan["执行时间"].to_numpy(dtype=object).copy()
+        conflicts = control_commands.decode("冲突避让").astype(object)
+        if len(deferred_rows):
+            global_unresolved, _ = scheduler.reserve_paths(
+                resource_plan, paths, execute_times, conflicts, deferred_rows, device_delays
+            )
+            unresolved_rows = np.concatenate([unresolved_rows, global_unresolved])
+            control_commands = control_commands.replace_rows(
+                deferred_rows, [paths[row] for row in deferred_rows.tolist()], execute_times[deferred_rows],
+                conflicts[deferred_rows]
+            )
+        keep = scheduler.hold_back(resource_plan, paths, execute_times, conflicts, unresolved_rows)
+        if not keep.all():
+            control_commands = control_commands.select(keep)
+        control_commands.columns["指令序号"] = 2025001 + scheduler.issued_command_count + np.arange(len(control_commands))
+        scheduler.issued_command_count += len(control_commands)
+        return resource_plan, control_commands
+
+    def _merge_reservations(self, control_commands, local_rows):
+        """按执行时间逐行检查分片已预约的路径与全局预约表是否冲突，无冲突时写入全局预约表；返回需全局重新预约的行号
+        （冲突行及同一设备此后的各行）"""
+        reservations = self.scheduler.path_reservations
+        conflicts = control_commands.decode("冲突避让")
+        devices = control_commands.decode("分配设备")
+        times = control_commands.columns["执行时间"][local_rows]
+        local_rows = local_rows[np.argsort(times, kind="stable")]
+        execute_times = pd.DatetimeIndex(control_commands.columns["执行时间"][local_rows].view("datetime64[ns]"))
+        conflicted, conflicted_devices = [], set()
+        for row, execute_time in zip(local_rows.tolist(), execute_times.to_pydatetime()):
+            # 冲突未解除的行在分片内未预约
+            if conflicts[row] == UNRESOLVED_CONFLICT:
+                continue
+            if devices[row] in conflicted_devices:
+                conflicted.append(row)
+                continue
+            path = control_commands.path(row)
+            start_slot = reservations.to_slot(execute_time)
+            if reservations.is_free(path, start_slot, devices[row]):
+                reservations.reserve(path, start_slot, devices[row])
+            else:
+                conflicted.append(row)
+                conflicted_devices.add(devices[row])
+        if conflicted:
+            self.progress_logger.logger.warning(f"{len(conflicted)}条分片内预约与全局预约冲突，改为全局重新预约")
+        return np.asarray(conflicted, dtype=np.int64)
@@ -0,0 +1,287 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from config import (PROGRESS_TOTAL_STEPS, PARTITION_TOPOLOGY, SIMULATION_STATE_PATH, SIMULATION_ORDER_COUNT,
+                    SIMULATION_REUSE_LAST_RUN, STATE_DEVIATION_THRESHOLD, EVENT_MAX_ALERTS)
+from logger_utils import ProgressLogger
+from event_stream import EventBroadcaster
+from stage_profiler import stage_profiler
+from run_store import RunStore
+
+try:
+    import fcntl
+except ImportError:  # 无 fcntl 的平台（Windows）退化为每个进程各自运行仿真
+    fcntl = None
+
+def simulation_fingerprint(order_count=SIMULATION_ORDER_COUNT):
+    """仿真参数指纹：订单数、config 全部配置项与项目源码内容的哈希；任一项变化即视为不同的仿真"""
+    import config
+    settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps({"订单数": order_count, "配置": settings}, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8"))
+    root = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(root)):
+        if name.endswith(".py"):
+            with open(os.path.join(root, name), "rb") as f:
+                digest.update(name.encode("utf-8"))
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def run_simulation(progress_logger, order_count=SIMULATION_ORDER_COUNT, emit=None):
+    """运行一次完整调度仿真，返回各阶段数据 all_data（图表由 Web 端按需渲染）；emit 接收指令数量与偏差告警事件"""
+    # 调度模块依赖 pandas，在后台线程中导入，不拖慢 Web 进程启动
+    from data_generator import DataGenerator
+    from virtual_warehouse import VirtualWarehouse
+    from adaptive_scheduler import AdaptiveScheduler
+    from task_processor import TaskProcessor
+    from resource_matcher import ResourceMatcher
+    from command_executor import CommandExecutor
+    from state_corrector import StateCorrector
+
+    emit = emit or (lambda event: None)
+    all_data = {}
+
+    # 1. 加载数据
+    data_gen = DataGenerator()
+    order_data = data_gen.generate_order_data(count=order_count)
+    inventory_data = data_gen.generate_inventory_data()
+    equipment_status = data_gen.generate_equipment_status()
+    topology_data = data_gen.generate_topology_data(PARTITION_TOPOLOGY)
+
+    all_data.update({
+        "order_data": order_data,
+        "inventory_data": inventory_data,
+        "equipment_status": equipment_status,
+        "topology_data": topology_data
+    })
+    progress_logger.update_progress(5, "数据加载完成")
+
+    # 2. 构建虚拟仓储模型
+    virtual_warehouse = VirtualWarehouse(progress_logger)
+    virtual_warehouse.build_model(topology_data, equipment_status)
+    virtual_warehouse.inject_real_time_data(inventory_data, order_data)
+
+    # 3. 植入自适应调度逻辑核心
+    scheduler = AdaptiveScheduler(virtual_warehouse, progress_logger)
+    scheduler.implant_core()
+
+    # 4. 任务解析
+    task_processor = TaskProcessor(virtual_warehouse, progress_logger)
+    task_graph = task_processor.process_task_request(order_data)
+    all_data["task_graph"] = task_graph
+
+    # 5. 资源匹配
+    resource_matcher = ResourceMatcher(virtual_warehouse, equipment_status, progress_logger)
+    resource_plan = resource_matcher.match_resources(task_graph)
+    all_data["resource_plan"] = resource_plan
+
+    # 6. 生成控制指令
+    control_commands = scheduler.execute_strategy(resource_plan)
+    all_data["control_commands"] = control_commands.to_frame()
+    emit({"类型": "commands", "阶段": "生成控制指令", "指令数量": len(control_commands)})
+
+    # 7. 下发指令与采集反馈
+    executor = CommandExecutor(virtual_warehouse, progress_logger)
+    issued_commands = executor.issue_commands(control_commands)
+    emit({"类型": "commands", "阶段": "指令下发", "指令数量": len(issued_commands)})
+    feedback_data = executor.collect_feedback(issued_commands)
+    all_data["feedback_data"] = feedback_data
+    emit({"类型": "commands", "阶段": "反馈采集", "指令数量": len(feedback_data)})
+
+    # 8. 状态校正
+    corrector = StateCorrector(virtual_warehouse, progress_logger)
+    deviation_analysis = corrector.calculate_deviation(feedback_data)
+    all_data["deviation_analysis"] = deviation_analysis
+    alerts = deviation_analysis[deviation_analysis["是否超限"]]
+    emit({"类型": "alert_summary", "超限数量": len(alerts), "偏差阈值": STATE_DEVIATION_THRESHOLD})
+    for alert in alerts.head(EVENT_MAX_ALERTS).to_dict("records"):
+        emit({
+            "类型": "alert",
+            "设备ID": alert["设备ID"],
+            "指令ID": alert["指令ID"],
+            "综合偏差值": round(float(alert["综合偏差值"]), 2)
+        })
+    corrector.calibrate_model()
+
+    remaining_progress = 100 - progress_logger.current_progress
+    if remaining_progress > 0:
+        progress_logger.update_progress(remaining_progress, "仿真运行完成")
+    return all_data
+
+
+class SimulationWorker:
+    """后台仿真工作器：同一状态目录下只有持有生产者文件锁的进程运行仿真，其余工作进程读取其发布的运行状态与最近事件，
+    仿真结果经运行存储共享"""
+    def __init__(self, state_dir=SIMULATION_STATE_PATH, run_store=None, reuse_last_run=SIMULATION_REUSE_LAST_RUN):
+        self.state_dir = state_dir
+        self.lock_path = os.path.join(state_dir, "producer.lock")
+        self.status_path = os.path.join(state_dir, "status.json")
+        self.run_store = run_store or RunStore()
+        self.reuse_last_run = reuse_last_run
+        self.parameters = {"订单数": SIMULATION_ORDER_COUNT, "指纹": simulation_fingerprint(SIMULATION_ORDER_COUNT)}
+        self.is_producer = False
+        self._lock_file = None
+        self._thread = None
+        self._status = {"状态": "未启动"}
+        self._result = None
+        self._result_run_id = None
+        self._result_lock = threading.Lock()
+        # 实时事件：生产者直接发布；其他工作进程从状态文件的最近事件中同步
+        self.events = EventBroadcaster()
+        self._events_run_id = None
+        self._events_synced = 0
+        self._events_lock = threading.Lock()
+
+    def start(self):
+        """非阻塞启动：抢到生产者锁则加载最近一次运行或在后台线程中运行仿真，否则作为消费者；返回是否为生产者"""
+        if self._lock_file is None:
+            os.makedirs(self.state_dir, exist_ok=True)
+            self._lock_file = open(self.lock_path, "a")
+        if not self.is_producer and self._try_acquire():
+            self.is_producer = True
+            self._status = {"状态": "启动中"}
+            if not (self.reuse_last_run and self._restore_last_run()):
+                self._thread = threading.Thread(target=self._produce, name="simulation-producer", daemon=True)
+                self._thread.start()
+        return self.is_producer
+
+    def _restore_last_run(self):
+        """热启动：运行存储中已有仿真参数（订单数、配置与源码指纹）一致的运行时直接映射加载，返回是否成功"""
+        manifest = next((
+            manifest for manifest in self.run_store.list_runs()
+            if manifest["元数据"].get("仿真参数") == self.parameters
+        ), None)
+        if manifest is None:
+            return False
+        with self._result_lock:
+            self._result = self.run_store.load(manifest["运行ID"])
+            self._result_run_id = manifest["运行ID"]
+        # 历史运行的阶段性能保留在清单中，状态只反映当前进程
+        metadata = {key: value for key, value in manifest["元数据"].items() if key != "阶段性能"}
+        status = {**metadata, "运行ID": manifest["运行ID"], "生产者进程": os.getpid(), "状态": "就绪", "来源": "运行存储"}
+        self.events.publish({"类型": "run", **status})
+        self._publish(status)
+        return True
+
+    def _try_acquire(self):
+        if fcntl is None:
+            return True
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def _produce(self):
+        progress_logger = ProgressLogger(PROGRESS_TOTAL_STEPS)
+        run_status = {
+            "运行ID": uuid.uuid4().hex,
+            "生产者进程": os.getpid(),
+            "开始时间": datetime.now().isoformat(timespec="seconds")
+        }
+        stage_started = time.perf_counter()
+
+        def on_progress(event):
+            # 阶段耗时：距上一次进度事件的时间
+            nonlocal stage_started
+            now = time.perf_counter()
+            self.events.publish({"类型": "progress", **event, "阶段耗时ms": round((now - stage_started) * 1000, 1)})
+            stage_started = now
+            self._publish({**run_status, "状态": "运行中", **progress_logger.snapshot()})
+
+        self.events.publish({"类型": "run", "状态": "运行中", **run_status})
+        self._publish({**run_status, "状态": "运行中", **progress_logger.snapshot()})
+        progress_logger.add_listener(on_progress)
+        try:
+            all_data = run_simulation(progress_logger, order_count=self.parameters["订单数"], emit=self.events.publish)
+            # 先写入运行存储再发布就绪状态，消费者看到就绪时结果必然完整
+            self.run_store.save(run_status["运行ID"], all_data, metadata={
+                **run_status, **progress_logger.snapshot(),
+                "完成时间": datetime.now().isoformat(timespec="seconds"),
+                "仿真参数": self.parameters,
+                "阶段性能": stage_profiler.to_dict()
+            })
+            with self._result_lock:
+                self._result = all_data
+                self._result_run_id = run_status["运行ID"]
+            final_status = {"状态": "就绪"}
+        except Exception as e:
+            progress_logger.logger.error(f"后台仿真运行异常：{str(e)}", exc_info=True)
+            final_status = {"状态": "失败", "错误": str(e)}
+        finally:
+            progress_logger.close()
+        self.events.publish({"类型": "run", **run_status, **final_status})
+        self._publish({
+            **run_status, **progress_logger.snapshot(), **final_status,
+            "完成时间": datetime.now().isoformat(timespec="seconds")
+        })
+
+    def _publish(self, status):
+        status["最近事件"] = self.events.recent()
+        status["阶段性能"] = stage_profiler.to_dict()
+        self._status = status
+        self._write_atomic(self.status_path, json.dumps(status, ensure_ascii=False).encode("utf-8"))
+
+    def _write_atomic(self, path, payload):
+        # 先写临时文件再替换，其他进程不会读到半截内容
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(payload)
+        os.replace(temp_path, path)
+
+    def status(self):
+        """当前运行状态：状态（运行中/就绪/失败）、进度、当前阶段、阶段记录等"""
+        if self.is_producer:
+            return dict(self._status)
+        try:
+            with open(self.status_path, encoding="utf-8") as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            status = {"状态": "等待生产者"}
+        if status.get("状态") != "就绪" and self._lock_file is not None:
+            # 生产者进程退出后锁被释放，由当前进程接管仿真
+            if self.start():
+                return dict(self._status)
+        return status
+
+    def result(self):
+        """仿真结果 all_data；尚未就绪时返回 None"""
+        if self.is_producer:
+            return self._result
+        status = self.status()
+        if self.is_producer:
+            return self._result
+        if status.get("状态") != "就绪":
+            return None
+        with self._result_lock:
+            if self._result_run_id != status["运行ID"]:
+                self._result = self.run_store.load(status["运行ID"])
+                self._result_run_id = status["运行ID"]
+        return self._result
+
+    def metrics(self):
+        """各阶段性能指标（stage_profiler.to_dict() 格式）；非生产者进程读取生产者发布的快照"""
+        if self.is_producer:
+            return stage_profiler.to_dict()
+        return self.status().get("阶段性能", {"采集模式": stage_profiler.mode, "阶段": {}})
+
+    def poll_events(self):
+        """非生产者进程：将状态文件中新增的最近事件同步到本进程的广播器"""
+        if self.is_producer:
+            return
+        status = self.status()
+        if self.is_producer:
+            return
+        with self._events_lock:
+            if status.get("运行ID") != self._events_run_id:
+                self._events_run_id = status.get("运行ID")
+                self._events_synced = 0
+            for event in status.get("最近事件", []):
+                if event["序号"] > self._events_synced:
+                    self._events_synced = event["序号"]
+                    self.events.publish({key: value for key, value in event.items() if key != "序号"})
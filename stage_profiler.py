@@ -0,0 +1,257 @@
+import cProfile
+import functools
+import io
+import math
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from config import PROFILING_MODE, PROFILING_MODES, PROFILING_HISTOGRAM_PRECISION, PROFILING_CAPTURE_TOP
+
+try:
+    import resource
+except ImportError:  # 无 resource 模块的平台（Windows）不记录内存
+    resource = None
+
+# ru_maxrss 的单位：macOS 为字节，Linux 等平台为 KB
+MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+# 流水线各阶段（按执行顺序）
+PIPELINE_STAGES = [
+    "build_model", "inject_real_time_data", "implant_core", "process_task_request", "match_resources",
+    "execute_strategy", "issue_commands", "collect_feedback", "calculate_deviation", "calibrate_model",
+    "generate_charts"
+]
+HISTOGRAM_QUANTILES = [0.5, 0.9, 0.99, 0.999]
+
+class LatencyHistogram:
+    """HDR 风格对数分桶直方图：桶边界按 (1+precision) 等比增长，任意量级下分位数相对误差不超过 precision"""
+    def __init__(self, precision=PROFILING_HISTOGRAM_PRECISION):
+        self.log_base = math.log1p(precision)
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value):
+        value = max(value, 1e-6)
+        bucket = math.floor(math.log(value) / self.log_base)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return 0.0
+        target = max(math.ceil(q * self.count), 1)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                # 取桶的几何中点，并限制在实际观测范围内
+                return min(max(math.exp((bucket + 0.5) * self.log_base), self.min), self.max)
+        return self.max
+
+    def summary(self):
+        summary = {
+            "次数": self.count,
+            "总计": round(self.total, 3),
+            "最小": round(self.min, 3) if self.count else 0.0,
+            "最大": round(self.max, 3)
+        }
+        summary.update({f"p{q * 100:g}": round(self.quantile(q), 3) for q in HISTOGRAM_QUANTILES})
+        return summary
+
+
+class StageStats:
+    """单个阶段的累计指标"""
+    def __init__(self):
+        self.wall_ms = LatencyHistogram()
+        self.cpu_ms = LatencyHistogram()
+        self.rows_in = 0
+        self.rows_out = 0
+        self.memory_delta = None
+        self.capture = {}
+
+    def to_dict(self):
+        return {
+            "调用次数": self.wall_ms.count,
+            "墙钟耗时ms": self.wall_ms.summary(),
+            "CPU耗时ms": self.cpu_ms.summary(),
+            "输入行数": self.rows_in,
+            "输出行数": self.rows_out,
+            "内存增量字节": self.memory_delta or 0,
+            **({"采集": self.capture} if self.capture else {})
+        }
+
+
+def _row_count(value):
+    """DataFrame/Series/数组按行数计，列表按长度计，其他类型不计"""
+    shape = getattr(value, "shape", None)
+    if shape:
+        return shape[0]
+    if isinstance(value, (list, tuple)):
+        return len(value)
+    return 0
+
+
+def process_peak_memory():
+    """进程峰值常驻内存（字节），按平台换算 ru_maxrss 单位；无 resource 模块时为 0"""
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * MAXRSS_UNIT
+
+
+def process_memory():
+    """进程当前常驻内存（字节）：Linux 读取 /proc/self/statm，其他平台退回进程峰值常驻内存"""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return process_peak_memory()
+
+
+class StageProfiler:
+    """流水线阶段性能采集器：记录每个阶段的墙钟/CPU 耗时直方图、输入输出行数与内存增量（阶段结束与开始时的
+    常驻内存之差，取各次调用的最大值），可导出 JSON 与 Prometheus 文本格式"""
+    def __init__(self, mode=PROFILING_MODE):
+        self._started_tracing = False
+        self.set_mode(mode)
+        self.stages = {}
+        self._lock = threading.Lock()
+        self._active = threading.local()
+
+    def set_mode(self, mode):
+        if mode not in PROFILING_MODES:
+            raise ValueError(f"未知的性能采集模式：{mode}，可选值：{PROFILING_MODES}")
+        self.mode = mode
+        if mode != "capture" and self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+
+    def run(self, stage, func, args, kwargs):
+        """执行并记录一次阶段调用；capture 模式下只对最外层阶段做 cProfile/tracemalloc 采集"""
+        if self.mode == "off":
+            return func(*args, **kwargs)
+
+        depth = getattr(self._active, "depth", 0)
+        capture = self.mode == "capture" and depth == 0
+        profiler = None
+        if capture:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            tracemalloc.reset_peak()
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # 外部已有 profiler 在运行时跳过 cProfile 采集
+                profiler = None
+
+        self._active.depth = depth + 1
+        memory_start = process_memory()
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            cpu_ms = (time.thread_time() - cpu_start) * 1000
+            wall_ms = (time.perf_counter() - wall_start) * 1000
+            self._active.depth = depth
+            if profiler is not None:
+                profiler.disable()
+
+        captured = {}
+        if capture:
+            captured["tracemalloc峰值字节"] = tracemalloc.get_traced_memory()[1]
+            if profiler is not None:
+                stream = io.StringIO()
+                pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(PROFILING_CAPTURE_TOP)
+                captured["cProfile"] = stream.getvalue()
+
+        rows_in = sum(_row_count(arg) for arg in args[1:])
+        rows_out = _row_count(result)
+        memory_delta = process_memory() - memory_start
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats()
+            stats.wall_ms.record(wall_ms)
+            stats.cpu_ms.record(cpu_ms)
+            stats.rows_in += rows_in
+            stats.rows_out += rows_out
+            if stats.memory_delta is None or memory_delta > stats.memory_delta:
+                stats.memory_delta = memory_delta
+            if captured:
+                stats.capture = captured
+        return result
+
+    def to_dict(self):
+        """JSON 导出：按流水线顺序列出各阶段指标"""
+        with self._lock:
+            order = PIPELINE_STAGES + sorted(set(self.stages) - set(PIPELINE_STAGES))
+            return {
+                "采集模式": self.mode,
+                "阶段": {stage: self.stages[stage].to_dict() for stage in order if stage in self.stages}
+            }
+
+    def to_prometheus(self):
+        return format_prometheus(self.to_dict())
+
+    def report(self):
+        """各阶段耗时汇总表（文本）"""
+        lines = [f"{'阶段':<24}{'调用':>6}{'墙钟总计ms':>14}{'p99ms':>10}{'CPU总计ms':>14}{'输入行':>10}{'输出行':>10}"]
+        for stage, stats in self.to_dict()["阶段"].items():
+            wall, cpu = stats["墙钟耗时ms"], stats["CPU耗时ms"]
+            lines.append(f"{stage:<24}{stats['调用次数']:>6}{wall['总计']:>14.1f}{wall['p99']:>10.1f}"
+                         f"{cpu['总计']:>14.1f}{stats['输入行数']:>10}{stats['输出行数']:>10}")
+        return "\n".join(lines)
+
+
+def format_prometheus(snapshot):
+    """将 to_dict() 导出结果转换为 Prometheus 文本格式（耗时以 summary 输出，单位秒）"""
+    lines = []
+    stages = snapshot.get("阶段", {})
+    for metric, key, help_text in [
+        ("logistics_stage_wall_seconds", "墙钟耗时ms", "Pipeline stage wall-clock time"),
+        ("logistics_stage_cpu_seconds", "CPU耗时ms", "Pipeline stage CPU time of the calling thread")
+    ]:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} summary"]
+        for stage, stats in stages.items():
+            summary = stats[key]
+            for q in HISTOGRAM_QUANTILES:
+                lines.append(f'{metric}{{stage="{stage}",quantile="{q:g}"}} {summary[f"p{q * 100:g}"] / 1000:.6f}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {summary["总计"] / 1000:.6f}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {summary["次数"]}')
+    for metric, key, metric_type, help_text in [
+        ("logistics_stage_rows_in_total", "输入行数", "counter", "Rows passed into the stage"),
+        ("logistics_stage_rows_out_total", "输出行数", "counter", "Rows returned by the stage"),
+        ("logistics_stage_memory_delta_bytes", "内存增量字节", "gauge",
+         "Largest change in resident memory across a single call of the stage")
+    ]:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {metric_type}"]
+        for stage, stats in stages.items():
+            lines.append(f'{metric}{{stage="{stage}"}} {stats[key]}')
+    return "\n".join(lines) + "\n"
+
+
+def profiled_stage(stage):
+    """阶段方法装饰器：调用经由全局 stage_profiler 记录"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return stage_profiler.run(stage, func, args, kwargs)
+        return wrapper
+    return decorator
+
+
+stage_profiler = StageProfiler()
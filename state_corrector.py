@@ -1,7 +1,29 @@
 import pandas as pd
 import numpy as np
-from config import STATE_DEVIATION_THRESHOLD
-import time
+from config import STATE_DEVIATION_THRESHOLD, STATE_DEVIATION_EWMA_ALPHA, STATE_DEVIATION_CLEAR_RATIO
+from stage_profiler import profiled_stage
+
+PREDICTED_PROGRESS = 85  # 预测完成进度
+
+def compute_deviation(reported_position, predicted_position, reported_progress):
+    """计算单条反馈的（位置偏差, 进度偏差, 综合偏差值）"""
+    # 计算关键变量偏差
+    position_deviation = 1 if reported_position != predicted_position else 0
+    progress_deviation = abs(reported_progress - PREDICTED_PROGRESS) / 100
+    
+    # 加权平均计算综合偏差
+    comprehensive_deviation = (position_deviation * 0.3 + progress_deviation * 0.7) * 10
+    return position_deviation, progress_deviation, comprehensive_deviation
+
+def load_report_events(feedback_data):
+    """反馈中携带的设备运行负荷→设备负荷上报事件（未上报负荷的反馈，如超时，不产生事件）"""
+    if "运行负荷" not in feedback_data:
+        return []
+    reported = feedback_data[feedback_data["运行负荷"].notna()]
+    return [
+        {"事件类型": "设备负荷上报", "设备ID": device, "运行负荷": float(load)}
+        for device, load in zip(reported["设备ID"].tolist(), reported["运行负荷"].tolist())
+    ]
 
 class StateCorrector:
     def __init__(self, virtual_warehouse, progress_logger):
@@ -9,24 +31,23 @@ class StateCorrector:
         self.deviation_analysis = pd.DataFrame()
         self.progress_logger = progress_logger  
     
+    @profiled_stage("calculate_deviation")
     def calculate_deviation(self, feedback_data):
         """计算状态偏差值"""
         self.progress_logger.update_progress(7, "开始计算状态偏差值")
-        time.sleep(3)
+        self.progress_logger.pace(3)
+        
+        # 反馈中携带的设备运行负荷作为负荷上报写入孪生体，更新调度状态特征
+        load_events = load_report_events(feedback_data)
+        if load_events:
+            self.virtual_warehouse.apply_events(load_events)
         
         deviation_results = []
         for _, feedback in feedback_data.iterrows():
-            predicted_position = self.virtual_warehouse.current_state["设备状态"].get(
-                feedback["设备ID"], "未知"
+            predicted_position = self.virtual_warehouse.state_store.device_state(feedback["设备ID"], "未知")
+            position_deviation, progress_deviation, comprehensive_deviation = compute_deviation(
+                feedback["当前位置"], predicted_position, feedback["任务完成进度"]
             )
-            predicted_progress = 85  # 预测完成进度
-            
-            # 计算关键变量偏差
-            position_deviation = 1 if feedback["当前位置"] != predicted_position else 0
-            progress_deviation = abs(feedback["任务完成进度"] - predicted_progress) / 100
-            
-            # 加权平均计算综合偏差
-            comprehensive_deviation = (position_deviation * 0.3 + progress_deviation * 0.7) * 10
             
             deviation_results.append({
                 "设备ID": feedback["设备ID"],
@@ -39,28 +60,125 @@ class StateCorrector:
         
         self.deviation_analysis = pd.DataFrame(deviation_results)
         self.progress_logger.update_progress(6, "状态偏差值计算完成")
-        time.sleep(3)
+        self.progress_logger.pace(3)
         
         return self.deviation_analysis
     
+    @profiled_stage("calibrate_model")
     def calibrate_model(self):
         """校准虚拟仓储模型状态"""
         self.progress_logger.update_progress(8, "开始校准虚拟仓储模型状态")
-        time.sleep(4)
+        self.progress_logger.pace(4)
         
         # 统计超限情况
         over_threshold_count = self.deviation_analysis["是否超限"].sum()
         self.progress_logger.update_progress(4, f"共发现{over_threshold_count}个超限状态")
-        time.sleep(2)
+        self.progress_logger.pace(2)
         
-        # 更新模型状态
-        state_updates = {}
+        # 更新模型状态（以设备状态变更事件增量写入孪生体）
+        calibration_events = []
         for _, dev in self.deviation_analysis.iterrows():
             if dev["是否超限"]:
-                # 更新设备位置
-                self.virtual_warehouse.current_state["设备状态"][dev["设备ID"]] = "需要校准"
+                calibration_events.append({
+                    "事件类型": "设备状态变更", "设备ID": dev["设备ID"], "运行状态": "需要校准"
+                })
+        if calibration_events:
+            self.virtual_warehouse.apply_events(calibration_events)
         
         self.progress_logger.update_progress(5, "虚拟仓储模型状态校准完成")
-        time.sleep(3)
+        self.progress_logger.pace(3)
+        
+        return over_threshold_count
+
+
+class StreamingStateCorrector:
+    """流式状态校正器：逐条或按微批消费反馈，按设备维护偏差 EWMA 与超限计数，仅在设备越过阈值时触发校准"""
+    def __init__(self, virtual_warehouse, progress_logger, alpha=STATE_DEVIATION_EWMA_ALPHA,
+                 threshold=STATE_DEVIATION_THRESHOLD, initial_capacity=64):
+        self.virtual_warehouse = virtual_warehouse
+        self.progress_logger = progress_logger
+        self.alpha = alpha
+        self.threshold = threshold
         
-        return over_threshold_count
\ No newline at end of file
+        # 设备ID→数组下标，各项统计以定长数组存储，容量不足时倍增
+        self.device_codes = {}
+        self.device_ids = []
+        self.event_count = np.zeros(initial_capacity, dtype=np.int64)
+        self.over_threshold_count = np.zeros(initial_capacity, dtype=np.int32)
+        self.deviation_ewma = np.zeros(initial_capacity, dtype=np.float64)
+        self.last_deviation = np.zeros(initial_capacity, dtype=np.float64)
+        self.calibration_flag = np.zeros(initial_capacity, dtype=bool)
+        self.calibration_triggered = 0
+    
+    def _device_code(self, device):
+        code = self.device_codes.get(device)
+        if code is None:
+            code = len(self.device_ids)
+            if code >= len(self.event_count):
+                self._grow()
+            self.device_codes[device] = code
+            self.device_ids.append(device)
+        return code
+    
+    def _grow(self):
+        capacity = len(self.event_count) * 2
+        for name in ["event_count", "over_threshold_count", "deviation_ewma", "last_deviation", "calibration_flag"]:
+            array = getattr(self, name)
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+    
+    def consume(self, record):
+        """消费一条反馈记录（可直接作为 AsyncCommandExecutor 的 on_feedback 回调），返回综合偏差值"""
+        device = record["设备ID"]
+        code = self._device_code(device)
+        load = record.get("运行负荷")
+        if load is not None and not pd.isna(load):
+            self.virtual_warehouse.apply_events([{"事件类型": "设备负荷上报", "设备ID": device, "运行负荷": float(load)}])
+        predicted_position = self.virtual_warehouse.state_store.device_state(device, "未知")
+        _, _, deviation = compute_deviation(record["当前位置"], predicted_position, record["任务完成进度"])
+        
+        # 更新设备滚动统计
+        count = self.event_count[code] + 1
+        self.event_count[code] = count
+        ewma = deviation if count == 1 else self.alpha * deviation + (1 - self.alpha) * self.deviation_ewma[code]
+        self.deviation_ewma[code] = ewma
+        self.last_deviation[code] = deviation
+        if deviation > self.threshold:
+            self.over_threshold_count[code] += 1
+        
+        # 仅在越过阈值时触发校准，回落至阈值的 STATE_DEVIATION_CLEAR_RATIO 以下后解除标记
+        if self.calibration_flag[code]:
+            if ewma < self.threshold * STATE_DEVIATION_CLEAR_RATIO:
+                self.calibration_flag[code] = False
+        elif ewma > self.threshold:
+            self.calibration_flag[code] = True
+            self.calibration_triggered += 1
+            self.virtual_warehouse.apply_events([
+                {"事件类型": "设备状态变更", "设备ID": device, "运行状态": "需要校准"}
+            ])
+            self.progress_logger.logger.warning(f"设备{device}状态偏差EWMA {ewma:.2f} 超过阈值，触发校准")
+        return deviation
+    
+    def consume_batch(self, feedback_data):
+        """按微批消费反馈数据，返回本批新触发校准的设备数"""
+        triggered_before = self.calibration_triggered
+        # 整批负荷上报合并为一次事件注入，逐条消费时不再重复上报
+        load_events = load_report_events(feedback_data)
+        if load_events:
+            self.virtual_warehouse.apply_events(load_events)
+        for record in feedback_data[["设备ID", "当前位置", "任务完成进度"]].to_dict("records"):
+            self.consume(record)
+        return self.calibration_triggered - triggered_before
+    
+    def snapshot(self):
+        """当前各设备偏差统计"""
+        size = len(self.device_ids)
+        return pd.DataFrame({
+            "设备ID": self.device_ids,
+            "反馈次数": self.event_count[:size],
+            "偏差EWMA": self.deviation_ewma[:size],
+            "最近偏差值": self.last_deviation[:size],
+            "超限次数": self.over_threshold_count[:size],
+            "需要校准": self.calibration_flag[:size]
+        })
@@ -0,0 +1,146 @@
+import time
+from collections import deque
+import numpy as np
+from config import STATE_FEATURE_WINDOW_SECONDS, ORDER_BACKLOG_SCALE, DEFAULT_EQUIPMENT_LOAD
+from state_store import _resized
+
+RUNNING_STATUS = "正常运行"
+
+class StateFeatureAggregator:
+    """调度状态特征的增量聚合：由状态注入路径维护各设备类型的负荷和/计数、滑动时间窗口内的负荷上报、
+    订单积压计数与路径通行效率均值，特征读取为常数时间，与设备规模无关"""
+    def __init__(self, state_store, window_seconds=STATE_FEATURE_WINDOW_SECONDS):
+        self.state_store = state_store
+        self.window_seconds = window_seconds
+        self.running_code = state_store.state_values.encode(RUNNING_STATUS)
+
+        # 按设备类型编码：正常运行设备的最新运行负荷之和与设备数
+        self.load_sum = np.zeros(0, dtype=np.float64)
+        self.load_count = np.zeros(0, dtype=np.int64)
+        # 各设备当前计入的负荷（未计入为 NaN），状态或负荷变化时先扣除旧值再计入新值
+        self.device_contribution = np.zeros(0, dtype=np.float64)
+
+        # 滑动时间窗口：（时间, 设备类型编码, 负荷）按时间顺序入队，过期样本出队时从窗口和中扣除
+        self.window = deque()
+        self.window_sum = np.zeros(0, dtype=np.float64)
+        self.window_count = np.zeros(0, dtype=np.int64)
+
+        self.efficiency_sum = 0.0
+        self.efficiency_count = 0
+
+    def _sync(self):
+        types = len(self.state_store.device_types)
+        self.load_sum = _resized(self.load_sum, types, 0.0)
+        self.load_count = _resized(self.load_count, types, 0)
+        self.window_sum = _resized(self.window_sum, types, 0.0)
+        self.window_count = _resized(self.window_count, types, 0)
+        self.device_contribution = _resized(self.device_contribution, len(self.state_store.devices), np.nan)
+
+    # ---- 设备负荷 ----
+    def load_devices(self, now=None):
+        """设备数据整体载入后重建负荷聚合，载入时的运行负荷同时作为一批窗口样本"""
+        store = self.state_store
+        self._sync()
+        self.window.clear()
+        self.window_sum[:] = 0.0
+        self.window_count[:] = 0
+        self.device_contribution[:] = np.nan
+
+        count = len(store.devices)
+        counted = (store.device_status[:count] == self.running_code) & ~np.isnan(store.device_load[:count])
+        counted &= store.device_type[:count] >= 0
+        codes = np.flatnonzero(counted)
+        types = store.device_type[codes]
+        loads = store.device_load[codes].astype(np.float64)
+        self.device_contribution[codes] = loads
+        size = len(self.load_sum)
+        self.load_sum = np.bincount(types, weights=loads, minlength=size)
+        self.load_count = np.bincount(types, minlength=size).astype(np.int64)
+
+        now = time.monotonic() if now is None else now
+        self.window_sum += self.load_sum
+        self.window_count += self.load_count
+        self.window.extend(zip([now] * len(codes), types.tolist(), loads.tolist()))
+
+    def device_changed(self, device, now=None):
+        """单台设备的运行状态或负荷变化后调用：更新该设备对类型聚合的贡献，运行中的设备同时记入窗口样本"""
+        store = self.state_store
+        code = store.devices.get(device)
+        if code < 0:
+            return
+        self._sync()
+        device_type = store.device_type[code]
+        if device_type < 0:
+            return
+        previous = self.device_contribution[code]
+        if not np.isnan(previous):
+            self.load_sum[device_type] -= previous
+            self.load_count[device_type] -= 1
+            self.device_contribution[code] = np.nan
+
+        load = float(store.device_load[code])
+        if store.device_status[code] != self.running_code or np.isnan(load):
+            return
+        self.device_contribution[code] = load
+        self.load_sum[device_type] += load
+        self.load_count[device_type] += 1
+
+        now = time.monotonic() if now is None else now
+        self.expire(now)
+        self.window.append((now, device_type, load))
+        self.window_sum[device_type] += load
+        self.window_count[device_type] += 1
+
+    def expire(self, now=None):
+        """移出窗口外的负荷样本（均摊常数时间）"""
+        horizon = (time.monotonic() if now is None else now) - self.window_seconds
+        window = self.window
+        while window and window[0][0] < horizon:
+            _, device_type, load = window.popleft()
+            self.window_sum[device_type] -= load
+            self.window_count[device_type] -= 1
+
+    def load_by_type(self, now=None):
+        """{设备类型: 窗口内平均运行负荷}；窗口内无上报的类型取其正常运行设备的最新负荷均值"""
+        self.expire(now)
+        result = {}
+        for device_type, label in enumerate(self.state_store.device_types.labels):
+            if self.window_count[device_type]:
+                result[label] = float(self.window_sum[device_type] / self.window_count[device_type])
+            elif self.load_count[device_type]:
+                result[label] = float(self.load_sum[device_type] / self.load_count[device_type])
+        return result
+
+    def average_load(self, now=None):
+        """设备平均负荷（0~1）：优先取窗口内上报均值，窗口为空时取最新负荷均值，均无数据时取默认值"""
+        self.expire(now)
+        window_count = self.window_count.sum()
+        if window_count:
+            return float(self.window_sum.sum() / window_count / 100)
+        load_count = self.load_count.sum()
+        if load_count:
+            return float(self.load_sum.sum() / load_count / 100)
+        return DEFAULT_EQUIPMENT_LOAD
+
+    # ---- 路径通行效率 ----
+    def set_topology(self, topology_data):
+        efficiency = topology_data["通行效率"].to_numpy(dtype=np.float64) if "通行效率" in topology_data else []
+        self.efficiency_sum = float(np.sum(efficiency))
+        self.efficiency_count = len(efficiency)
+
+    def average_efficiency(self):
+        return self.efficiency_sum / self.efficiency_count / 100 if self.efficiency_count else 0.0
+
+    # ---- 订单积压 ----
+    def backlog_by_type(self):
+        """{订单类型: 积压订单数}"""
+        counts = self.state_store.order_type_counts
+        return {label: int(count) for label, count in zip(self.state_store.order_types.labels, counts) if count}
+
+    def features(self, now=None):
+        """调度规则使用的状态特征向量 {特征名: 值}"""
+        return {
+            "订单积压程度": self.state_store.order_count / ORDER_BACKLOG_SCALE,
+            "设备平均负荷": self.average_load(now),
+            "路径平均通行效率": self.average_efficiency()
+        }
@@ -0,0 +1,449 @@
+from collections.abc import Mapping, Sequence
+import numpy as np
+import pandas as pd
+
+# 订单列：编码列（列名→编码表属性名）与时间列（int64 纳秒）；其余列按原值保存为对象数组
+ORDER_CODE_COLUMNS = {"物料名称": "materials", "目标位置": "partitions", "订单类型": "order_types"}
+ORDER_TIME_COLUMNS = ["要求完成时间", "创建时间"]
+NAT = pd.NaT.value
+INITIAL_ORDER_CAPACITY = 1024
+
+class CodeTable:
+    """字符串标签驻留表：标签 ↔ 连续整数编码，编码一经分配不再变化"""
+    def __init__(self, labels=()):
+        self.labels = []
+        self.codes = {}
+        self._label_array = None
+        if len(labels):
+            self.encode_many(labels)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, label):
+        return label in self.codes
+
+    def encode(self, label):
+        """标签→编码，新标签分配下一个编码"""
+        code = self.codes.get(label)
+        if code is None:
+            code = self.codes[label] = len(self.labels)
+            self.labels.append(label)
+            self._label_array = None
+        return code
+
+    def encode_many(self, labels):
+        """批量编码：只对去重后的标签查表，缺失值编码为 -1"""
+        local_codes, uniques = pd.factorize(np.asarray(labels, dtype=object))
+        mapping = np.fromiter((self.encode(label) for label in uniques), dtype=np.int32, count=len(uniques))
+        codes = mapping[local_codes] if len(mapping) else np.full(len(local_codes), -1, dtype=np.int32)
+        codes[local_codes < 0] = -1
+        return codes
+
+    def get(self, label, default=-1):
+        return self.codes.get(label, default)
+
+    def decode(self, codes):
+        """编码数组→标签数组（编码须有效）"""
+        if self._label_array is None:
+            self._label_array = np.array(self.labels, dtype=object)
+        return self._label_array[codes]
+
+
+def _resized(array, size, fill):
+    """按新长度（首维）扩展数组，新增部分填充 fill"""
+    if len(array) >= size:
+        return array
+    grown = np.full((size,) + array.shape[1:], fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class WarehouseStateStore:
+    """列式状态存储：分区/设备/物料/状态值驻留为整数编码，库存为 分区×物料 矩阵，设备与订单属性为定长类型数组"""
+    def __init__(self):
+        self.partitions = CodeTable()
+        self.devices = CodeTable()
+        self.materials = CodeTable()
+        self.device_types = CodeTable()
+        self.order_types = CodeTable()
+        # 分区状态与设备运行状态共用的状态值词表
+        self.state_values = CodeTable()
+
+        # 状态编码为 -1 表示该分区/设备尚无状态记录
+        self.partition_status = np.zeros(0, dtype=np.int16)
+        self.device_type = np.zeros(0, dtype=np.int16)
+        self.device_status = np.zeros(0, dtype=np.int16)
+        self.device_location = np.zeros(0, dtype=np.int32)
+        self.device_load = np.zeros(0, dtype=np.float32)
+        self.inventory = np.zeros((0, 0), dtype=np.int64)
+        self.inventory_loaded = np.zeros(0, dtype=bool)
+
+        self.order_count = 0
+        self.order_columns = {}
+        # 按订单类型编码的在册订单数（积压计数），随订单载入/追加/移除增量维护
+        self.order_type_counts = np.zeros(0, dtype=np.int64)
+        # 订单ID→行号索引，首次移除订单时才构建（批量仿真不移除订单，无需为每个订单保存索引项）
+        self.order_index = None
+
+    # ---- 分区 ----
+    def _sync_partitions(self):
+        size = len(self.partitions)
+        self.partition_status = _resized(self.partition_status, size, -1)
+        self.inventory_loaded = _resized(self.inventory_loaded, size, False)
+        if self.inventory.shape[0] < size:
+            self.inventory = _resized(self.inventory, size, 0)
+
+    def load_partitions(self, partitions, status="正常"):
+        """登记分区并设置统一的初始状态"""
+        codes = self.partitions.encode_many(partitions)
+        self._sync_partitions()
+        self.partition_status[codes] = self.state_values.encode(status)
+        return codes
+
+    def set_partition_states(self, states):
+        """整体替换分区状态 {分区: 状态}"""
+        self.partition_status[:] = -1
+        for partition, status in states.items():
+            code = self.partitions.encode(partition)
+            self._sync_partitions()
+            self.partition_status[code] = self.state_values.encode(status)
+
+    def partition_state(self, partition, default=None):
+        code = self.partitions.get(partition)
+        if code < 0 or self.partition_status[code] < 0:
+            return default
+        return self.state_values.labels[self.partition_status[code]]
+
+    # ---- 设备 ----
+    def _sync_devices(self):
+        size = len(self.devices)
+        self.device_type = _resized(self.device_type, size, -1)
+        self.device_status = _resized(self.device_status, size, -1)
+        self.device_location = _resized(self.device_location, size, -1)
+        self.device_load = _resized(self.device_load, size, np.nan)
+
+    def load_devices(self, equipment_status):
+        """按设备状态数据整体替换设备属性（类型、运行状态、当前位置、运行负荷）"""
+        self.device_status[:] = -1
+        codes = self.devices.encode_many(equipment_status["设备ID"])
+        self._sync_devices()
+        self.device_type[codes] = self.device_types.encode_many(equipment_status["设备类型"])
+        self.device_status[codes] = self.state_values.encode_many(equipment_status["运行状态"])
+        self.device_location[codes] = self.partitions.encode_many(equipment_status["当前位置"])
+        self._sync_partitions()
+        if "运行负荷" in equipment_status:
+            self.device_load[codes] = equipment_status["运行负荷"].to_numpy(dtype=np.float32)
+        return codes
+
+    def set_device_status(self, device, status):
+        code = self.devices.encode(device)
+        self._sync_devices()
+        self.device_status[code] = self.state_values.encode(status)
+
+    def set_device_load(self, device, load):
+        code = self.devices.encode(device)
+        self._sync_devices()
+        self.device_load[code] = np.nan if load is None else load
+
+    def set_device_statuses(self, statuses):
+        """整体替换设备运行状态 {设备ID: 状态}"""
+        self.device_status[:] = -1
+        for device, status in statuses.items():
+            self.set_device_status(device, status)
+
+    def device_state(self, device, default=None):
+        code = self.devices.get(device)
+        if code < 0 or self.device_status[code] < 0:
+            return default
+        return self.state_values.labels[self.device_status[code]]
+
+    def devices_in_status(self, status):
+        """处于指定运行状态的设备编码"""
+        status_code = self.state_values.get(status)
+        return np.flatnonzero(self.device_status == status_code) if status_code >= 0 else np.zeros(0, dtype=np.int64)
+
+    # ---- 库存 ----
+    def _sync_materials(self):
+        size = len(self.materials)
+        if self.inventory.shape[1] < size:
+            grown = np.zeros((self.inventory.shape[0], size), dtype=self.inventory.dtype)
+            grown[:, :self.inventory.shape[1]] = self.inventory
+            self.inventory = grown
+
+    def load_inventory(self, inventory_data):
+        """写入库存宽表（逻辑分区 + 各物料数量列），覆盖对应分区×物料的数量"""
+        partition_codes = self.partitions.encode_many(inventory_data["逻辑分区"])
+        material_columns = [column for column in inventory_data.columns if column != "逻辑分区"]
+        material_codes = self.materials.encode_many(material_columns)
+        self._sync_partitions()
+        self._sync_materials()
+        if material_columns:
+            self.inventory[np.ix_(partition_codes, material_codes)] = \
+                inventory_data[material_columns].to_numpy(dtype=np.int64)
+        self.inventory_loaded[partition_codes] = True
+
+    def set_inventory_records(self, records):
+        """整体替换库存状态 {分区: {"逻辑分区": 分区, 物料: 数量, ...}}"""
+        self.inventory[:] = 0
+        self.inventory_loaded[:] = False
+        for partition, record in records.items():
+            code = self.partitions.encode(partition)
+            self._sync_partitions()
+            self.inventory_loaded[code] = True
+            for material, quantity in record.items():
+                if material != "逻辑分区":
+                    self.adjust_inventory(partition, material, quantity)
+
+    def adjust_inventory(self, partition, material, delta):
+        partition_code = self.partitions.encode(partition)
+        material_code = self.materials.encode(material)
+        self._sync_partitions()
+        self._sync_materials()
+        self.inventory[partition_code, material_code] += delta
+        self.inventory_loaded[partition_code] = True
+
+    def inventory_record(self, partition_code):
+        """单个分区的库存记录（旧结构）"""
+        record = {"逻辑分区": self.partitions.labels[partition_code]}
+        record.update(zip(self.materials.labels, self.inventory[partition_code].tolist()))
+        return record
+
+    def inventory_frame(self):
+        """当前库存宽表（逻辑分区 + 各物料数量列），只包含已有库存记录的分区"""
+        codes = np.flatnonzero(self.inventory_loaded)
+        frame = pd.DataFrame(self.inventory[np.ix_(codes, np.arange(len(self.materials)))], columns=self.materials.labels)
+        frame.insert(0, "逻辑分区", self.partitions.decode(codes) if len(codes) else np.zeros(0, dtype=object))
+        return frame
+
+    def stocked_partitions(self):
+        """物料→有库存分区列表（按分区编码顺序）"""
+        materials, partitions = np.nonzero((self.inventory > 0).T & self.inventory_loaded)
+        labels = self.partitions.decode(partitions).tolist()
+        bounds = np.searchsorted(materials, np.arange(len(self.materials) + 1))
+        return {
+            material: labels[bounds[code]:bounds[code + 1]]
+            for code, material in enumerate(self.materials.labels) if bounds[code + 1] > bounds[code]
+        }
+
+    # ---- 订单 ----
+    @staticmethod
+    def _order_fill(name):
+        if name in ORDER_CODE_COLUMNS:
+            return -1
+        return NAT if name in ORDER_TIME_COLUMNS else None
+
+    def _order_column(self, name, capacity):
+        column = self.order_columns.get(name)
+        if column is None:
+            if name in ORDER_CODE_COLUMNS:
+                dtype = np.int32
+            else:
+                dtype = np.int64 if name in ORDER_TIME_COLUMNS else object
+            column = self.order_columns[name] = np.full(capacity, self._order_fill(name), dtype=dtype)
+        return column
+
+    def _reserve_orders(self, size):
+        """按倍增策略预留订单行容量"""
+        capacity = len(self.order_columns["订单ID"]) if "订单ID" in self.order_columns else 0
+        if size <= capacity and "订单ID" in self.order_columns:
+            return
+        capacity = max(size, capacity * 2, INITIAL_ORDER_CAPACITY)
+        for name, column in self.order_columns.items():
+            self.order_columns[name] = _resized(column, capacity, self._order_fill(name))
+        self._order_column("订单ID", capacity)
+
+    def load_orders(self, order_data):
+        """整体替换订单数据：编码列转为整数编码，时间列转为 int64 纳秒"""
+        self.order_columns = {}
+        self.order_count = 0
+        self.order_index = None
+        count = len(order_data)
+        self._reserve_orders(count)
+        capacity = len(self.order_columns["订单ID"])
+        for name in order_data.columns:
+            column = self._order_column(name, capacity)
+            values = order_data[name]
+            if name in ORDER_CODE_COLUMNS:
+                column[:count] = getattr(self, ORDER_CODE_COLUMNS[name]).encode_many(values)
+            elif name in ORDER_TIME_COLUMNS:
+                column[:count] = pd.to_datetime(values).to_numpy("datetime64[ns]").view(np.int64)
+            else:
+                column[:count] = values.to_numpy(dtype=object)
+        self._sync_partitions()
+        self.order_count = count
+        types = self.order_columns["订单类型"][:count] if "订单类型" in self.order_columns else np.zeros(0, dtype=np.int32)
+        self.order_type_counts = np.bincount(types[types >= 0], minlength=len(self.order_types)).astype(np.int64)
+
+    def _order_row(self, order_id):
+        """订单ID → 行号（索引在首次按ID访问时建立）；不存在时返回 None"""
+        if self.order_index is None:
+            if "订单ID" not in self.order_columns:
+                return None
+            self.order_index = dict(zip(self.order_columns["订单ID"][:self.order_count].tolist(), range(self.order_count)))
+        return self.order_index.get(order_id)
+
+    def append_order(self, order):
+        """追加一条订单记录（字典）；订单ID已存在时原地更新该行，不产生重复行"""
+        row = self._order_row(order["订单ID"])
+        if row is not None:
+            type_code = self.order_columns["订单类型"][row] if "订单类型" in self.order_columns else -1
+            if type_code >= 0:
+                self.order_type_counts[type_code] -= 1
+        else:
+            row = self.order_count
+        self._reserve_orders(row + 1)
+        capacity = len(self.order_columns["订单ID"])
+        for name, value in order.items():
+            column = self._order_column(name, capacity)
+            if name in ORDER_CODE_COLUMNS:
+                column[row] = -1 if value is None else getattr(self, ORDER_CODE_COLUMNS[name]).encode(value)
+            elif name in ORDER_TIME_COLUMNS:
+                column[row] = pd.Timestamp(value).value
+            else:
+                column[row] = value
+        self._sync_partitions()
+        self.order_count = max(self.order_count, row + 1)
+        type_code = self.order_columns["订单类型"][row] if "订单类型" in self.order_columns else -1
+        if type_code >= 0:
+            self.order_type_counts = _resized(self.order_type_counts, len(self.order_types), 0)
+            self.order_type_counts[type_code] += 1
+        if self.order_index is not None:
+            self.order_index[order["订单ID"]] = row
+
+    def remove_order(self, order_id):
+        """移除订单：末行移入空位，保持常数时间"""
+        row = self._order_row(order_id)
+        if row is None:
+            return
+        del self.order_index[order_id]
+        last = self.order_count - 1
+        type_code = self.order_columns["订单类型"][row] if "订单类型" in self.order_columns else -1
+        if type_code >= 0:
+            self.order_type_counts[type_code] -= 1
+        for column in self.order_columns.values():
+            if row != last:
+                column[row] = column[last]
+            if column.dtype == object:
+                column[last] = None
+        if row != last:
+            self.order_index[self.order_columns["订单ID"][row]] = row
+        self.order_count = last
+
+    def order_record(self, row):
+        """单条订单记录（旧结构：编码列还原为标签，时间列还原为 Timestamp）"""
+        record = {}
+        for name, column in self.order_columns.items():
+            value = column[row]
+            if name in ORDER_CODE_COLUMNS:
+                value = getattr(self, ORDER_CODE_COLUMNS[name]).labels[value] if value >= 0 else None
+            elif name in ORDER_TIME_COLUMNS:
+                value = pd.Timestamp(value) if value != NAT else pd.NaT
+            record[name] = value
+        return record
+
+    def order_frame(self):
+        """当前订单数据（DataFrame）"""
+        count = self.order_count
+        data = {}
+        for name, column in self.order_columns.items():
+            values = column[:count]
+            if name in ORDER_CODE_COLUMNS:
+                table = getattr(self, ORDER_CODE_COLUMNS[name])
+                values = np.where(values >= 0, table.decode(np.maximum(values, 0)), None) if len(table) else \
+                    np.full(count, None, dtype=object)
+            elif name in ORDER_TIME_COLUMNS:
+                values = values.view("datetime64[ns]")
+            data[name] = values
+        return pd.DataFrame(data)
+
+    def nbytes(self):
+        """类型数组占用的字节数（不含对象数组元素本身）"""
+        arrays = [self.partition_status, self.device_type, self.device_status, self.device_location,
+                  self.device_load, self.inventory, self.inventory_loaded, *self.order_columns.values()]
+        return sum(array.nbytes for array in arrays)
+
+
+class _CodedStateView(Mapping):
+    """{标签: 状态} 只读视图，只包含已有状态记录的条目"""
+    def __init__(self, table, status, state_values):
+        self._table = table
+        self._status = status
+        self._state_values = state_values
+
+    def __getitem__(self, label):
+        code = self._table.get(label)
+        status = self._status()
+        if code < 0 or code >= len(status) or status[code] < 0:
+            raise KeyError(label)
+        return self._state_values.labels[status[code]]
+
+    def __iter__(self):
+        status = self._status()
+        labels = self._table.labels
+        return (labels[code] for code in np.flatnonzero(status >= 0).tolist())
+
+    def __len__(self):
+        return int(np.count_nonzero(self._status() >= 0))
+
+
+class _InventoryView(Mapping):
+    """{分区: 库存记录} 只读视图"""
+    def __init__(self, store):
+        self._store = store
+
+    def __getitem__(self, partition):
+        code = self._store.partitions.get(partition)
+        if code < 0 or not self._store.inventory_loaded[code]:
+            raise KeyError(partition)
+        return self._store.inventory_record(code)
+
+    def __iter__(self):
+        labels = self._store.partitions.labels
+        return (labels[code] for code in np.flatnonzero(self._store.inventory_loaded).tolist())
+
+    def __len__(self):
+        return int(np.count_nonzero(self._store.inventory_loaded))
+
+
+class _OrderListView(Sequence):
+    """订单记录列表只读视图"""
+    def __init__(self, store):
+        self._store = store
+
+    def __len__(self):
+        return self._store.order_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._store.order_record(row) for row in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._store.order_record(index)
+
+
+class StateView(Mapping):
+    """current_state 兼容视图：按旧的嵌套字典结构（分区状态/设备状态/库存状态/订单数据）只读访问列式状态，
+    其他状态分区保存在 extra 字典中"""
+    def __init__(self, store, extra):
+        self._extra = extra
+        self._sections = {
+            "分区状态": _CodedStateView(store.partitions, lambda: store.partition_status, store.state_values),
+            "设备状态": _CodedStateView(store.devices, lambda: store.device_status, store.state_values),
+            "库存状态": _InventoryView(store),
+            "订单数据": _OrderListView(store)
+        }
+
+    def __getitem__(self, section):
+        if section in self._sections:
+            return self._sections[section]
+        return self._extra[section]
+
+    def __iter__(self):
+        yield from self._sections
+        yield from self._extra
+
+    def __len__(self):
+        return len(self._sections) + len(self._extra)
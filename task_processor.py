@@ -1,46 +1,78 @@
 import pandas as pd
-import time
+import numpy as np
+from stage_profiler import profiled_stage
+
+ATOMIC_OPERATIONS = [
+    "物料定位", "路径规划", "设备调度", "物料搬运", "库存更新", "任务确认"
+]
 
 class TaskProcessor:
     def __init__(self, virtual_warehouse, progress_logger):
         self.virtual_warehouse = virtual_warehouse
         self.task_decomposition_graph = []
-        self.progress_logger = progress_logger  
-    
+        self._material_index = None
+        self._material_index_version = None
+        self.progress_logger = progress_logger
+
+    @profiled_stage("process_task_request")
     def process_task_request(self, order_data):
         """处理任务请求，生成任务分解图谱"""
         self.progress_logger.update_progress(6, "开始处理任务请求，进行多维度任务解析")
-        time.sleep(3)
-        
-        decomposition_results = []
-        atomic_operations = [
-            "物料定位", "路径规划", "设备调度", "物料搬运", "库存更新", "任务确认"
-        ]
-        
-        for _, order in order_data.iterrows():
-            # 识别涉及的逻辑分区
-            related_partitions = [
-                self.virtual_warehouse.current_state["库存状态"][p].get("逻辑分区")
-                for p in self.virtual_warehouse.current_state["库存状态"]
-                if self.virtual_warehouse.current_state["库存状态"][p].get(order["物料名称"], 0) > 0
-            ] + [order["目标位置"]]
-            related_partitions = list(set(related_partitions))
-            
-            # 分解为原子操作
-            for i, op in enumerate(atomic_operations):
-                decomposition_results.append({
-                    "任务ID": order["订单ID"],
-                    "物料名称": order["物料名称"],
-                    "目标位置": order["目标位置"],
-                    "订单类型": order["订单类型"],
-                    "原子操作": op,
-                    "操作序号": i + 1,
-                    "涉及分区": ",".join(related_partitions),
-                    "操作依赖": atomic_operations[i-1] if i > 0 else "无"
-                })
-        
-        self.task_decomposition_graph = pd.DataFrame(decomposition_results)
+        self.progress_logger.pace(3)
+
+        # 识别涉及的逻辑分区（按 物料×目标位置 组合去重后计算）
+        material_index = self._build_material_index()
+        related_partitions = self._resolve_related_partitions(order_data, material_index)
+
+        # 分解为原子操作（订单 × 原子操作 广播展开）
+        self.task_decomposition_graph = self._expand_atomic_operations(order_data, related_partitions)
         self.progress_logger.update_progress(7, "任务分解完成，生成任务分解图谱")
-        time.sleep(3)
-        
-        return self.task_decomposition_graph
\ No newline at end of file
+        self.progress_logger.pace(3)
+
+        return self.task_decomposition_graph
+
+    def _build_material_index(self):
+        """构建 物料→有库存分区 索引，库存状态版本未变化时直接复用"""
+        version = self.virtual_warehouse.state_versions["库存状态"]
+        if self._material_index is not None and self._material_index_version == version:
+            return self._material_index
+
+        material_index = self.virtual_warehouse.state_store.stocked_partitions()
+
+        self._material_index = material_index
+        self._material_index_version = version
+        return material_index
+
+    def _resolve_related_partitions(self, order_data, material_index):
+        """计算每个订单的涉及分区字符串"""
+        pairs = order_data[["物料名称", "目标位置"]]
+        codes, uniques = pd.factorize(pd.MultiIndex.from_frame(pairs))
+
+        pair_partitions = []
+        for material, target in uniques:
+            partitions = list(material_index.get(material, []))
+            if target not in partitions:
+                partitions.append(target)
+            pair_partitions.append(",".join(partitions))
+
+        return np.asarray(pair_partitions, dtype=object)[codes]
+
+    def _expand_atomic_operations(self, order_data, related_partitions):
+        """将订单按原子操作数量展开为任务分解图谱"""
+        op_count = len(ATOMIC_OPERATIONS)
+        order_count = len(order_data)
+        dependencies = ["无"] + ATOMIC_OPERATIONS[:-1]
+
+        def repeat(values):
+            return np.repeat(np.asarray(values, dtype=object), op_count)
+
+        return pd.DataFrame({
+            "任务ID": repeat(order_data["订单ID"]),
+            "物料名称": repeat(order_data["物料名称"]),
+            "目标位置": repeat(order_data["目标位置"]),
+            "订单类型": repeat(order_data["订单类型"]),
+            "原子操作": np.tile(np.asarray(ATOMIC_OPERATIONS, dtype=object), order_count),
+            "操作序号": np.tile(np.arange(1, op_count + 1, dtype=np.int64), order_count),
+            "涉及分区": repeat(related_partitions),
+            "操作依赖": np.tile(np.asarray(dependencies, dtype=object), order_count)
+        })
@@ -1,29 +1,51 @@
 import pandas as pd
 from config import LOGICAL_PARTITIONS, PARTITION_TOPOLOGY, EQUIPMENTS
-import time
+from routing_engine import RoutingEngine
+from state_store import WarehouseStateStore, StateView
+from state_features import StateFeatureAggregator
+from stage_profiler import profiled_stage
+
+# 增量事件类型→所属状态分区
+EVENT_SECTIONS = {
+    "库存变更": "库存状态",
+    "设备状态变更": "设备状态",
+    "设备负荷上报": "设备状态",
+    "新增订单": "订单数据",
+    "订单已承诺": "订单数据",
+    "订单完成": "订单数据"
+}
 
 class VirtualWarehouse:
     def __init__(self, progress_logger):
         self.logical_partitions = []
         self.partition_mapping = pd.DataFrame()  
         self.topology_data = pd.DataFrame()
-        self.current_state = {}  
+        self.routing_engine = RoutingEngine()
+        # 列式状态存储；current_state 为兼容旧嵌套字典结构的只读视图，写入经由 update_state/apply_events
+        self.state_store = WarehouseStateStore()
+        self._extra_state = {}
+        self.current_state = StateView(self.state_store, self._extra_state)
+        # 调度状态特征的增量聚合，随设备/拓扑/订单写入同步更新
+        self.feature_aggregator = StateFeatureAggregator(self.state_store)
+        self.state_versions = {section: 0 for section in ["分区状态", "设备状态", "库存状态", "订单数据", "拓扑关系"]}
+        self.subscribers = []
         self.progress_logger = progress_logger  
     
+    @profiled_stage("build_model")
     def build_model(self, topology_data, equipment_status):
         """构建虚拟仓储模型"""
         self.progress_logger.update_progress(5, "开始构建虚拟仓储模型")
-        time.sleep(3)  
+        self.progress_logger.pace(3)
         
         # 初始化逻辑分区
         self.logical_partitions = LOGICAL_PARTITIONS
         self.progress_logger.update_progress(3, "逻辑分区初始化完成")
-        time.sleep(2)
+        self.progress_logger.pace(2)
         
         # 构建拓扑关系
-        self.topology_data = topology_data
+        self.update_topology(topology_data)
         self.progress_logger.update_progress(4, "分区拓扑关系构建完成")
-        time.sleep(2)
+        self.progress_logger.pace(2)
         
         # 建立设备-分区映射关系
         mapping_data = []
@@ -36,42 +58,100 @@ class VirtualWarehouse:
             })
         self.partition_mapping = pd.DataFrame(mapping_data)
         self.progress_logger.update_progress(3, "设备-分区映射表建立完成")
-        time.sleep(2)
+        self.progress_logger.pace(2)
         
         # 初始化模型状态
-        self.current_state = {
-            "分区状态": {p: "正常" for p in self.logical_partitions},
-            "设备状态": equipment_status.set_index("设备ID")["运行状态"].to_dict(),
-            "库存状态": {}  
-        }
+        self.state_store.load_partitions(self.logical_partitions, "正常")
+        self.state_store.load_devices(equipment_status)
+        self.feature_aggregator.load_devices()
+        self._notify({"分区状态": None, "设备状态": None, "库存状态": None})
         self.progress_logger.update_progress(5, "虚拟仓储模型构建完成")
-        time.sleep(3)
+        self.progress_logger.pace(3)
     
+    @profiled_stage("inject_real_time_data")
     def inject_real_time_data(self, inventory_data, order_data):
         """注入实时运行数据流"""
         self.progress_logger.update_progress(6, "开始注入实时运行数据流")
-        time.sleep(3)
+        self.progress_logger.pace(3)
         
         # 更新库存状态
-        for _, inv in inventory_data.iterrows():
-            partition = inv["逻辑分区"]
-            self.current_state["库存状态"][partition] = inv.to_dict()
+        self.state_store.load_inventory(inventory_data)
         self.progress_logger.update_progress(4, "库存数据同步完成")
-        time.sleep(2)
+        self.progress_logger.pace(2)
         
         # 更新订单数据
-        self.current_state["订单数据"] = order_data.to_dict("records")
+        self.state_store.load_orders(order_data)
         self.progress_logger.update_progress(4, "订单数据同步完成")
-        time.sleep(2)
+        self.progress_logger.pace(2)
         
         # 触发状态刷新
+        self._notify({"库存状态": None, "订单数据": None})
         self.progress_logger.update_progress(6, "实时数据注入完成，仓储动态孪生体激活")
-        time.sleep(3)
+        self.progress_logger.pace(3)
     
     def get_partition_state(self, partition):
         """获取分区状态"""
-        return self.current_state["分区状态"].get(partition, "未知")
+        return self.state_store.partition_state(partition, "未知")
+    
+    def update_topology(self, topology_data):
+        """更新分区拓扑关系，并重建路由下一跳表"""
+        self.topology_data = topology_data
+        self.routing_engine.rebuild(topology_data)
+        self.feature_aggregator.set_topology(topology_data)
+        self._notify({"拓扑关系": None})
     
     def update_state(self, state_updates):
-        """更新模型状态"""
-        self.current_state.update(state_updates)
\ No newline at end of file
+        """更新模型状态：按状态分区整体替换"""
+        for section, value in state_updates.items():
+            if section == "分区状态":
+                self.state_store.set_partition_states(value)
+            elif section == "设备状态":
+                self.state_store.set_device_statuses(value)
+                self.feature_aggregator.load_devices()
+            elif section == "库存状态":
+                self.state_store.set_inventory_records(value)
+            elif section == "订单数据":
+                self.state_store.load_orders(pd.DataFrame(list(value)))
+            else:
+                self._extra_state[section] = value
+        self._notify({section: None for section in state_updates})
+    
+    def subscribe(self, callback, sections=None):
+        """订阅状态变更：callback(section, version, events)，events 为 None 表示整段刷新"""
+        self.subscribers.append((callback, set(sections) if sections else None))
+    
+    def apply_events(self, events):
+        """增量注入事件（库存变更/设备状态变更/设备负荷上报/新增订单/订单已承诺/订单完成），按状态分区递增版本号并通知订阅者"""
+        changed = {}
+        for event in events:
+            event_type = event["事件类型"]
+            section = EVENT_SECTIONS.get(event_type)
+            if section is None:
+                raise ValueError(f"未知的事件类型：{event_type}")
+            
+            if event_type == "库存变更":
+                self.state_store.adjust_inventory(event["逻辑分区"], event["物料名称"], event["数量变化"])
+            elif event_type == "设备状态变更":
+                self.state_store.set_device_status(event["设备ID"], event["运行状态"])
+                self.feature_aggregator.device_changed(event["设备ID"])
+            elif event_type == "设备负荷上报":
+                self.state_store.set_device_load(event["设备ID"], event["运行负荷"])
+                self.feature_aggregator.device_changed(event["设备ID"])
+            elif event_type == "新增订单":
+                self.state_store.append_order(event["订单"])
+            else:
+                # 订单已承诺（已排入执行计划）与订单完成都使订单离开待规划的订单数据；已被承诺移出的订单再报完成时不做变更
+                self.state_store.remove_order(event["订单ID"])
+            
+            changed.setdefault(section, []).append(event)
+        
+        self._notify(changed)
+        return {section: self.state_versions[section] for section in changed}
+    
+    def _notify(self, changed):
+        """递增变更分区的版本号并通知订阅者"""
+        for section, events in changed.items():
+            self.state_versions[section] = self.state_versions.get(section, 0) + 1
+            for callback, sections in self.subscribers:
+                if sections is None or section in sections:
+                    callback(section, self.state_versions[section], events)
\ No newline at end of file
@@ -0,0 +1,205 @@
+import numpy as np
+import pandas as pd
+from config import (EQUIPMENTS, WORKLOAD_CHUNK_SIZE, WORKLOAD_ARRIVAL_RATE, WORKLOAD_WAVE_INTERVAL_SECONDS,
+                    WORKLOAD_WAVE_DURATION_SECONDS, WORKLOAD_WAVE_BURST_FACTOR)
+
+ORDER_TYPES = np.array(["紧急订单", "普通订单", "超时订单"], dtype=object)
+ORDER_TYPE_WEIGHTS = [0.2, 0.6, 0.2]
+DEVICE_STATUSES = np.array(["正常运行", "忙碌", "轻微故障"], dtype=object)
+DEVICE_STATUS_WEIGHTS = [0.6, 0.3, 0.1]
+ARRIVAL_PROCESSES = ["poisson", "bursty"]
+DEFAULT_START_TIME = "2025-01-01 08:00:00"
+# 负载版本：生成逻辑变化（同一种子得到的数据不同）时递增，基准测试据此跳过旧版本数据生成的基线
+WORKLOAD_VERSION = 2
+
+def _labels(prefix, numbers):
+    """向量化生成 前缀+编号 字符串标签"""
+    return np.char.add(prefix, np.asarray(numbers).astype(str)).astype(object)
+
+class WorkloadGenerator:
+    """可扩展的合成负载生成器：基于 numpy.random.Generator 全向量化生成，拓扑/设备/库存/订单各自使用独立的随机流，同一种子完全可复现"""
+    def __init__(self, seed=2025, start_time=DEFAULT_START_TIME):
+        self.seed = seed
+        # 固定起始时间而非 datetime.now()，保证时间列同样可复现
+        self.start_time = np.datetime64(pd.Timestamp(start_time), "ms")
+        topology_seq, device_seq, inventory_seq, order_seq = np.random.SeedSequence(seed).spawn(4)
+        self._seeds = {"拓扑": topology_seq, "设备": device_seq, "库存": inventory_seq, "订单": order_seq}
+
+    def _rng(self, stream, *key):
+        """按随机流名称（及可选的块编号）派生独立的 Generator，调用顺序不影响结果"""
+        seed_seq = self._seeds[stream]
+        return np.random.default_rng([*seed_seq.generate_state(4), *key])
+
+    def grid_topology(self, rows, cols):
+        """rows × cols 网格拓扑（四邻接双向通道），返回（分区数组, 拓扑关系数据）"""
+        index = np.arange(rows * cols).reshape(rows, cols)
+        partitions = np.char.add(
+            np.char.add("R", np.char.zfill((index // cols).astype(str), 3)),
+            np.char.add("C", np.char.zfill((index % cols).astype(str), 3))
+        ).ravel().astype(object)
+        horizontal = np.column_stack([index[:, :-1].ravel(), index[:, 1:].ravel()])
+        vertical = np.column_stack([index[:-1, :].ravel(), index[1:, :].ravel()])
+        return partitions, self._edges_to_topology(partitions, np.vstack([horizontal, vertical]))
+
+    def aisle_topology(self, aisles, bays):
+        """巷道式拓扑：每条巷道为 bays 个货位分区组成的链，相邻巷道在首尾两端由横向通道连接"""
+        index = np.arange(aisles * bays).reshape(aisles, bays)
+        partitions = np.char.add(
+            np.char.add("A", np.char.zfill((index // bays).astype(str), 3)),
+            np.char.add("B", np.char.zfill((index % bays).astype(str), 3))
+        ).ravel().astype(object)
+        along_aisle = np.column_stack([index[:, :-1].ravel(), index[:, 1:].ravel()])
+        cross_front = np.column_stack([index[:-1, 0], index[1:, 0]])
+        cross_rear = np.column_stack([index[:-1, -1], index[1:, -1]]) if bays > 1 else np.empty((0, 2), dtype=int)
+        return partitions, self._edges_to_topology(partitions, np.vstack([along_aisle, cross_front, cross_rear]))
+
+    def topology_from_adjacency(self, adjacency):
+        """由 {源分区: [目标分区, ...]} 邻接表生成拓扑关系数据（如 config.PARTITION_TOPOLOGY）"""
+        partitions = np.array(list(dict.fromkeys(
+            list(adjacency) + [target for targets in adjacency.values() for target in targets]
+        )), dtype=object)
+        codes = {partition: code for code, partition in enumerate(partitions)}
+        edges = np.array([(codes[source], codes[target]) for source, targets in adjacency.items() for target in targets],
+                         dtype=np.int64).reshape(-1, 2)
+        return partitions, self._edges_to_topology(partitions, edges, bidirectional=False)
+
+    def _edges_to_topology(self, partitions, edges, bidirectional=True):
+        if bidirectional:
+            edges = np.vstack([edges, edges[:, ::-1]])
+        rng = self._rng("拓扑")
+        return pd.DataFrame({
+            "源分区": partitions[edges[:, 0]],
+            "目标分区": partitions[edges[:, 1]],
+            "路径长度": rng.integers(10, 50, len(edges)),
+            "通行效率": rng.integers(70, 98, len(edges))
+        })
+
+    def materials(self, sku_count):
+        """SKU 名称数组"""
+        return _labels("SKU", np.arange(1, sku_count + 1)) if sku_count else np.empty(0, dtype=object)
+
+    def equipment_status(self, partitions, devices_per_type=None):
+        """设备状态数据：devices_per_type 为每类设备数（整数或 {设备类型: 数量}），默认沿用 config.EQUIPMENTS 的数量"""
+        if devices_per_type is None:
+            counts = {eq_type: len(eq_names) for eq_type, eq_names in EQUIPMENTS.items()}
+        elif isinstance(devices_per_type, dict):
+            counts = devices_per_type
+        else:
+            counts = {eq_type: devices_per_type for eq_type in EQUIPMENTS}
+        # 设备编号沿用 config.EQUIPMENTS 的前缀（如 AGV1、堆垛机1）
+        prefixes = {eq_type: eq_names[0].rstrip("0123456789") for eq_type, eq_names in EQUIPMENTS.items()}
+        type_names, sizes = list(counts), list(counts.values())
+        eq_types = np.repeat(np.array(type_names, dtype=object), sizes)
+        numbers = np.concatenate([np.arange(1, size + 1) for size in sizes])
+        eq_ids = np.char.add(
+            np.repeat(np.array([prefixes.get(eq_type, eq_type) for eq_type in type_names]), sizes),
+            numbers.astype(str)
+        ).astype(object)
+
+        rng = self._rng("设备")
+        device_count = len(eq_ids)
+        return pd.DataFrame({
+            "设备类型": eq_types,
+            "设备ID": eq_ids,
+            "运行状态": rng.choice(DEVICE_STATUSES, device_count, p=DEVICE_STATUS_WEIGHTS),
+            "当前位置": rng.choice(np.asarray(partitions, dtype=object), device_count),
+            "运行负荷": rng.integers(30, 95, device_count),
+            "累计运行时间": rng.integers(100, 5000, device_count),
+            "最后维护时间": self.start_time - rng.integers(1, 30, device_count).astype("timedelta64[D]")
+        })
+
+    def inventory(self, partitions, materials, stock_ratio=1.0, low=50, high=500):
+        """库存数据（分区 × 物料宽表）：每个分区以 stock_ratio 的概率存放每种物料，未存放的数量为 0"""
+        rng = self._rng("库存")
+        shape = (len(partitions), len(materials))
+        quantities = rng.integers(low, high, shape)
+        if stock_ratio < 1.0:
+            quantities[rng.random(shape) >= stock_ratio] = 0
+        inventory = pd.DataFrame(quantities, columns=list(materials))
+        inventory.insert(0, "逻辑分区", np.asarray(partitions, dtype=object))
+        return inventory
+
+    def iter_orders(self, total, target_partitions, materials, chunk_size=WORKLOAD_CHUNK_SIZE,
+                    arrival="poisson", rate=WORKLOAD_ARRIVAL_RATE, sku_skew=0.0,
+                    wave_interval=WORKLOAD_WAVE_INTERVAL_SECONDS, wave_duration=WORKLOAD_WAVE_DURATION_SECONDS,
+                    burst_factor=WORKLOAD_WAVE_BURST_FACTOR):
+        """分块生成订单：每块不超过 chunk_size 行，块之间到达时间连续，同一 seed 与 chunk_size 下结果可复现
+
+        arrival 为 "poisson"（到达率 rate 单/秒的泊松过程）或 "bursty"（每 wave_interval 秒出现一个持续
+        wave_duration 秒、到达率为 rate × burst_factor 的波次）；sku_skew > 0 时物料热度服从 Zipf 分布。
+        """
+        if arrival not in ARRIVAL_PROCESSES:
+            raise ValueError(f"未知的到达过程：{arrival}，可选值：{ARRIVAL_PROCESSES}")
+        target_partitions = np.asarray(target_partitions, dtype=object)
+        materials = np.asarray(materials, dtype=object)
+        material_weights = None
+        if sku_skew > 0:
+            material_weights = 1.0 / np.arange(1, len(materials) + 1) ** sku_skew
+            material_weights /= material_weights.sum()
+        if arrival == "bursty":
+            high_rate, low_rate = rate * burst_factor, rate
+        else:
+            high_rate = low_rate = rate
+            wave_interval, wave_duration = 1.0, 0.0
+
+        # 累计强度（时间变换后的单位速率泊松过程），跨块延续
+        cumulative_intensity = 0.0
+        for chunk_index, start in enumerate(range(0, total, chunk_size)):
+            count = min(chunk_size, total - start)
+            rng = self._rng("订单", chunk_index)
+            intensity = cumulative_intensity + np.cumsum(rng.exponential(1.0, count))
+            cumulative_intensity = float(intensity[-1])
+            seconds = self._invert_intensity(intensity, high_rate, low_rate, wave_interval, wave_duration)
+            created = self.start_time + (seconds * 1000).astype("timedelta64[ms]")
+
+            yield pd.DataFrame({
+                "订单ID": _labels("ORD", np.arange(2025001 + start, 2025001 + start + count)),
+                "物料名称": rng.choice(materials, count, p=material_weights),
+                "目标位置": rng.choice(target_partitions, count),
+                "订单类型": rng.choice(ORDER_TYPES, count, p=ORDER_TYPE_WEIGHTS),
+                "要求完成时间": created + rng.integers(10, 60, count).astype("timedelta64[m]"),
+                "创建时间": created
+            })
+
+    @staticmethod
+    def _invert_intensity(intensity, high_rate, low_rate, wave_interval, wave_duration):
+        """分段常数到达率的累计强度反函数：每个周期前 wave_duration 秒为 high_rate，其余为 low_rate"""
+        high_part = high_rate * wave_duration
+        period_intensity = high_part + low_rate * (wave_interval - wave_duration)
+        period = np.floor(intensity / period_intensity)
+        remainder = intensity - period * period_intensity
+        in_wave = remainder < high_part
+        offset = np.where(in_wave, remainder / high_rate, wave_duration + (remainder - high_part) / low_rate)
+        return period * wave_interval + offset
+
+    def orders(self, count, target_partitions, materials, **options):
+        """一次生成全部订单（内部仍按块生成后拼接）"""
+        chunks = list(self.iter_orders(count, target_partitions, materials, **options))
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="合成负载生成：分块写出订单 CSV")
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--grid", type=int, nargs=2, default=[50, 50], metavar=("ROWS", "COLS"))
+    parser.add_argument("--skus", type=int, default=1000)
+    parser.add_argument("--arrival", choices=ARRIVAL_PROCESSES, default="poisson")
+    parser.add_argument("--chunk-size", type=int, default=WORKLOAD_CHUNK_SIZE)
+    parser.add_argument("--seed", type=int, default=2025)
+    parser.add_argument("--output", default=None, help="订单 CSV 输出路径（不指定则只统计生成速度）")
+    args = parser.parse_args()
+
+    generator = WorkloadGenerator(args.seed)
+    partitions, _ = generator.grid_topology(*args.grid)
+    materials = generator.materials(args.skus)
+    start = time.perf_counter()
+    generated = 0
+    for i, chunk in enumerate(generator.iter_orders(args.orders, partitions, materials,
+                                                    chunk_size=args.chunk_size, arrival=args.arrival)):
+        if args.output:
+            chunk.to_csv(args.output, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        generated += len(chunk)
+    elapsed = time.perf_counter() - start
+    print(f"已生成订单：{generated:,}，耗时：{elapsed:.2f}s，速度：{generated / elapsed:,.0f} 单/秒")